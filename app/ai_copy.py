@@ -2,11 +2,15 @@ from __future__ import annotations
 
 import json
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from datetime import datetime
 from typing import Literal
 
 from .config import CFG
-from .holidays_util import get_holiday_name, season_by_month, date_cn_str
+from .calendar_context import get_day_context
 
 
 Tone = Literal["morning", "noon", "evening"]
@@ -14,9 +18,10 @@ Tone = Literal["morning", "noon", "evening"]
 
 def _local_fallback_copy(d: datetime, category: str, tone: Tone) -> dict:
     # 简单本地模板兜底
-    holiday = get_holiday_name(d.date())
-    season = season_by_month(d.month)
-    date_str = date_cn_str(d.date())
+    day = get_day_context(d.date())
+    holiday = day.holiday
+    season = day.season
+    date_str = day.date_str
 
     title_prefix = {
         "morning": "早安好号",
@@ -43,16 +48,25 @@ def _local_fallback_copy(d: datetime, category: str, tone: Tone) -> dict:
     }
 
 
+_STYLE_HINTS = {
+    "morning": "清新、提气",
+    "noon": "活泼、热闹",
+    "evening": "温暖、收尾",
+}
+
+_SYSTEM_PROMPT = "你是专业中文广告文案助手。"
+
+_DEFAULT_TITLE = "好号专场"
+_DEFAULT_TAGLINE = "幸运好号，多重优惠，限时抢购！"
+
+
 def _compose_prompt(d: datetime, category: str, tone: Tone) -> str:
-    date_str = date_cn_str(d.date())
-    holiday = get_holiday_name(d.date()) or "无"
-    season = season_by_month(d.month)
-
-    style_hint = {
-        "morning": "清新、提气",
-        "noon": "活泼、热闹",
-        "evening": "温暖、收尾",
-    }[tone]
+    day = get_day_context(d.date())
+    date_str = day.date_str
+    holiday = day.holiday or "无"
+    season = day.season
+
+    style_hint = _STYLE_HINTS[tone]
 
     return (
         "请根据今天的日期、节日、时令、近期热门事件，为中国移动吉祥号码促销活动生成中文广告文案。\n"
@@ -65,15 +79,106 @@ def _compose_prompt(d: datetime, category: str, tone: Tone) -> str:
     )
 
 
-def _try_openai_client():
+def _compose_batch_prompt(jobs: list[tuple[datetime, str, Tone]]) -> str:
+    """多条文案一次请求：共用要求只写一遍，每条只列出各自的日期、节日、分类与风格"""
+    lines = []
+    for i, (d, category, tone) in enumerate(jobs):
+        day = get_day_context(d.date())
+        lines.append(
+            f"{i}. 日期：{day.date_str}；节日：{day.holiday or '无'}；时令：{day.season}；"
+            f"分类：{category}；风格偏好：{_STYLE_HINTS[tone]}"
+        )
+    return (
+        "请为中国移动吉祥号码促销活动的以下每一条生成中文广告文案，结合各自的日期、节日、时令与近期热门事件。\n"
+        "要求：\n"
+        "1) 输出 JSON 数组，每条一个对象：{\"id\": 序号, \"title\": 标题, \"tagline\": 宣传语}，不要解释与多余字段。\n"
+        "2) 标题8-12字，宣传语约30字，口语化，积极向上，各条之间不要雷同。\n"
+        "3) 必须包含：幸运、好号、优惠 等关键词。\n"
+        "4) 倾向结合当下热点但避免敏感与带争议内容。\n"
+        "列表：\n" + "\n".join(lines) + "\n"
+    )
+
+
+def _chat(client, mode: str, prompt: str, max_tokens: int) -> str:
+    """调用一次对话补全，返回文本"""
+    messages = [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    if mode == "sdk_v1":
+        resp = client.chat.completions.create(
+            model=CFG.openai_model,
+            messages=messages,
+            temperature=0.8,
+            max_tokens=max_tokens,
+            timeout=CFG.copy_request_timeout,
+        )
+        return resp.choices[0].message.content or ""
+    # legacy
+    return client.ChatCompletion.create(
+        model=getattr(CFG, "openai_model", "gpt-3.5-turbo"),
+        messages=messages,
+        temperature=0.8,
+        max_tokens=max_tokens,
+        request_timeout=CFG.copy_request_timeout,
+    )["choices"][0]["message"]["content"]
+
+
+def _valid_copy(obj) -> dict | None:
+    """校验批量结果中的一条，合格时返回文案 dict"""
+    if not isinstance(obj, dict):
+        return None
+    title, tagline = obj.get("title"), obj.get("tagline")
+    if not isinstance(title, str) or not isinstance(tagline, str):
+        return None
+    title, tagline = title.strip(), tagline.strip()
+    if not title or not tagline:
+        return None
+    return {
+        "title": title[:18] if len(title) > 18 else title,
+        "tagline": tagline,
+        "meta": {"source": "openai"},
+    }
+
+
+def _parse_batch(text: str, n: int) -> dict[int, dict]:
+    """把批量回复拆成 {序号: 文案}；解析不了或不合格的条目缺席，由调用方逐条兜底"""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end == -1:
+        return {}
+    try:
+        arr = json.loads(text[start : end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(arr, list):
+        return {}
+    out: dict[int, dict] = {}
+    for obj in arr:
+        try:
+            i = int(obj.get("id"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        copy = _valid_copy(obj)
+        if copy is not None and 0 <= i < n and i not in out:
+            out[i] = copy
+    return out
+
+
+# 进程内共享的大模型客户端：(client, mode)，首次使用时创建；SDK 只探测一次
+_CLIENT: tuple | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _create_openai_client(api_key: str):
     # 尝试新 SDK
     try:
         from openai import OpenAI  # type: ignore
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            return None, None
-        client = OpenAI(api_key=api_key)
+        from .http_client import openai_http_client
+
+        # 复用共享的 httpx 连接池，而不是每个客户端各建连接
+        http = openai_http_client()
+        client = OpenAI(api_key=api_key, http_client=http) if http is not None else OpenAI(api_key=api_key)
         return client, "sdk_v1"
     except Exception:
         pass
@@ -82,71 +187,199 @@ def _try_openai_client():
     try:
         import openai  # type: ignore
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            return None, None
         openai.api_key = api_key
+        # 旧 SDK 基于 requests，挂上共享 Session 以复用连接
+        from urllib.parse import urlsplit
+        from .http_client import get_http_client
+
+        openai.requestssession = get_http_client().session_for(urlsplit(getattr(openai, "api_base", "https://api.openai.com/v1")).netloc)
         return openai, "sdk_legacy"
     except Exception:
         return None, None
 
 
-def generate_copy(d: datetime, category: str, tone: Tone) -> dict:
-    client, mode = _try_openai_client()
-    prompt = _compose_prompt(d, category, tone)
+def _try_openai_client():
+    """返回共享的 (client, mode)；未配置 OPENAI_API_KEY 时不导入 openai，直接返回 (None, None)"""
+    global _CLIENT
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None, None
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = _create_openai_client(api_key)
+                if _CLIENT[0] is None:
+                    print("[WARN] 已配置 OPENAI_API_KEY 但无法加载 openai SDK，使用本地文案")
+    return _CLIENT
 
-    if client is None:
-        return _local_fallback_copy(d, category, tone)
 
-    try:
-        if mode == "sdk_v1":
-            resp = client.chat.completions.create(
-                model=CFG.openai_model,
-                messages=[
-                    {"role": "system", "content": "你是专业中文广告文案助手。"},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.8,
-                max_tokens=300,
-            )
-            text = resp.choices[0].message.content or ""
-        else:
-            # legacy
-            text = client.ChatCompletion.create(
-                model=getattr(CFG, "openai_model", "gpt-3.5-turbo"),
-                messages=[
-                    {"role": "system", "content": "你是专业中文广告文案助手。"},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.8,
-                max_tokens=300,
-            )["choices"][0]["message"]["content"]
-
-        # 解析 JSON
-        text = text.strip()
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1:
-            raw = text[start : end + 1]
-            obj = json.loads(raw)
-            title = str(obj.get("title", "好号专场")).strip()
-            tagline = str(obj.get("tagline", "幸运好号，多重优惠，限时抢购！")).strip()
-        else:
-            # 回落：简单切分
-            lines = text.replace("：", ":").splitlines()
-            title = "好号专场"
-            tagline = "幸运好号，多重优惠，限时抢购！"
-            for ln in lines:
-                if "title" in ln.lower():
-                    title = ln.split(":", 1)[-1].strip()
-                if "tagline" in ln.lower():
-                    tagline = ln.split(":", 1)[-1].strip()
+class CopyStats:
+    """文案生成统计：大模型耗时分位数（含超时后才返回的）与本地兜底比例"""
+
+    def __init__(self, window: int = 500) -> None:
+        self._lock = threading.Lock()
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.fallbacks = 0
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def record_call(self, fallback: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.fallbacks += int(fallback)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lat = sorted(self.latencies)
+            calls, fallbacks = self.calls, self.fallbacks
+
+        def pct(p: float) -> float | None:
+            return lat[min(len(lat) - 1, int(p / 100 * len(lat)))] if lat else None
 
         return {
-            "title": title[:18] if len(title) > 18 else title,
-            "tagline": tagline,
-            "meta": {"source": "openai"},
+            "calls": calls,
+            "fallback_rate": fallbacks / calls if calls else 0.0,
+            "p50": pct(50),
+            "p90": pct(90),
+            "p99": pct(99),
         }
-    except Exception:
+
+    def format(self) -> str:
+        s = self.snapshot()
+        lat = " ".join(f"{k} {s[k] * 1000:.0f}ms" for k in ("p50", "p90", "p99") if s[k] is not None)
+        return f"{s['calls']} 次，兜底 {s['fallback_rate']:.0%}" + (f"，大模型耗时 {lat}" if lat else "")
+
+
+COPY_STATS = CopyStats()
+
+# 大模型请求在守护线程中执行，最多同时 4 个。不用 ThreadPoolExecutor：其工作线程在解释器退出时
+# 会被等待，单次运行（--once、--pregen-copy）可能因仍在进行的请求多等最长一个请求超时。
+# 代价是进程退出时尚未返回的大模型结果不再写入缓存；常驻的定时任务不受影响。
+_LLM_SLOTS = threading.BoundedSemaphore(4)
+
+
+def _submit_llm(fn, *args) -> Future:
+    fut: Future = Future()
+
+    def run():
+        with _LLM_SLOTS:
+            if not fut.set_running_or_notify_cancel():
+                return
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+
+    threading.Thread(target=run, name="copy-llm", daemon=True).start()
+    return fut
+
+
+def _llm_copy(client, mode: str, d: datetime, category: str, tone: Tone) -> dict:
+    """请求大模型并解析文案；成功后写入缓存（即使调用方已超时放弃等待）"""
+    from .copy_cache import get_copy_cache
+
+    t0 = time.perf_counter()
+    try:
+        text = _chat(client, mode, _compose_prompt(d, category, tone), max_tokens=300)
+    finally:
+        COPY_STATS.record_latency(time.perf_counter() - t0)
+
+    # 解析 JSON
+    text = text.strip()
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end != -1:
+        raw = text[start : end + 1]
+        obj = json.loads(raw)
+        title = str(obj.get("title", _DEFAULT_TITLE)).strip()
+        tagline = str(obj.get("tagline", _DEFAULT_TAGLINE)).strip()
+    else:
+        # 回落：简单切分
+        lines = text.replace("：", ":").splitlines()
+        title = _DEFAULT_TITLE
+        tagline = _DEFAULT_TAGLINE
+        for ln in lines:
+            if "title" in ln.lower():
+                title = ln.split(":", 1)[-1].strip()
+            if "tagline" in ln.lower():
+                tagline = ln.split(":", 1)[-1].strip()
+
+    copy = {
+        "title": title[:18] if len(title) > 18 else title,
+        "tagline": tagline,
+        "meta": {"source": "openai"},
+    }
+    get_copy_cache().put(d.date(), category, tone, copy)
+    return copy
+
+
+def generate_copy(d: datetime, category: str, tone: Tone, *, deadline_s: float | None = None) -> dict:
+    """生成 {title, tagline}；同一 (日期, 分类, 时段) 优先复用缓存的大模型文案
+
+    大模型最多等待 deadline_s 秒（默认 CFG.copy_deadline_seconds），本地模板文案同时备好，
+    超时或失败即用本地文案；超时后才返回的大模型文案仍写入缓存，供重试和下一次使用。
+    """
+    from .copy_cache import get_copy_cache
+
+    cached = get_copy_cache().get(d.date(), category, tone)
+    if cached is not None:
+        return cached
+
+    client, mode = _try_openai_client()
+    if client is None:
         return _local_fallback_copy(d, category, tone)
 
+    fut = _submit_llm(_llm_copy, client, mode, d, category, tone)
+    local = _local_fallback_copy(d, category, tone)
+    timeout = CFG.copy_deadline_seconds if deadline_s is None else deadline_s
+    try:
+        copy = fut.result(timeout=timeout)
+    except FutureTimeout:
+        print(f"[WARN] 文案生成超过 {timeout:g}s，使用本地模板（大模型结果返回后存入缓存）")
+        copy = None
+    except Exception as e:
+        print(f"[WARN] 文案生成失败，使用本地模板: {e}")
+        copy = None
+    COPY_STATS.record_call(fallback=copy is None)
+    return copy if copy is not None else local
+
+
+def generate_copy_batch(jobs: list[tuple[datetime, str, Tone]]) -> list[dict]:
+    """一次请求为多条 (日期, 分类, 时段) 生成文案，结果与 jobs 一一对应
+
+    缓存命中的条目不再请求；其余按 CFG.copy_batch_size 分批，每批一次对话补全。
+    回复逐条校验，缺失或不合格的条目单独回落到本地模板，不影响同批其他条目。
+    """
+    from .copy_cache import get_copy_cache
+
+    cache = get_copy_cache()
+    results: list[dict | None] = [cache.get(d.date(), category, tone) for d, category, tone in jobs]
+    pending = [i for i, r in enumerate(results) if r is None]
+
+    client, mode = _try_openai_client() if pending else (None, None)
+    if client is not None:
+        size = max(1, CFG.copy_batch_size)
+        for k in range(0, len(pending), size):
+            chunk = pending[k : k + size]
+            chunk_jobs = [jobs[i] for i in chunk]
+            try:
+                text = _chat(client, mode, _compose_batch_prompt(chunk_jobs), max_tokens=120 * len(chunk) + 100)
+                parsed = _parse_batch(text, len(chunk))
+            except Exception as e:
+                print(f"[WARN] 批量生成文案失败（{len(chunk)} 条）: {e}")
+                parsed = {}
+            fresh = []
+            for j, i in enumerate(chunk):
+                copy = parsed.get(j)
+                if copy is not None:
+                    d, category, tone = jobs[i]
+                    fresh.append((d.date(), category, tone, copy))
+                    results[i] = copy
+            cache.put_many(fresh)
+            if len(parsed) < len(chunk):
+                print(f"[WARN] 批量文案 {len(chunk) - len(parsed)}/{len(chunk)} 条无效，改用本地模板")
+
+    return [r if r is not None else _local_fallback_copy(*jobs[i]) for i, r in enumerate(results)]
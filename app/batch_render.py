@@ -0,0 +1,118 @@
+"""
+批量海报渲染
+把多份海报参数分发到进程池并行渲染，结果按输入顺序返回。
+iter_render_posters 以有限窗口流式提交与产出，适合成千上万页的目录渲染。
+"""
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from .config import CFG
+from .poster_generator_v2 import warm_render_caches
+from .renderers import get_renderer
+
+
+def _warm_in_parent(specs: Sequence[dict]) -> list[dict]:
+    """在主进程预热并生成磁盘模板，返回每种模板各一份代表参数供工作进程预热"""
+    seen: set[tuple] = set()
+    unique = []
+    for spec in specs:
+        try:
+            key = (spec.get("font_path"), warm_render_caches(**spec))
+        except Exception:
+            continue
+        if key not in seen:
+            seen.add(key)
+            unique.append({k: v for k, v in spec.items() if k != "output_path"})
+    return unique
+
+
+def _init_worker(warm: list[dict]) -> None:
+    # 每个工作进程启动时加载一次字体与模板，后续任务直接命中缓存；
+    # 超出内存模板容量的部分只预热字体，模板按需从磁盘加载
+    for i, spec in enumerate(warm):
+        try:
+            warm_render_caches(templates=i < CFG.template_cache_size, **spec)
+        except Exception:
+            pass
+
+
+def _render_one(spec: dict, renderer: str | None = None) -> Path | bytes | None:
+    try:
+        poster = get_renderer(renderer)(**spec)
+    except Exception as e:
+        print(f"[ERROR] 批量渲染失败 ({spec.get('title', '')}): {e}")
+        return None
+    return poster.path if poster.path is not None else poster.data
+
+
+def render_posters(specs: Sequence[dict], *, workers: int | None = None, renderer: str | None = None) -> list[Path | bytes | None]:
+    """批量渲染海报
+
+    Args:
+        specs: 每项为 render_poster 的关键字参数；含 output_path 时写盘并返回路径，
+               否则返回 JPEG 字节
+        workers: 进程数，默认 CPU 核数；<=1 时在当前进程内串行渲染
+        renderer: 渲染器名称（见 app/renderers.py），默认 CFG.renderer
+
+    Returns:
+        与 specs 顺序一致的结果列表，渲染失败的位置为 None
+    """
+    specs = list(specs)
+    if not specs:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(specs))
+
+    # 先在主进程生成磁盘模板，避免多个工作进程同时绘制同一模板；
+    # 静态模板只属于新版渲染器，其他渲染器不预热
+    renderer = renderer or CFG.renderer
+    warm = _warm_in_parent(specs) if renderer == "v2" else []
+    render_one = partial(_render_one, renderer=renderer)
+    if workers <= 1:
+        return [render_one(spec) for spec in specs]
+
+    chunksize = max(1, len(specs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(warm,)) as pool:
+        return list(pool.map(render_one, specs, chunksize=chunksize))
+
+
+def iter_render_posters(
+    specs: Iterable[dict],
+    *,
+    workers: int | None = None,
+    renderer: str | None = None,
+    window: int | None = None,
+) -> Iterator[Path | bytes | None]:
+    """流式批量渲染：按输入顺序逐个产出结果，同时在途的任务不超过 window 个
+
+    specs 可以是生成器，按需消费；内存占用只与 window 有关，与总页数无关。
+    结果含义同 render_posters。window 默认 workers * 4。
+    """
+    renderer = renderer or CFG.renderer
+    workers = workers or os.cpu_count() or 1
+    render_one = partial(_render_one, renderer=renderer)
+    if workers <= 1:
+        for spec in specs:
+            yield render_one(spec)
+        return
+
+    window = max(1, window or workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for spec in specs:
+            # 新出现的模板先在主进程生成到磁盘，工作进程直接加载；已有模板命中内存缓存
+            if renderer == "v2":
+                try:
+                    warm_render_caches(**spec)
+                except Exception:
+                    pass
+            pending.append(pool.submit(render_one, spec))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
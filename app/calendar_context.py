@@ -0,0 +1,147 @@
+"""
+日历上下文
+按天预先算好节日、时令、中文日期与节日主题，存成一张紧凑的表
+（<cache_dir>/calendar.json，只记录有节日的日子），首次查询时才加载。
+每次生成只需一次字典查找，且正常运行时不再导入 holidays 库。
+表从当月 1 日起覆盖 CFG.calendar_months 个月，临近到期时自动重建。
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from .config import CFG
+from .holidays_util import date_cn_str, lookup_holiday, season_by_month
+
+
+# 表结构或节日/主题规则变化时递增，旧表自动重建
+CALENDAR_VERSION = 1
+
+# 今天之后至少还要覆盖的天数，不足则重建
+_MIN_AHEAD_DAYS = 31
+
+_TABLE: dict[date, "DayContext"] | None = None
+_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class DayContext:
+    day: date
+    holiday: str | None      # 节日名称（如 国庆节），无则 None
+    season: str              # 时令（如 金秋）
+    date_str: str            # 中文日期（如 2025年10月01日）
+    holiday_theme: str | None  # 节日对应的主题名（THEMES 的键），无则 None
+
+
+def _holiday_theme_name(holiday: str) -> str | None:
+    from .theme_system import _get_holiday_theme
+
+    theme = _get_holiday_theme(holiday)
+    return theme.name if theme else None
+
+
+def _make_day(d: date, holiday: str | None, holiday_theme: str | None) -> DayContext:
+    return DayContext(
+        day=d,
+        holiday=holiday,
+        season=season_by_month(d.month),
+        date_str=date_cn_str(d),
+        holiday_theme=holiday_theme,
+    )
+
+
+def build_calendar(start: date, months: int) -> dict:
+    """逐日查询节日，返回可持久化的紧凑结构：只记录节日日子的偏移量"""
+    y, m = divmod(start.month - 1 + months, 12)
+    end = date(start.year + y, m + 1, 1)
+    days = (end - start).days
+    holidays: dict[str, str] = {}
+    for i in range(days):
+        name = lookup_holiday(start + timedelta(days=i))
+        if name:
+            holidays[str(i)] = name
+    themes = {}
+    for name in set(holidays.values()):
+        theme = _holiday_theme_name(name)
+        if theme:
+            themes[name] = theme
+    return {
+        "v": CALENDAR_VERSION,
+        "start": start.isoformat(),
+        "days": days,
+        "holidays": holidays,
+        "themes": themes,
+    }
+
+
+def _expand(payload: dict) -> dict[date, DayContext]:
+    start = date.fromisoformat(payload["start"])
+    holidays = payload["holidays"]
+    themes = payload["themes"]
+    table = {}
+    for i in range(payload["days"]):
+        name = holidays.get(str(i))
+        d = start + timedelta(days=i)
+        table[d] = _make_day(d, name, themes.get(name) if name else None)
+    return table
+
+
+def _covers(table: dict[date, DayContext], today: date) -> bool:
+    return today in table and today + timedelta(days=_MIN_AHEAD_DAYS) in table
+
+
+def _read_disk() -> dict | None:
+    try:
+        payload = json.loads((CFG.cache_dir / "calendar.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return payload if payload.get("v") == CALENDAR_VERSION else None
+
+
+def _write_disk(payload: dict) -> None:
+    path = CFG.cache_dir / "calendar.json"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+    except OSError as e:
+        print(f"[WARN] 写入日历缓存失败: {e}")
+
+
+def rebuild_calendar(today: date | None = None) -> dict[date, DayContext]:
+    """从当月 1 日起重建日历表并写盘"""
+    global _TABLE
+    today = today or date.today()
+    payload = build_calendar(today.replace(day=1), max(2, CFG.calendar_months))
+    _write_disk(payload)
+    with _LOCK:
+        _TABLE = _expand(payload)
+        return _TABLE
+
+
+def _table() -> dict[date, DayContext]:
+    global _TABLE
+    today = date.today()
+    with _LOCK:
+        if _TABLE is not None and _covers(_TABLE, today):
+            return _TABLE
+        payload = _read_disk()
+        if payload is not None:
+            table = _expand(payload)
+            if _covers(table, today):
+                _TABLE = table
+                return table
+    return rebuild_calendar(today)
+
+
+def get_day_context(d: date) -> DayContext:
+    """某天的日历上下文；超出预计算范围（如历史日期）时直接计算，不影响表"""
+    rec = _table().get(d)
+    if rec is not None:
+        return rec
+    holiday = lookup_holiday(d)
+    return _make_day(d, holiday, _holiday_theme_name(holiday) if holiday else None)
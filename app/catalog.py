@@ -0,0 +1,145 @@
+"""
+号码目录模式
+把某个分类（或全部库存）的未使用号码按网格分页，逐页渲染为海报，
+输出编号的 JPEG 或一个多页 PDF，供门店陈列。
+
+- 页面由生成器按需产生，渲染走 batch_render.iter_render_posters 的有限窗口，
+  PDF 逐页流式写入，内存占用与总页数无关，几千页也可以
+- 目录只是展示，不会把号码标记为已使用
+"""
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from .batch_render import iter_render_posters
+from .calendar_context import get_day_context
+from .config import CFG, select_font_path
+from .selection import unused_frame
+from .theme_system import select_theme
+from .used_storage import UsedStorage
+
+
+CATALOG_FORMATS = ("pdf", "jpg")
+
+
+def _page_items(rows: pd.DataFrame) -> list[dict]:
+    items = []
+    for num, deposit, low in zip(rows["号码"], rows["预存"], rows["低消"]):
+        items.append({
+            "号码": str(num).strip(),
+            "预存": float(deposit) if pd.notna(deposit) else None,
+            "低消": float(low) if pd.notna(low) else None,
+        })
+    return items
+
+
+def count_pages(frame: pd.DataFrame, per_page: int) -> int:
+    """每个分类单独分页，总页数为各分类页数之和"""
+    sizes = frame.groupby("分类说明", sort=False).size()
+    return int(sum(math.ceil(n / per_page) for n in sizes))
+
+
+def iter_pages(frame: pd.DataFrame, per_page: int) -> Iterator[tuple[str, list[dict]]]:
+    """按分类（Excel 中首次出现的顺序）逐页产出 (分类, 号码列表)"""
+    for category, rows in frame.groupby("分类说明", sort=False):
+        for start in range(0, len(rows), per_page):
+            yield str(category), _page_items(rows.iloc[start:start + per_page])
+
+
+def build_catalog(
+    df: pd.DataFrame,
+    store: UsedStorage,
+    *,
+    category: str | None = None,
+    fmt: str = "pdf",
+    out_path: Path | None = None,
+    grid: tuple[int, int] | None = None,
+    workers: int | None = None,
+    renderer: str | None = None,
+    dt: datetime | None = None,
+) -> Path | None:
+    """渲染号码目录
+
+    Args:
+        category: 指定分类；为空时包含全部分类的未使用号码
+        fmt: "pdf" 输出单个多页 PDF；"jpg" 输出编号的 JPEG 到目录
+        out_path: PDF 文件路径或 JPEG 目录，默认在 CFG.catalog_dir 下按时间命名
+        grid: (列数, 行数)，默认 CFG.catalog_grid
+
+    Returns:
+        PDF 路径或 JPEG 所在目录；没有可用号码时返回 None
+    """
+    if fmt not in CATALOG_FORMATS:
+        raise ValueError(f"不支持的目录格式: {fmt}（可选: {', '.join(CATALOG_FORMATS)}）")
+    dt = dt or datetime.now()
+    cols, rows = grid or CFG.catalog_grid
+    per_page = cols * rows
+
+    frame = unused_frame(df, store, category)
+    total = count_pages(frame, per_page)
+    if total == 0:
+        print(f"[WARN] {category or '全部分类'} 没有未使用的号码，未生成目录")
+        return None
+
+    stamp = dt.strftime("%Y%m%d_%H%M")
+    if out_path is None:
+        out_path = CFG.catalog_dir / (f"catalog_{stamp}.pdf" if fmt == "pdf" else f"catalog_{stamp}")
+    width = len(str(total))
+
+    day = get_day_context(dt.date())
+    theme = select_theme(dt=dt, holiday_name=day.holiday, holiday_theme=day.holiday_theme)
+    font_path = select_font_path()
+    date_txt = day.date_str
+    print(f"[INFO] 目录: {len(frame)} 个号码，{total} 页（{cols}×{rows}），输出 {out_path}")
+
+    def specs():
+        for i, (cat, items) in enumerate(iter_pages(frame, per_page), start=1):
+            spec = dict(
+                font_path=font_path,
+                title="吉祥号码目录",
+                subtitle=f"{date_txt} 第{i}/{total}页｜{cat}",
+                tagline="欢迎到店选号，号码以实际库存为准",
+                items=items,
+                branding_label=CFG.branding_label,
+                grid_cols=cols,
+                grid_rows=rows,
+                location=CFG.location_name,
+                hotline=CFG.hotline,
+                theme=theme,
+                # 目录页几乎不会重复，不占用渲染缓存
+                use_cache=False,
+            )
+            if fmt == "jpg":
+                spec["output_path"] = out_path / f"page_{i:0{width}d}.jpg"
+            yield spec
+
+    results = iter_render_posters(specs(), workers=workers, renderer=renderer)
+    failed = 0
+    if fmt == "pdf":
+        from .jpeg_pdf import JpegPdfWriter
+
+        with JpegPdfWriter(out_path) as pdf:
+            for i, data in enumerate(results, start=1):
+                if data is None:
+                    failed += 1
+                else:
+                    pdf.add_page(data)
+                if i % 100 == 0:
+                    print(f"[INFO] 目录进度 {i}/{total}")
+    else:
+        out_path.mkdir(parents=True, exist_ok=True)
+        for i, path in enumerate(results, start=1):
+            if path is None:
+                failed += 1
+            if i % 100 == 0:
+                print(f"[INFO] 目录进度 {i}/{total}")
+
+    if failed:
+        print(f"[WARN] 目录有 {failed} 页渲染失败")
+    print(f"[OK] 目录已生成: {out_path}")
+    return out_path
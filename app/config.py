@@ -12,6 +12,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 class AppConfig:
     excel_file: Path = BASE_DIR / "吉祥号码.xlsx"
     output_dir: Path = BASE_DIR / "output"
+    # 渲染缓存（静态模板等），可随时删除
+    cache_dir: Path = BASE_DIR / "output" / ".cache"
     used_json: Path = BASE_DIR / "used_numbers.json"
     timezone: str = "Asia/Shanghai"
     # 优先级：前者优先
@@ -29,6 +31,59 @@ class AppConfig:
     branding_label: str = "南昌县移动专供"
     # 数量与布局
     numbers_per_poster: int = 9  # 三列×三行
+    # 内存中保留的静态模板数量（每个约 4.5MB）
+    template_cache_size: int = 8
+    # 海报渲染器（见 app/renderers.py），可用环境变量 POSTER_RENDERER 或 --renderer 覆盖
+    renderer: str = os.getenv("POSTER_RENDERER", "v2")
+    # 每次出图额外编码的输出变体（见 app/poster_output.py）
+    output_variants: tuple[str, ...] = ("web", "webp", "thumb")
+    # 内容寻址渲染缓存的容量上限（MB），0 表示禁用
+    render_cache_max_mb: int = 200
+    # 号码目录（--catalog）：输出目录与每页网格（列, 行）
+    catalog_dir: Path = BASE_DIR / "output" / "catalog"
+    catalog_grid: tuple[int, int] = (3, 4)
+    # 自定义主题配置（可选，格式见 themes.example.json）
+    theme_config: Path = BASE_DIR / "themes.json"
+    # 固定使用的主题名（内置或 themes.json 中的），空表示按节日/天气/时段自动选择；--theme 可临时指定
+    theme: str | None = os.getenv("POSTER_THEME") or None
+    # 天气缓存有效期（秒），过期后先返回旧值并在后台刷新
+    weather_ttl_seconds: int = int(os.getenv("WEATHER_TTL", "1800"))
+    # 旧值最多沿用的时长（秒）：超过后同步查询（超时 weather_sync_timeout 秒），查询失败才用旧值
+    weather_max_stale_seconds: int = int(os.getenv("WEATHER_MAX_STALE", "7200"))
+    weather_sync_timeout: float = 2.0
+    # 日历上下文表（节日/时令/节日主题）预计算的月数
+    calendar_months: int = 18
+    # 单张海报的端到端时间预算（秒）：天气、文案在预算内未返回则用缓存/本地文案兜底
+    generation_budget_seconds: float = float(os.getenv("GENERATION_BUDGET", "20"))
+    # 天气、文案请求与读取 Excel、选号并行；False 时按顺序执行（便于排查问题）
+    pipelined_generation: bool = True
+    # 低峰时段为当天各时段预生成 AI 文案（见 app/copy_cache.py），None 表示不安排
+    copy_pregen_time: str | None = os.getenv("COPY_PREGEN_TIME", "03:30") or None
+    # 单条文案等待大模型的时限（秒），超时用本地模板；请求本身的超时（秒），超时后放弃
+    copy_deadline_seconds: float = float(os.getenv("COPY_DEADLINE", "6"))
+    copy_request_timeout: float = 60.0
+    # 批量生成文案时每次请求包含的条数
+    copy_batch_size: int = 20
+    # 微信临时素材的复用时限（秒）：微信保留 3 天，提前 1 小时视为过期
+    wechat_media_ttl_seconds: int = 3 * 24 * 3600 - 3600
+    # 图文内容图片（uploadimg）URL 的复用时限（秒）：微信称长期有效，仍定期重新上传，缓存不会无限增长
+    wechat_image_url_ttl_seconds: int = 30 * 24 * 3600
+    # 微信 access_token 到期前多少秒开始主动刷新（见 app/token_store.py）
+    wechat_token_refresh_margin: int = 600
+    # 微信发送队列（见 app/outbox.py）：最多尝试次数、首次重试等待（秒，之后指数增长）、单次运行时等待发送的时长（秒）
+    outbox_max_attempts: int = 8
+    outbox_backoff_seconds: float = 30.0
+    outbox_drain_seconds: float = 120.0
+    # 已发送/已放弃的队列记录保留天数，过期后删除（去重只在此期间内有效）
+    outbox_keep_days: int = 7
+    # 多渠道分发（见 app/fanout.py）：并发发送线程数；各接口每秒最多调用次数
+    fanout_workers: int = 4
+    fanout_rate_limits: dict[str, float] = None  # e.g. {"work.message": 5.0, ...}
+    # 共享 HTTP 客户端（app/http_client.py）：每主机连接池大小、并发上限、失败重试次数与退避系数
+    http_pool_size: int = 4
+    http_max_per_host: int = 4
+    http_retries: int = int(os.getenv("HTTP_RETRIES", "2"))
+    http_backoff: float = 0.5
     randomize_category_default: bool = True
     # 地区与热线
     location_name: str = "南昌"
@@ -54,7 +109,12 @@ CFG = AppConfig(
         "09:00": None,
         "12:00": None,
         "18:00": None,
-    }
+    },
+    fanout_rate_limits={
+        "public.draft": 1.0,
+        "public.custom": 20.0,
+        "work.message": 5.0,
+    },
 )
 
 
@@ -0,0 +1,138 @@
+"""
+AI 文案缓存
+文案只取决于 (日期, 分类, 时段)，大模型生成的结果按这三项持久化到
+<cache_dir>/copy_cache.json，同一时段重跑或重试直接复用，不再等待大模型。
+
+pregenerate_copy() 在低峰时段（CFG.copy_pregen_time）为 schedule_plan 中即将到来的
+各时段预先生成文案；时段未指定分类时，为所有号码充足的分类各生成一份。
+本地模板兜底的文案不入缓存，下次仍会尝试大模型。
+
+多个进程（定时任务、网页、预生成）共用同一个缓存文件：文件被别的进程改写后重新读取；
+写入时在锁文件保护下先读出磁盘上的最新内容再合并，不会覆盖别人刚写入的条目。
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from .config import CFG
+from .file_lock import file_lock, file_stamp
+
+
+# 缓存格式或提示词变化时递增，旧缓存自动忽略
+COPY_CACHE_VERSION = 1
+
+
+def copy_key(d: date, category: str, tone: str) -> str:
+    return f"{d.isoformat()}|{category}|{tone}"
+
+
+class CopyCache:
+    """线程安全、多进程共用的文案缓存；条目为 {"title", "tagline", "meta"}"""
+
+    def __init__(self, path: Path, keep_days: int = 3) -> None:
+        self.path = path
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._stamp: tuple[int, int] | None = None
+
+    def _load(self) -> dict[str, dict]:
+        """返回内存中的条目；文件自上次读取后被改写（含别的进程）时重新读取"""
+        stamp = file_stamp(self.path)
+        if stamp != self._stamp:
+            try:
+                payload = json.loads(self.path.read_text(encoding="utf-8"))
+                self._entries = payload["entries"] if payload.get("v") == COPY_CACHE_VERSION else {}
+            except (OSError, ValueError, KeyError):
+                self._entries = {}
+            self._stamp = stamp
+        return self._entries
+
+    def _save(self, updates: dict[str, dict]) -> None:
+        """在锁文件保护下读出最新内容、合并 updates 后整体替换文件"""
+        # 只保留最近几天的条目，文件不会无限增长
+        oldest = (date.today() - timedelta(days=self.keep_days)).isoformat()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.path.with_name(f"{self.path.name}.lock")):
+                # 持锁后总是重新读取，修改时间精度不足时也不会漏掉别人的写入
+                self._stamp = None
+                entries = {**self._load(), **updates}
+                entries = {k: v for k, v in entries.items() if k.split("|", 1)[0] >= oldest}
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps({"v": COPY_CACHE_VERSION, "entries": entries}, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.path)
+                self._entries, self._stamp = entries, file_stamp(self.path)
+        except (OSError, TimeoutError) as e:
+            # 写入失败时至少本进程内可用
+            self._entries.update(updates)
+            print(f"[WARN] 写入文案缓存失败: {e}")
+
+    def get(self, d: date, category: str, tone: str) -> dict | None:
+        with self._lock:
+            entry = self._load().get(copy_key(d, category, tone))
+        return dict(entry) if entry else None
+
+    def put(self, d: date, category: str, tone: str, copy: dict) -> None:
+        self.put_many([(d, category, tone, copy)])
+
+    def put_many(self, items: list[tuple[date, str, str, dict]]) -> None:
+        """一次写入多条，只落盘一次"""
+        if not items:
+            return
+        with self._lock:
+            self._save({copy_key(d, category, tone): copy for d, category, tone, copy in items})
+
+
+_CACHE: CopyCache | None = None
+
+
+def get_copy_cache() -> CopyCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = CopyCache(CFG.cache_dir / "copy_cache.json")
+    return _CACHE
+
+
+def slot_tone(hour: int) -> str:
+    return "morning" if hour < 12 else ("noon" if hour < 18 else "evening")
+
+
+def upcoming_slots(now: datetime) -> list[tuple[datetime, str | None, str]]:
+    """schedule_plan 中各时段下一次运行的 (时间, 分类, 时段)，按时间排序"""
+    plan = CFG.schedule_plan or {"09:00": None, "12:00": None, "18:00": None}
+    slots = []
+    for hhmm, cat in plan.items():
+        hh, mm = [int(x) for x in hhmm.split(":")]
+        at = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+        if at <= now:
+            at += timedelta(days=1)
+        slots.append((at, cat, slot_tone(hh)))
+    return sorted(slots, key=lambda s: s[0])
+
+
+def pregenerate_copy(now: datetime, categories: list[str]) -> int:
+    """为即将到来的各时段预生成文案并写入缓存，返回新生成的条数
+
+    Args:
+        categories: 时段未指定分类时可能选中的分类（号码充足的分类）
+    """
+    from .ai_copy import generate_copy_batch
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("[INFO] 未配置 OPENAI_API_KEY，跳过文案预生成")
+        return 0
+    cache = get_copy_cache()
+    jobs = [
+        (at, category, tone)
+        for at, cat, tone in upcoming_slots(now)
+        for category in ([cat] if cat else categories)
+        if cache.get(at.date(), category, tone) is None
+    ]
+    # 批量请求，一次补全覆盖多个时段与分类
+    copies = generate_copy_batch(jobs)
+    return sum(1 for c in copies if c.get("meta", {}).get("source") == "openai")
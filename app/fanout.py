@@ -0,0 +1,211 @@
+"""
+多渠道分发
+同一张海报发往多个渠道（公众号、多个企业微信应用），每个渠道可有多个接收目标：
+
+- 每个渠道只上传一次素材（并经 app/wechat_media.py 按内容缓存），各目标共用；
+  缓存的素材被微信判定无效时重新上传
+- 各目标在有限线程池（CFG.fanout_workers）中并发发送，按接口限速（CFG.fanout_rate_limits）
+- 返回每个目标的结果与耗时
+
+渠道配置写在 wechat_config.json 的 "channels" 中（格式见 wechat_config.example.json）；
+没有该项时按原有的 send_type/config 生成单个渠道，行为与 WeChatSender.send_poster 相同。
+
+目标写法：
+- 公众号："draft" 创建草稿；其他视为 openid，发送客服图片消息
+- 企业微信："@all"、"user:张三|李四"、"party:2|3"、"tag:1"，不带前缀视为成员账号
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import CFG
+from .wechat_sender import WeChatPublicSender, WorkWechatSender, load_wechat_config
+
+
+@dataclass
+class TargetResult:
+    channel: str
+    target: str
+    ok: bool
+    seconds: float
+    error: str = ""
+
+    @property
+    def key(self) -> str:
+        return f"{self.channel}/{self.target}"
+
+
+class RateLimiter:
+    """按固定间隔放行的限速器，线程安全"""
+
+    def __init__(self, per_second: float) -> None:
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class _PublicChannel:
+    def __init__(self, name: str, config: dict, targets: list[str]) -> None:
+        self.name = name
+        self.sender = WeChatPublicSender(app_id=config.get("app_id"), app_secret=config.get("app_secret"))
+        self.targets = targets or ["draft"]
+
+    def prepare(self, image: bytes) -> None:
+        self.sender.upload_image(image)
+        if "draft" in self.targets:
+            self.sender.upload_content_image(image)
+
+    def api(self, target: str) -> str:
+        return "public.draft" if target == "draft" else "public.custom"
+
+    def send(self, target: str, image: bytes, title: str, description: str) -> bool:
+        if target == "draft":
+            # 素材已在 prepare 中上传，这里命中素材缓存
+            self.sender.create_draft(title=title, image_path=image, content=description)
+            return True
+        return self.sender.send_image(image, target)
+
+
+class _WorkChannel:
+    def __init__(self, name: str, config: dict, targets: list[str]) -> None:
+        self.name = name
+        self.sender = WorkWechatSender(
+            corp_id=config.get("corp_id"),
+            agent_id=config.get("agent_id"),
+            agent_secret=config.get("agent_secret"),
+        )
+        self.targets = targets or ["@all"]
+
+    def prepare(self, image: bytes) -> None:
+        self.sender.upload_image(image)
+
+    def api(self, target: str) -> str:
+        return "work.message"
+
+    def send(self, target: str, image: bytes, title: str, description: str) -> bool:
+        kind, _, value = target.partition(":")
+        # 素材已在 prepare 中上传，这里命中素材缓存；缓存的素材失效时 send_image 会重新上传
+        if kind == "party":
+            return self.sender.send_image(image, touser="", toparty=value)
+        if kind == "tag":
+            return self.sender.send_image(image, touser="", totag=value)
+        return self.sender.send_image(image, touser=value if kind == "user" else target)
+
+
+_CHANNEL_TYPES = {"public": _PublicChannel, "work": _WorkChannel}
+
+_CONFIG_FILE = Path(__file__).parent.parent / "wechat_config.json"
+
+
+def load_channels() -> list:
+    """读取渠道配置；没有 "channels" 时回落到 send_type/config 的单渠道"""
+    entries = None
+    if _CONFIG_FILE.exists():
+        try:
+            entries = json.loads(_CONFIG_FILE.read_text(encoding="utf-8")).get("channels")
+        except Exception as e:
+            print(f"[WARN] 读取wechat_config.json失败: {e}")
+    if not entries:
+        send_type, config = load_wechat_config()
+        entries = [{"type": send_type, "config": config}] if send_type in _CHANNEL_TYPES else []
+
+    channels = []
+    for i, entry in enumerate(entries):
+        kind = entry.get("type")
+        if kind not in _CHANNEL_TYPES:
+            print(f"[WARN] 未知的渠道类型: {kind}，已忽略")
+            continue
+        name = entry.get("name") or (kind if len(entries) == 1 else f"{kind}{i + 1}")
+        channels.append(_CHANNEL_TYPES[kind](name, entry.get("config", {}), list(entry.get("targets", []))))
+    return channels
+
+
+class FanoutDispatcher:
+    def __init__(self, channels: list, *, workers: int | None = None, rate_limits: dict[str, float] | None = None) -> None:
+        self.channels = channels
+        self.workers = workers or CFG.fanout_workers
+        limits = CFG.fanout_rate_limits if rate_limits is None else rate_limits
+        self._limiters = {api: RateLimiter(rate) for api, rate in limits.items()}
+
+    def dispatch(self, image: bytes, title: str, description: str, *, skip: set[str] = frozenset()) -> list[TargetResult]:
+        """把海报发往所有渠道的所有目标；skip 中的 "渠道/目标" 视为已送达，不再发送"""
+        jobs = [(ch, t) for ch in self.channels for t in ch.targets if f"{ch.name}/{t}" not in skip]
+        if not jobs:
+            return []
+        active = list({id(ch): ch for ch, _ in jobs}.values())
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fanout") as pool:
+            # 每个渠道上传一次素材
+            prepare_errors: dict[str, str] = {}
+
+            def prepare(ch):
+                try:
+                    ch.prepare(image)
+                except Exception as e:
+                    prepare_errors[ch.name] = f"上传素材失败: {e}"
+
+            list(pool.map(prepare, active))
+
+            def send(job) -> TargetResult:
+                ch, target = job
+                t0 = time.perf_counter()
+                if ch.name in prepare_errors:
+                    return TargetResult(ch.name, target, False, 0.0, prepare_errors[ch.name])
+                limiter = self._limiters.get(ch.api(target))
+                if limiter is not None:
+                    limiter.acquire()
+                try:
+                    ok = ch.send(target, image, title, description)
+                    error = "" if ok else "接口返回失败"
+                except Exception as e:
+                    ok, error = False, str(e)
+                return TargetResult(ch.name, target, ok, time.perf_counter() - t0, error)
+
+            return list(pool.map(send, jobs))
+
+
+_DISPATCHER: FanoutDispatcher | None = None
+_DISPATCHER_CONFIG: float | None = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def _config_mtime() -> float | None:
+    try:
+        return _CONFIG_FILE.stat().st_mtime
+    except OSError:
+        return None
+
+
+def get_dispatcher() -> FanoutDispatcher:
+    """进程内共用的分发器，限速器在多次投递之间持续生效；wechat_config.json 改动后重新加载渠道"""
+    global _DISPATCHER, _DISPATCHER_CONFIG
+    mtime = _config_mtime()
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None:
+            _DISPATCHER = FanoutDispatcher(load_channels())
+        elif mtime != _DISPATCHER_CONFIG:
+            _DISPATCHER.channels = load_channels()
+        _DISPATCHER_CONFIG = mtime
+        return _DISPATCHER
+
+
+def format_results(results: list[TargetResult]) -> str:
+    ok = sum(r.ok for r in results)
+    lines = [f"分发 {ok}/{len(results)} 个目标成功"]
+    for r in results:
+        mark = "OK" if r.ok else "失败"
+        lines.append(f"  {r.key}: {mark} {r.seconds * 1000:.0f}ms" + (f"（{r.error}）" if r.error else ""))
+    return "\n".join(lines)
@@ -0,0 +1,54 @@
+"""
+多进程共用的 JSON 缓存文件的辅助函数
+定时任务、网页等多个进程读写同一个缓存文件时：
+
+- file_stamp() 判断文件是否被（其他进程）改写过，改写过就重新读取
+- file_lock() 在写入前加锁，读出磁盘上的最新内容合并后再整体替换，不覆盖别人的条目
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# 锁文件超过这么久（秒）仍在，视为持有者已崩溃
+_STALE_LOCK_SECONDS = 30
+
+
+def file_stamp(path: Path) -> tuple[int, int] | None:
+    """(修改时间, 大小)；文件不存在时为 None"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float = 10.0):
+    """跨进程的锁文件（O_EXCL 创建），Windows 与 Linux 通用"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - path.stat().st_mtime > _STALE_LOCK_SECONDS:
+                    path.unlink()
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"等待锁文件超时: {path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,130 @@
+"""
+号码数字字形图集
+每个号码卡片都要绘制 11 位数字，而字形只有 0-9。对实际用到的几个字号，
+预先栅格化 0-9 并缓存前进宽度，号码由字形贴图按 FreeType 相同的规则拼合：
+  - 字形位置取笔位四舍五入到整数像素（与 FreeType 26.6 定点取整一致）
+  - 重叠像素按 src + target * (255 - src) / 255 合成（与 _imagingft 相同的舍入）
+  - 裁剪窗口为各字形度量框的并集（与 font.getbbox 一致）
+因此输出与 draw.text 逐像素一致（容差为 0）。每个图集构建时都会用覆盖全部
+相邻数字组合的测试串与 FreeType 直接渲染的结果比对，任何像素不一致即放弃该
+字号的图集，回退到 FreeType 绘制，保证不会引入偏差。
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+DIGITS = "0123456789"
+
+# 字形左右各放一个竖线与若干空格：竖线撑开垂直窗口，保证取到完整的字形位图
+_PAD = "|" + " " * 4
+
+# 覆盖全部 100 种相邻数字组合的 de Bruijn 序列，用于构建时校验
+_VERIFY_TEXTS = (
+    "0010203040506070809112131415161718192232425262728293343536373839445464748495565758596676869778798899",
+    "9876543210",
+)
+
+
+def is_digits(text: str) -> bool:
+    return bool(text) and all(ch in DIGITS for ch in text)
+
+
+def _render_mask(font: ImageFont.FreeTypeFont, text: str) -> tuple[np.ndarray, tuple[int, int]]:
+    """用 FreeType 直接渲染文字遮罩，返回 (数组, 左上角相对原点的偏移)"""
+    x0, y0, x1, y1 = font.getbbox(text)
+    img = Image.new("L", (x1 - x0, y1 - y0))
+    ImageDraw.Draw(img).text((-x0, -y0), text, font=font, fill=255)
+    return np.asarray(img, dtype=np.uint16), (x0, y0)
+
+
+class DigitAtlas:
+    """某一字体字号下 0-9 的字形贴图与度量"""
+
+    def __init__(self, font: ImageFont.FreeTypeFont) -> None:
+        self.font = font
+        self._glyphs: dict[str, tuple[np.ndarray, int, int, float, tuple[int, int, int, int]]] = {}
+        pad_w = font.getlength(_PAD)
+        space_w = font.getlength(" ")
+        bar_w = font.getlength("|")
+        for d in DIGITS:
+            arr, (ox, oy) = _render_mask(font, _PAD + d + _PAD[::-1])
+            adv = font.getlength(d)
+            # 取两侧空格中点之间的列段，即 d 的完整位图
+            left = int(bar_w + 2 * space_w) - ox
+            right = int(pad_w + adv + 2 * space_w) - ox
+            self._glyphs[d] = (arr[:, left:right].copy(), left + ox - int(pad_w), oy, adv, font.getbbox(d))
+
+    def bbox(self, text: str) -> tuple[int, int, int, int]:
+        """等同于 font.getbbox(text)"""
+        pen = 0.0
+        x0 = y0 = 1 << 30
+        x1 = y1 = -(1 << 30)
+        for ch in text:
+            _, _, _, adv, (bx0, by0, bx1, by1) = self._glyphs[ch]
+            px = int(pen + 0.5)
+            x0 = min(x0, px + bx0)
+            y0 = min(y0, by0)
+            x1 = max(x1, px + bx1)
+            y1 = max(y1, by1)
+            pen += adv
+        return x0, y0, x1, y1
+
+    def text_size(self, text: str) -> tuple[int, int]:
+        x0, y0, x1, y1 = self.bbox(text)
+        return x1 - x0, y1 - y0
+
+    def mask(self, text: str) -> tuple[np.ndarray, tuple[int, int]]:
+        """拼合号码遮罩，返回 (数组, 左上角相对原点的偏移)"""
+        x0, y0, x1, y1 = self.bbox(text)
+        out = np.zeros((y1 - y0, x1 - x0), dtype=np.uint16)
+        H, W = out.shape
+        pen = 0.0
+        for ch in text:
+            arr, dx, dy, adv, _ = self._glyphs[ch]
+            x = int(pen + 0.5) + dx - x0
+            y = dy - y0
+            pen += adv
+            h, w = arr.shape
+            sx0, sy0 = max(0, -x), max(0, -y)
+            sx1, sy1 = min(w, W - x), min(h, H - y)
+            if sx0 >= sx1 or sy0 >= sy1:
+                continue
+            src = arr[sy0:sy1, sx0:sx1]
+            tgt = out[y + sy0:y + sy1, x + sx0:x + sx1]
+            t = tgt * (255 - src) + 128
+            blended = np.minimum(src + ((t + (t >> 8)) >> 8), 255)
+            tgt[...] = np.where(src > 0, np.where(tgt > 0, blended, src), tgt)
+        return out, (x0, y0)
+
+    def draw(self, draw: ImageDraw.ImageDraw, xy: tuple[int, int], text: str, fill) -> None:
+        """等同于 draw.text(xy, text, font=self.font, fill=fill)"""
+        arr, (ox, oy) = self.mask(text)
+        draw.bitmap((xy[0] + ox, xy[1] + oy), Image.fromarray(arr.astype(np.uint8), "L"), fill=fill)
+
+    def verify(self) -> bool:
+        """与 FreeType 直接渲染逐像素比对"""
+        for text in _VERIFY_TEXTS:
+            expected, offset = _render_mask(self.font, text)
+            actual, actual_offset = self.mask(text)
+            if offset != actual_offset or expected.shape != actual.shape or not np.array_equal(expected, actual):
+                return False
+        return True
+
+
+@lru_cache(maxsize=64)
+def get_atlas(font_path: str | None, size: int) -> DigitAtlas | None:
+    """返回校验通过的图集；非 FreeType 字体或校验失败时返回 None，调用方回退到 draw.text"""
+    from .poster_core import _load_font
+
+    font = _load_font(font_path, size)
+    if not isinstance(font, ImageFont.FreeTypeFont):
+        return None
+    try:
+        atlas = DigitAtlas(font)
+    except Exception:
+        return None
+    return atlas if atlas.verify() else None
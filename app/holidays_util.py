@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 from datetime import date
-import holidays
+from functools import lru_cache
 
 
-CN_HOLIDAYS = holidays.CountryHoliday("CN")
+@lru_cache(maxsize=1)
+def _cn_holidays():
+    # holidays 库导入较慢，只在需要直接查询（构建日历表等）时才加载
+    import holidays
 
+    return holidays.CountryHoliday("CN")
 
-def get_holiday_name(d: date) -> str | None:
+
+def lookup_holiday(d: date) -> str | None:
+    """直接查询 holidays 库；日常请用 get_holiday_name，走预计算的日历表"""
     try:
-        name = CN_HOLIDAYS.get(d)
+        name = _cn_holidays().get(d)
         if isinstance(name, list):
             return name[0]
         return name
@@ -17,6 +23,12 @@ def get_holiday_name(d: date) -> str | None:
         return None
 
 
+def get_holiday_name(d: date) -> str | None:
+    from .calendar_context import get_day_context
+
+    return get_day_context(d).holiday
+
+
 def season_by_month(m: int) -> str:
     mapping = {
         1: "寒冬",
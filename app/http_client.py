@@ -0,0 +1,190 @@
+"""
+共享 HTTP 客户端
+天气、微信、OpenAI 的外部请求都经过这里：
+
+- 每个主机一个 requests.Session，连接池 + keep-alive，token、上传、发送复用同一条 TLS 连接
+- 连接失败按指数退避重试；幂等请求（GET 等）在 429/5xx 时也重试，POST 不重放
+- 读取超时不重试：调用方给的 timeout 就是单次请求的等待上限，不会被重试放大
+- 每个主机限制并发请求数（CFG.http_max_per_host），避免批量发送时打爆对方接口
+- http_stats() 给出各主机的请求数与新建连接数，用来确认连接复用
+"""
+from __future__ import annotations
+
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .config import CFG
+
+
+# 幂等请求遇到这些状态码时重试（遵循 Retry-After）
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class _Host:
+    def __init__(self, session: requests.Session, adapter: HTTPAdapter, limit: int) -> None:
+        self.session = session
+        self.adapter = adapter
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.requests = 0
+        self.errors = 0
+
+
+class HttpClient:
+    """按主机管理连接池的 HTTP 客户端，线程安全"""
+
+    def __init__(self, *, pool_size: int, max_per_host: int, retries: int, backoff: float) -> None:
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._hosts: dict[str, _Host] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> _Host:
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None:
+                retry = Retry(
+                    total=self.retries,
+                    # 读取超时时对方可能已在处理，且重试会把调用方的 timeout 成倍放大
+                    read=0,
+                    backoff_factor=self.backoff,
+                    status_forcelist=_RETRY_STATUS,
+                    raise_on_status=False,
+                    respect_retry_after_header=True,
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                h = self._hosts[host] = _Host(session, adapter, self.max_per_host)
+            return h
+
+    def session_for(self, host: str) -> requests.Session:
+        """某主机的共享 Session（供自带请求逻辑的 SDK 使用）"""
+        return self._host(host).session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        h = self._host(urlsplit(url).netloc)
+        with h.semaphore:
+            with self._lock:
+                h.requests += 1
+            try:
+                return h.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                with self._lock:
+                    h.errors += 1
+                raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """各主机的 {requests, connections, errors}；connections 为新建的连接数，越少说明复用越好"""
+        out = {}
+        with self._lock:
+            hosts = list(self._hosts.items())
+        for host, h in hosts:
+            pools = h.adapter.poolmanager.pools
+            connections = sum(getattr(pools[k], "num_connections", 0) for k in list(pools.keys()))
+            out[host] = {"requests": h.requests, "connections": connections, "errors": h.errors}
+        out.update(_openai_stats())
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            for h in self._hosts.values():
+                h.session.close()
+            self._hosts.clear()
+
+
+_CLIENT: HttpClient | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = HttpClient(
+                    pool_size=CFG.http_pool_size,
+                    max_per_host=CFG.http_max_per_host,
+                    retries=CFG.http_retries,
+                    backoff=CFG.http_backoff,
+                )
+    return _CLIENT
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return get_http_client().get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return get_http_client().post(url, **kwargs)
+
+
+# ---- OpenAI 新版 SDK 基于 httpx，单独一个共享的 httpx.Client ----
+
+_OPENAI_HTTP = None
+_OPENAI_STATS: dict[str, dict] = {}
+
+
+def _count_openai_response(response) -> None:
+    host = response.request.url.host
+    with _CLIENT_LOCK:
+        s = _OPENAI_STATS.setdefault(host, {"requests": 0, "streams": set(), "errors": 0})
+        s["requests"] += 1
+        if response.status_code >= 500:
+            s["errors"] += 1
+        stream = response.extensions.get("network_stream")
+        if stream is not None:
+            s["streams"].add(id(stream))
+
+
+def _openai_stats() -> dict[str, dict[str, int]]:
+    with _CLIENT_LOCK:
+        return {
+            host: {"requests": s["requests"], "connections": len(s["streams"]), "errors": s["errors"]}
+            for host, s in _OPENAI_STATS.items()
+        }
+
+
+def openai_http_client():
+    """供 OpenAI(http_client=...) 使用的共享 httpx.Client；没有 httpx 时返回 None（SDK 自建连接）"""
+    global _OPENAI_HTTP
+    if _OPENAI_HTTP is None:
+        try:
+            import httpx  # type: ignore
+        except ImportError:
+            return None
+        with _CLIENT_LOCK:
+            if _OPENAI_HTTP is None:
+                _OPENAI_HTTP = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=CFG.http_max_per_host,
+                        max_keepalive_connections=CFG.http_pool_size,
+                    ),
+                    transport=httpx.HTTPTransport(retries=CFG.http_retries),
+                    event_hooks={"response": [_count_openai_response]},
+                )
+    return _OPENAI_HTTP
+
+
+def http_stats() -> dict[str, dict[str, int]]:
+    return get_http_client().stats()
+
+
+def format_http_stats() -> str:
+    parts = [
+        f"{host} 请求{s['requests']}/连接{s['connections']}" + (f"/失败{s['errors']}" if s["errors"] else "")
+        for host, s in http_stats().items()
+    ]
+    return "，".join(parts) if parts else "无外部请求"
@@ -0,0 +1,124 @@
+"""
+流式 JPEG → PDF 写入
+每页一张 JPEG，原样以 DCTDecode 嵌入（不解码、不重新压缩），写完即落盘；
+内存中只保留每个对象的偏移量，页数再多也不会增长到图像大小的量级。
+"""
+from __future__ import annotations
+
+import io
+import os
+from pathlib import Path
+
+from PIL import Image
+
+
+_COLORSPACES = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+
+# 对象 1、2 固定为 Catalog 与 Pages，在 close() 时写出（xref 允许对象乱序）
+_CATALOG_ID = 1
+_PAGES_ID = 2
+
+
+class JpegPdfWriter:
+    """用法：
+
+        with JpegPdfWriter(path, dpi=150) as pdf:
+            for jpeg_bytes in pages:
+                pdf.add_page(jpeg_bytes)
+    """
+
+    def __init__(self, path: Path, *, dpi: int = 150) -> None:
+        self.path = Path(path)
+        self.dpi = dpi
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self._fp = open(self._tmp, "wb")
+        self._offsets: dict[int, int] = {}
+        self._page_ids: list[int] = []
+        self._next_id = _PAGES_ID + 1
+        self._fp.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _begin(self, obj_id: int) -> None:
+        self._offsets[obj_id] = self._fp.tell()
+        self._fp.write(f"{obj_id} 0 obj\n".encode("ascii"))
+
+    def _write_obj(self, obj_id: int, body: str) -> None:
+        self._begin(obj_id)
+        self._fp.write(body.encode("ascii"))
+        self._fp.write(b"\nendobj\n")
+
+    def _write_stream(self, obj_id: int, header: str, data: bytes) -> None:
+        self._begin(obj_id)
+        self._fp.write(f"<< {header} /Length {len(data)} >>\nstream\n".encode("ascii"))
+        self._fp.write(data)
+        self._fp.write(b"\nendstream\nendobj\n")
+
+    def add_page(self, jpeg: bytes) -> None:
+        """追加一页，页面尺寸按图像像素与 dpi 换算"""
+        with Image.open(io.BytesIO(jpeg)) as im:
+            if im.format != "JPEG":
+                raise ValueError(f"仅支持 JPEG 页面，收到 {im.format}")
+            (w, h), mode = im.size, im.mode
+        colorspace = _COLORSPACES.get(mode)
+        if colorspace is None:
+            raise ValueError(f"不支持的 JPEG 色彩模式: {mode}")
+        pw = round(w * 72 / self.dpi, 2)
+        ph = round(h * 72 / self.dpi, 2)
+
+        img_id, content_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+        decode = " /Decode [1 0 1 0 1 0 1 0]" if mode == "CMYK" else ""
+        self._write_stream(
+            img_id,
+            f"/Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace {colorspace} "
+            f"/BitsPerComponent 8 /Filter /DCTDecode{decode}",
+            jpeg,
+        )
+        self._write_stream(content_id, "", f"q {pw} 0 0 {ph} 0 0 cm /Im0 Do Q".encode("ascii"))
+        self._write_obj(
+            page_id,
+            f"<< /Type /Page /Parent {_PAGES_ID} 0 R /MediaBox [0 0 {pw} {ph}] "
+            f"/Resources << /XObject << /Im0 {img_id} 0 R >> >> /Contents {content_id} 0 R >>",
+        )
+        self._page_ids.append(page_id)
+
+    def close(self) -> Path:
+        """写出页树、交叉引用表与文件尾，原子替换到目标路径"""
+        if self._fp.closed:
+            return self.path
+        kids = " ".join(f"{i} 0 R" for i in self._page_ids)
+        self._write_obj(_PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_obj(_CATALOG_ID, f"<< /Type /Catalog /Pages {_PAGES_ID} 0 R >>")
+
+        xref_at = self._fp.tell()
+        size = self._next_id
+        self._fp.write(f"xref\n0 {size}\n".encode("ascii"))
+        self._fp.write(b"0000000000 65535 f \n")
+        for obj_id in range(1, size):
+            self._fp.write(f"{self._offsets[obj_id]:010d} 00000 n \n".encode("ascii"))
+        self._fp.write(f"trailer\n<< /Size {size} /Root {_CATALOG_ID} 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode("ascii"))
+        self._fp.close()
+        self._tmp.replace(self.path)
+        return self.path
+
+    def abort(self) -> None:
+        """放弃写入并删除临时文件"""
+        if not self._fp.closed:
+            self._fp.close()
+        try:
+            self._tmp.unlink()
+        except OSError:
+            pass
+
+    def __enter__(self) -> "JpegPdfWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
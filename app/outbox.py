@@ -0,0 +1,304 @@
+"""
+微信发送队列（outbox）
+生成海报后只把待发送内容写入持久队列（<cache_dir>/outbox.sqlite3）就返回，
+由后台 DeliveryWorker 负责实际发送：
+
+- 同一张海报（按图片内容 sha256）只入队一次，重跑、重试不会重复发送；
+  已放弃（failed）的海报再次入队时重新排队，已送达的目标不会重复发送
+- 发往多个目标时（app/fanout.py）记录已送达的目标，重试只补发失败的目标
+- 发送失败按指数退避加随机抖动重试，超过 CFG.outbox_max_attempts 次标记为 failed
+- 队列在磁盘上，进程退出或崩溃后未发出的条目下次启动继续发送；
+  发送中崩溃的条目在租约到期后重新发送
+- 送达后删除图片，只留哈希用于去重；已发送/已放弃的记录 CFG.outbox_keep_days 天后删除
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Literal
+
+from .config import CFG
+
+
+# 单次发送的租约（秒）：持有者崩溃后，条目在此之后可被重新领取
+_LEASE_SECONDS = 300
+# 退避上限（秒）
+_MAX_BACKOFF_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    poster_hash TEXT NOT NULL UNIQUE,
+    image BLOB,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    delivered TEXT NOT NULL DEFAULT '[]',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+# 发送函数：(图片字节, 标题, 描述, 已送达目标) -> 是否全部成功；新送达的目标加入集合中
+Deliver = Callable[[bytes, str, str, set], bool]
+
+# 入队结果：新加入 / 此前已放弃、重新排队 / 已在队列中或已发送
+EnqueueResult = Literal["added", "requeued", "duplicate"]
+
+
+def backoff_seconds(attempts: int, base: float) -> float:
+    """第 attempts 次失败后的等待时间：指数增长，取上限后在 [50%, 100%] 之间随机抖动"""
+    delay = min(_MAX_BACKOFF_SECONDS, base * (2 ** (attempts - 1)))
+    return delay * (0.5 + random.random() / 2)
+
+
+class Outbox:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(_SCHEMA)
+            # 早期的队列文件没有 delivered 列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(deliveries)")}
+            if "delivered" not in columns:
+                conn.execute("ALTER TABLE deliveries ADD COLUMN delivered TEXT NOT NULL DEFAULT '[]'")
+            # 早期的队列文件 image 列为 NOT NULL，送达后无法清除图片，按新表结构重建
+            if any(row[1] == "image" and row[3] for row in conn.execute("PRAGMA table_info(deliveries)")):
+                self._rebuild(conn)
+
+    @staticmethod
+    def _rebuild(conn: sqlite3.Connection) -> None:
+        columns = ", ".join(row[1] for row in conn.execute("PRAGMA table_info(deliveries)"))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("ALTER TABLE deliveries RENAME TO deliveries_old")
+            conn.execute(_SCHEMA)
+            conn.execute(f"INSERT INTO deliveries ({columns}) SELECT {columns} FROM deliveries_old")
+            conn.execute("DROP TABLE deliveries_old")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, image: bytes, title: str, description: str) -> EnqueueResult:
+        """加入队列；同一图片此前已放弃（failed）时清零重试次数重新排队，已在队列中或已发送时不变"""
+        self.prune()
+        now = time.time()
+        poster_hash = hashlib.sha256(image).hexdigest()
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO deliveries (poster_hash, image, title, description, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (poster_hash, image, title, description, now, now, now),
+            )
+            if cur.rowcount == 1:
+                return "added"
+            cur = conn.execute(
+                "UPDATE deliveries SET status = 'pending', attempts = 0, next_attempt_at = ?, last_error = NULL, updated_at = ? "
+                "WHERE poster_hash = ? AND status = 'failed'",
+                (now, now, poster_hash),
+            )
+            return "requeued" if cur.rowcount == 1 else "duplicate"
+
+    def claim(self) -> tuple[int, bytes, str, str, int, set[str]] | None:
+        """领取一个到期的条目并加租约，返回 (id, 图片, 标题, 描述, 已尝试次数, 已送达目标)"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT id, image, title, description, attempts, delivered FROM deliveries "
+                "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE deliveries SET status = 'sending', next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                    (now + _LEASE_SECONDS, now, row[0]),
+                )
+            conn.execute("COMMIT")
+            return None if row is None else (*row[:5], set(json.loads(row[5])))
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, item_id: int, delivered: set[str]) -> None:
+        """标记为已送达并删除图片（哈希保留用于去重）"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE deliveries SET status = 'done', image = NULL, attempts = attempts + 1, last_error = NULL, delivered = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(sorted(delivered), ensure_ascii=False), time.time(), item_id),
+            )
+
+    def fail(self, item_id: int, attempts: int, error: str, delivered: set[str]) -> str:
+        """记录一次失败，返回新状态（pending 等待重试，或 failed 不再重试）"""
+        attempts += 1
+        now = time.time()
+        if attempts >= CFG.outbox_max_attempts:
+            status, next_at = "failed", now
+        else:
+            status, next_at = "pending", now + backoff_seconds(attempts, CFG.outbox_backoff_seconds)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE deliveries SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, delivered = ?, updated_at = ? WHERE id = ?",
+                (status, attempts, next_at, error, json.dumps(sorted(delivered), ensure_ascii=False), now, item_id),
+            )
+        return status
+
+    def next_due_in(self) -> float | None:
+        """距离下一个待发送条目到期的秒数；队列中没有待发送条目时返回 None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) FROM deliveries WHERE status IN ('pending', 'sending')"
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def prune(self, keep_days: float | None = None) -> int:
+        """删除超过 keep_days 天（默认 CFG.outbox_keep_days）的已发送/已放弃记录，返回删除条数"""
+        keep_days = CFG.outbox_keep_days if keep_days is None else keep_days
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "DELETE FROM deliveries WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - keep_days * 86400,),
+            )
+        return cur.rowcount
+
+    def counts(self) -> dict[str, int]:
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM deliveries GROUP BY status").fetchall())
+
+
+class DeliveryWorker:
+    """从 outbox 领取条目并发送的后台线程"""
+
+    def __init__(self, outbox: Outbox, deliver: Deliver, idle_seconds: float = 5.0) -> None:
+        self.outbox = outbox
+        self.deliver = deliver
+        self.idle_seconds = idle_seconds
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def process_one(self) -> bool:
+        """发送一个到期条目；没有到期条目时返回 False"""
+        item = self.outbox.claim()
+        if item is None:
+            return False
+        item_id, image, title, description, attempts, delivered = item
+        try:
+            ok = self.deliver(image, title, description, delivered)
+            error = "" if ok else "发送返回失败"
+        except Exception as e:
+            ok, error = False, str(e)
+        if ok:
+            self.outbox.complete(item_id, delivered)
+            print(f"[OK] 发送队列 #{item_id} 已送达")
+        else:
+            status = self.outbox.fail(item_id, attempts, error, delivered)
+            tail = "，稍后重试" if status == "pending" else "，不再重试"
+            print(f"[WARN] 发送队列 #{item_id} 第{attempts + 1}次发送失败: {error}{tail}")
+        return True
+
+    def drain(self, timeout: float) -> bool:
+        """前台发送直到队列清空或超时（用于单次运行）；返回是否已清空"""
+        self.outbox.prune()
+        deadline = time.time() + timeout
+        while True:
+            while self.process_one():
+                pass
+            wait = self.outbox.next_due_in()
+            if wait is None:
+                return True
+            if time.time() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def notify(self) -> None:
+        """有新条目入队时唤醒后台线程"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                while self.process_one():
+                    pass
+                wait = self.outbox.next_due_in()
+            except Exception as e:
+                print(f"[ERROR] 发送队列异常: {e}")
+                wait = None
+            self._wake.wait(self.idle_seconds if wait is None else min(wait, self.idle_seconds))
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="delivery-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_OUTBOX: Outbox | None = None
+_WORKER: DeliveryWorker | None = None
+_LOCK = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    global _OUTBOX
+    with _LOCK:
+        if _OUTBOX is None:
+            _OUTBOX = Outbox(CFG.cache_dir / "outbox.sqlite3")
+        return _OUTBOX
+
+
+def _wechat_deliver(image: bytes, title: str, description: str, delivered: set[str]) -> bool:
+    """发往 wechat_config.json 中配置的全部渠道与目标，跳过已送达的"""
+    from .fanout import format_results, get_dispatcher
+
+    dispatcher = get_dispatcher()
+    if not dispatcher.channels:
+        # 没有可用渠道时不能算作已送达，留在队列中等配置修好后重试
+        print("[ERROR] 未配置微信发送渠道（wechat_config.json），海报未发送")
+        return False
+    results = dispatcher.dispatch(
+        image, title or "吉祥号码专场", description or "限时优惠,先到先得!", skip=delivered
+    )
+    if results:
+        print(f"[INFO] {format_results(results)}")
+    delivered.update(r.key for r in results if r.ok)
+    return all(r.ok for r in results)
+
+
+def get_delivery_worker() -> DeliveryWorker:
+    global _WORKER
+    outbox = get_outbox()
+    with _LOCK:
+        if _WORKER is None:
+            _WORKER = DeliveryWorker(outbox, _wechat_deliver)
+        return _WORKER
+
+
+def enqueue_poster(image: bytes, title: str, description: str) -> EnqueueResult:
+    """把海报加入发送队列并唤醒后台线程（若已启动），返回入队结果（见 Outbox.enqueue）"""
+    result = get_outbox().enqueue(image, title, description)
+    if _WORKER is not None:
+        _WORKER.notify()
+    return result
@@ -0,0 +1,229 @@
+"""
+海报渲染公共核心
+各渲染器（poster_generator_v2、旧版 poster_generator）共用的字体、文字、渐变、
+号码、水印绘制，以及编码、变体、渲染缓存与落盘流程。性能优化放在这里，
+所有渲染器同时受益。
+"""
+from __future__ import annotations
+
+import io
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Callable, Sequence
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .glyph_atlas import get_atlas, is_digits
+from .poster_output import RenderedPoster, encode_variants
+from .render_profile import NULL_PROFILE, RenderProfile
+
+
+def _fmt_num(val) -> str:
+    if val is None:
+        return "--"
+    try:
+        f = float(val)
+    except Exception:
+        return str(val)
+    if abs(f - int(f)) < 1e-6:
+        return str(int(f))
+    s = f"{f:.1f}"
+    return s.rstrip("0").rstrip(".")
+
+
+@lru_cache(maxsize=256)
+def _load_font(font_path: str | None, size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    if font_path:
+        try:
+            return ImageFont.truetype(font_path, size=size)
+        except Exception:
+            pass
+    try:
+        return ImageFont.truetype("arial.ttf", size=size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+def _text_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont) -> tuple[int, int]:
+    bbox = draw.textbbox((0, 0), text, font=font, stroke_width=0)
+    return (bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+def _draw_centered(draw: ImageDraw.ImageDraw, x_center: int, y: int, text: str, font, fill=(255, 255, 255), stroke=0, stroke_fill=(0, 0, 0)) -> int:
+    w, h = _text_size(draw, text, font)
+    draw.text((x_center - w // 2, y), text, font=font, fill=fill, stroke_width=stroke, stroke_fill=stroke_fill)
+    return h
+
+
+def _draw_centered_bold(draw: ImageDraw.ImageDraw, x_center: int, y: int, text: str, font, fill=(0, 0, 0)) -> int:
+    w, h = _text_size(draw, text, font)
+    x = x_center - w // 2
+    draw.text((x, y), text, font=font, fill=fill)
+    draw.text((x + 1, y), text, font=font, fill=fill)
+    return h
+
+
+def _shrink_to_fit(draw, text, font_path: str | None, max_width: int, start_size: int) -> ImageFont.ImageFont:
+    size = start_size
+    while size >= 14:
+        font = _load_font(font_path, size)
+        w, _ = _text_size(draw, text, font)
+        if w <= max_width:
+            return font
+        size -= 2
+    return _load_font(font_path, 14)
+
+
+def _wrap_text_by_width(draw, text: str, font, max_width: int) -> list[str]:
+    lines: list[str] = []
+    buf = ""
+    for ch in text:
+        test = buf + ch
+        w, _ = _text_size(draw, test, font)
+        if w <= max_width:
+            buf = test
+        else:
+            if buf:
+                lines.append(buf)
+            buf = ch
+    if buf:
+        lines.append(buf)
+    return lines
+
+
+def _wrap_fit_lines(draw, text: str, font_path: str | None, *, max_width: int, max_lines: int, start_size: int, min_size: int = 16):
+    """Find a font size and wrapped lines that fit within max_width and max_lines."""
+    size = start_size
+    chosen_font = _load_font(font_path, size)
+    lines = _wrap_text_by_width(draw, text, chosen_font, max_width)
+    while (len(lines) > max_lines or any(_text_size(draw, ln, chosen_font)[0] > max_width for ln in lines)) and size > min_size:
+        size -= 2
+        chosen_font = _load_font(font_path, size)
+        lines = _wrap_text_by_width(draw, text, chosen_font, max_width)
+    return chosen_font, lines
+
+
+def _v_gradient(size: tuple[int, int], top_rgb: tuple[int, int, int], bottom_rgb: tuple[int, int, int]) -> Image.Image:
+    """竖向渐变；主题素材包（theme_assets）里已烘焙的直接展开，否则现场计算"""
+    from .theme_assets import baked_gradient
+
+    img = baked_gradient(size, top_rgb, bottom_rgb)
+    return img if img is not None else _compute_gradient(size, top_rgb, bottom_rgb)
+
+
+def _compute_gradient(size: tuple[int, int], top_rgb: tuple[int, int, int], bottom_rgb: tuple[int, int, int]) -> Image.Image:
+    w, h = size
+    base = Image.new("RGB", (w, h), top_rgb)
+    # 遮罩每行取值相同：先生成 1 像素宽的一列再横向拉伸，底色直接按遮罩填充，
+    # 省去逐行画线与一整帧的底色图
+    column = Image.frombytes("L", (1, h), bytes(int(255 * y / (h - 1)) for y in range(h)))
+    base.paste(bottom_rgb, (0, 0, w, h), column.resize((w, h), Image.NEAREST))
+    return base
+
+
+def _rounded_rect(draw: ImageDraw.ImageDraw, box, radius: int, fill, outline=None, width=1):
+    draw.rounded_rectangle(box, radius=radius, fill=fill, outline=outline, width=width)
+
+
+def _parse_subtitle(subtitle: str) -> tuple[str, str]:
+    """副标题按全角或半角竖线拆成 (日期, 分类说明)"""
+    sep = "｜" if "｜" in subtitle else ("|" if "|" in subtitle else None)
+    if sep:
+        date_txt, cat_txt = [x.strip() for x in subtitle.split(sep, 1)]
+        return date_txt, cat_txt
+    return "", subtitle
+
+
+def _draw_number(draw: ImageDraw.ImageDraw, cx: int, y: int, number: str, font_path: str | None, max_w: int, start_size: int, fill=(28, 35, 52)) -> int:
+    """按 _shrink_to_fit 的规则选字号并以 cx 居中绘制号码，返回号码高度
+
+    纯数字号码走字形图集（逐像素一致，省去 FreeType 排版与栅格化），其余回退到 draw.text。
+    """
+    if is_digits(number):
+        size = start_size
+        atlas = None
+        while size >= 14:
+            atlas = get_atlas(font_path, size)
+            if atlas is None or atlas.text_size(number)[0] <= max_w:
+                break
+            size -= 2
+        else:
+            atlas = get_atlas(font_path, 14)
+        if atlas is not None:
+            n_w, n_h = atlas.text_size(number)
+            atlas.draw(draw, (cx - n_w // 2, y), number, fill=fill)
+            return n_h
+
+    num_font = _shrink_to_fit(draw, number, font_path, max_w, start_size)
+    n_w, n_h = _text_size(draw, number, num_font)
+    draw.text((cx - n_w // 2, y), number, font=num_font, fill=fill)
+    return n_h
+
+
+@lru_cache(maxsize=16)
+def _watermark_patch(label: str, wm_font) -> tuple[Image.Image, int, int]:
+    """只覆盖文字范围的半透明水印图块及其相对绘制原点的偏移，同一水印所有卡片共用"""
+    x0, y0, x1, y1 = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), label, font=wm_font)
+    patch = Image.new("RGBA", (max(1, x1 - x0), max(1, y1 - y0)), (0, 0, 0, 0))
+    ImageDraw.Draw(patch).text((-x0, -y0), label, font=wm_font, fill=(55, 120, 240, 72))
+    return patch, x0, y0
+
+
+def _draw_watermark(img: Image.Image, draw: ImageDraw.ImageDraw, cx: int, bottom: int, label: str, wm_font) -> None:
+    """以 cx 居中、底边对齐 bottom 叠加半透明品牌水印
+
+    只在文字范围内按 alpha 合成，像素与整帧透明图层叠加的结果一致。
+    """
+    wm_w, wm_h = _text_size(draw, label, wm_font)
+    wx = cx - wm_w // 2
+    wy = bottom - wm_h
+    patch, ox, oy = _watermark_patch(label, wm_font)
+    img.paste(patch, (wx + ox, wy + oy), patch)
+
+
+def save_jpeg(img: Image.Image, fp: BinaryIO) -> None:
+    img.save(fp, format="JPEG", quality=92, subsampling=0)
+
+
+def render_with_cache(
+    compose: Callable[..., Image.Image],
+    params: dict,
+    *,
+    renderer: str,
+    output_path: Path | None = None,
+    variants: Sequence[str] = (),
+    use_cache: bool = True,
+    profile: RenderProfile | None = None,
+) -> RenderedPoster:
+    """渲染器共用的出图流程：查渲染缓存 → compose(**params) → 编码主图与变体 → 写缓存 → 落盘
+
+    renderer 为渲染器名称，参与缓存键，不同渲染器的结果互不混用。
+    """
+    prof = profile or NULL_PROFILE
+
+    cache = key = poster = None
+    if use_cache:
+        from .render_cache import get_render_cache, render_key
+
+        cache = get_render_cache()
+        if cache is not None:
+            with prof.stage("cache_lookup"):
+                key = render_key(params, renderer=renderer)
+                poster = cache.get(key, variants)
+
+    if poster is None:
+        img = compose(**params, profile=profile)
+        with prof.stage("encode"):
+            buf = io.BytesIO()
+            save_jpeg(img, buf)
+        with prof.stage("variants"):
+            encoded = encode_variants(img, variants) if variants else {}
+        poster = RenderedPoster(data=buf.getvalue(), variants=encoded)
+        if cache is not None:
+            with prof.stage("cache_store"):
+                cache.put(key, poster)
+
+    if output_path is not None:
+        with prof.stage("save"):
+            poster.save(output_path)
+    return poster
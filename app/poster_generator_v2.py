@@ -1,115 +1,109 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from pathlib import Path
 from typing import Sequence
 
-from PIL import Image, ImageDraw, ImageFont
-
+from PIL import Image, ImageDraw
+
+from .glyph_atlas import get_atlas
+from .poster_core import (
+    _draw_centered,
+    _draw_centered_bold,
+    _draw_number,
+    _draw_watermark,
+    _fmt_num,
+    _load_font,
+    _parse_subtitle,
+    _rounded_rect,
+    _shrink_to_fit,
+    _text_size,
+    _v_gradient,
+    _wrap_fit_lines,
+    _wrap_text_by_width,
+    render_with_cache,
+)
+from .poster_layout import CellLayout, PosterLayout, cat_font_start, compute_layout
+from .poster_output import RenderedPoster
+from .render_profile import NULL_PROFILE, RenderProfile
 from .theme_system import ThemeColors
 
 
-def _fmt_num(val) -> str:
-    if val is None:
-        return "--"
-    try:
-        f = float(val)
-    except Exception:
-        return str(val)
-    if abs(f - int(f)) < 1e-6:
-        return str(int(f))
-    s = f"{f:.1f}"
-    return s.rstrip("0").rstrip(".")
-
-
-def _load_font(font_path: str | None, size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
-    if font_path:
-        try:
-            return ImageFont.truetype(font_path, size=size)
-        except Exception:
-            pass
-    try:
-        return ImageFont.truetype("arial.ttf", size=size)
-    except Exception:
-        return ImageFont.load_default()
-
-
-def _text_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont) -> tuple[int, int]:
-    bbox = draw.textbbox((0, 0), text, font=font, stroke_width=0)
-    return (bbox[2] - bbox[0], bbox[3] - bbox[1])
-
-
-def _draw_centered(draw: ImageDraw.ImageDraw, x_center: int, y: int, text: str, font, fill=(255, 255, 255)) -> int:
-    w, h = _text_size(draw, text, font)
-    draw.text((x_center - w // 2, y), text, font=font, fill=fill)
-    return h
-
-
-def _draw_centered_bold(draw: ImageDraw.ImageDraw, x_center: int, y: int, text: str, font, fill=(0, 0, 0)) -> int:
-    w, h = _text_size(draw, text, font)
-    x = x_center - w // 2
-    draw.text((x, y), text, font=font, fill=fill)
-    draw.text((x + 1, y), text, font=font, fill=fill)
-    return h
-
-
-def _shrink_to_fit(draw, text, font_path: str | None, max_width: int, start_size: int) -> ImageFont.ImageFont:
-    size = start_size
-    while size >= 14:
-        font = _load_font(font_path, size)
-        w, _ = _text_size(draw, text, font)
-        if w <= max_width:
-            return font
-        size -= 2
-    return _load_font(font_path, 14)
-
-
-def _wrap_text_by_width(draw, text: str, font, max_width: int) -> list[str]:
-    lines: list[str] = []
-    buf = ""
-    for ch in text:
-        test = buf + ch
-        w, _ = _text_size(draw, test, font)
-        if w <= max_width:
-            buf = test
-        else:
-            if buf:
-                lines.append(buf)
-            buf = ch
-    if buf:
-        lines.append(buf)
-    return lines
-
-
-def _wrap_fit_lines(draw, text: str, font_path: str | None, *, max_width: int, max_lines: int, start_size: int, min_size: int = 16):
-    size = start_size
-    chosen_font = _load_font(font_path, size)
-    lines = _wrap_text_by_width(draw, text, chosen_font, max_width)
-    while (len(lines) > max_lines or any(_text_size(draw, ln, chosen_font)[0] > max_width for ln in lines)) and size > min_size:
-        size -= 2
-        chosen_font = _load_font(font_path, size)
-        lines = _wrap_text_by_width(draw, text, chosen_font, max_width)
-    return chosen_font, lines
-
-
-def _v_gradient(size: tuple[int, int], top_rgb: tuple[int, int, int], bottom_rgb: tuple[int, int, int]) -> Image.Image:
-    w, h = size
-    base = Image.new("RGB", (w, h), top_rgb)
-    top = Image.new("RGB", (w, h), bottom_rgb)
-    mask = Image.new("L", (w, h))
-    md = ImageDraw.Draw(mask)
-    for y in range(h):
-        md.line([(0, y), (w, y)], fill=int(255 * y / (h - 1)))
-    base.paste(top, (0, 0), mask)
-    return base
-
-
-def _rounded_rect(draw: ImageDraw.ImageDraw, box, radius: int, fill, outline=None, width=1):
-    draw.rounded_rectangle(box, radius=radius, fill=fill, outline=outline, width=width)
+def _render_static_layers(theme: ThemeColors, layout: PosterLayout, n_cards: int) -> Image.Image:
+    """绘制与文字无关的静态图层：背景、头尾色带、白色容器与空卡片框。"""
+    W, H = layout.size
+    img = _v_gradient((W, H), theme.bg_top, theme.bg_bottom)
+    img.paste(_v_gradient((W, layout.header_h), theme.header_top, theme.header_bottom), (0, 0))
+    draw = ImageDraw.Draw(img)
+    _rounded_rect(draw, layout.container_box, radius=28, fill=(255, 255, 255), outline=theme.card_border, width=2)
+    for cell in layout.cells[:n_cards]:
+        _rounded_rect(draw, cell.box, radius=18, fill=theme.card_fill, outline=theme.card_border, width=2)
+    img.paste(_v_gradient((W, layout.footer_h), theme.footer_top, theme.footer_bottom), (0, H - layout.footer_h))
+    return img
+
+
+@lru_cache(maxsize=16)
+def _container_mask(layout: PosterLayout) -> Image.Image:
+    """容器（含其中的卡片框）覆盖的像素，与 _render_static_layers 画容器时完全一致"""
+    mask = Image.new("L", layout.size, 0)
+    _rounded_rect(ImageDraw.Draw(mask), layout.container_box, radius=28, fill=255, outline=255, width=2)
+    return mask
+
+
+def _header_layout(subtitle: str, font_path: str | None, size: tuple[int, int], grid_cols: int, grid_rows: int, subtitle_max_lines: int):
+    """解析副标题并折行分类说明，按其行数取布局，返回 (date_txt, cat_font, cat_lines, layout)"""
+    date_txt, cat_txt = _parse_subtitle(subtitle)
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    max_w, start_size = cat_font_start(size)
+    cat_font, cat_lines = _wrap_fit_lines(draw, cat_txt, font_path, max_width=max_w, max_lines=subtitle_max_lines, start_size=start_size)
+    layout = compute_layout(tuple(size), grid_cols, grid_rows, len(cat_lines))
+    return date_txt, cat_font, cat_lines, layout
+
+
+def warm_render_caches(
+    *,
+    font_path: str | None,
+    subtitle: str = "",
+    items: Sequence[dict] = (),
+    size: tuple[int, int] = (1080, 1440),
+    grid_cols: int = 3,
+    grid_rows: int = 3,
+    subtitle_max_lines: int = 2,
+    theme: ThemeColors | None = None,
+    templates: bool = True,
+    **_ignored,
+) -> str:
+    """预热字体与静态模板缓存并返回模板键；参数与 render_poster 相同，多余参数忽略。
+
+    templates=False 时只预热字体，模板留到首次使用时再从磁盘加载。
+    """
+    if theme is None:
+        from .theme_system import THEMES
+        theme = THEMES["默认蓝调"]
+    from .poster_template import get_static_template, template_key
+
+    _, _, _, layout = _header_layout(subtitle, font_path, size, grid_cols, grid_rows, subtitle_max_lines)
+    n_cards = min(len(items), layout.capacity)
+    if templates:
+        get_static_template(theme, layout, n_cards)
+
+    for font_size in (
+        layout.title_font_size,
+        layout.date_font_size,
+        layout.num_font_size,
+        layout.meta_font_size,
+        layout.wm_font_size,
+        layout.info_font_size,
+        layout.tagline_font_size,
+    ):
+        _load_font(font_path, font_size)
+    get_atlas(font_path, layout.num_font_size)
+    return template_key(theme, layout, n_cards)
 
 
 def render_poster(
     *,
-    output_path: Path,
+    output_path: Path | None = None,
     font_path: str | None,
     title: str,
     subtitle: str,
@@ -123,133 +117,157 @@ def render_poster(
     hotline: str | None = None,
     subtitle_max_lines: int = 2,
     theme: ThemeColors | None = None,
-) -> None:
+    variants: Sequence[str] = (),
+    use_cache: bool = True,
+    profile: RenderProfile | None = None,
+) -> RenderedPoster:
+    """渲染海报并编码为 JPEG，结果以内存字节返回
+
+    output_path 为可选的落盘位置；variants 为 poster_output.VARIANTS 中的变体名，
+    会复用同一画布编码，落盘时写在主文件旁。输入完全相同时直接复用渲染缓存。
+    传入 profile（render_profile.RenderProfile）可记录各阶段耗时。
+    """
+    params = dict(
+        font_path=font_path,
+        title=title,
+        subtitle=subtitle,
+        tagline=tagline,
+        items=items,
+        size=size,
+        branding_label=branding_label,
+        grid_cols=grid_cols,
+        grid_rows=grid_rows,
+        location=location,
+        hotline=hotline,
+        subtitle_max_lines=subtitle_max_lines,
+        theme=theme,
+    )
+    return render_with_cache(
+        compose_poster,
+        params,
+        renderer="v2",
+        output_path=output_path,
+        variants=variants,
+        use_cache=use_cache,
+        profile=profile,
+    )
+
+
+def compose_poster(
+    *,
+    font_path: str | None,
+    title: str,
+    subtitle: str,
+    tagline: str,
+    items: Sequence[dict],
+    size: tuple[int, int] = (1080, 1440),
+    branding_label: str | None = None,
+    grid_cols: int = 3,
+    grid_rows: int = 3,
+    location: str | None = None,
+    hotline: str | None = None,
+    subtitle_max_lines: int = 2,
+    theme: ThemeColors | None = None,
+    profile: RenderProfile | None = None,
+) -> Image.Image:
+    """绘制海报画布（RGB），不做编码与落盘"""
     W, H = size
+    prof = profile or NULL_PROFILE
 
     # 使用主题配色或默认配色
     if theme is None:
         from .theme_system import THEMES
         theme = THEMES["默认蓝调"]
 
-    # Background
-    img = _v_gradient((W, H), theme.bg_top, theme.bg_bottom).convert("RGBA")
-    draw = ImageDraw.Draw(img)
-
     # Subtitle parsing and header height
-    sep = "｜" if "｜" in subtitle else ("|" if "|" in subtitle else None)
-    if sep:
-        date_txt, cat_txt = [x.strip() for x in subtitle.split(sep, 1)]
-    else:
-        date_txt, cat_txt = "", subtitle
-
-    cat_font_probe, cat_lines_probe = _wrap_fit_lines(draw, cat_txt, font_path, max_width=int(W * 0.88), max_lines=subtitle_max_lines, start_size=int(H * 0.036))
-    header_ratio = 0.26 + max(0, len(cat_lines_probe) - 1) * 0.03
-    header_h = int(H * min(0.34, header_ratio))
-    header = _v_gradient((W, header_h), theme.header_top, theme.header_bottom)
-    img.paste(header, (0, 0))
-
-    # Title
-    title_font = _shrink_to_fit(draw, title, font_path, int(W * 0.9), int(H * 0.070))
-    t_h = _draw_centered(draw, W // 2, int(header_h * 0.20), title, title_font, fill=theme.title_color)
-
-    # Date and category with extra spacing
-    y = int(header_h * 0.20) + t_h + int(H * 0.020)  # 增加间隔
-    if date_txt:
-        date_font = _shrink_to_fit(draw, date_txt, font_path, int(W * 0.9), int(H * 0.031))
-        _draw_centered(draw, W // 2, y, date_txt, date_font, fill=theme.subtitle_color)
-        y += _text_size(draw, date_txt, date_font)[1] + int(H * 0.018)  # 增加间隔
-
-    cat_font, cat_lines = _wrap_fit_lines(draw, cat_txt, font_path, max_width=int(W * 0.88), max_lines=subtitle_max_lines, start_size=int(H * 0.036))
-    for ln in cat_lines:
-        _draw_centered(draw, W // 2, y, ln, cat_font, fill=theme.subtitle_color)
-        y += _text_size(draw, ln, cat_font)[1] + int(H * 0.008)  # 增加间隔
-
-    # Container
-    footer_h = int(H * 0.15)
-    container_top = header_h - int(H * 0.03)
-    container_margin = int(W * 0.05)
-    container_bottom = H - footer_h - int(H * 0.02)
-    cont_box = (container_margin, container_top, W - container_margin, container_bottom)
-    _rounded_rect(draw, cont_box, radius=28, fill=(255, 255, 255), outline=theme.card_border, width=2)
-
-    # Grid (3x3 by default)
-    grid_padding_x = int(W * 0.05)
-    grid_padding_y = int(H * 0.02)
-    grid_left = container_margin + grid_padding_x
-    grid_right = W - container_margin - grid_padding_x
-    grid_top = container_top + grid_padding_y
-    grid_bottom = container_bottom - grid_padding_y
-    cell_w = (grid_right - grid_left) // max(1, grid_cols)
-    cell_h = (grid_bottom - grid_top) // max(1, grid_rows)
-
-    num_font_base = int(min(cell_h * 0.50, W * 0.066))
-    meta_font = _load_font(font_path, int(min(cell_h * 0.18, W * 0.028)))
-    wm_font = _load_font(font_path, int(min(cell_h * 0.16, W * 0.024)))
-
-    for idx, item in enumerate(items[: grid_cols * grid_rows]):
-        c = idx % grid_cols
-        r = idx // grid_cols
-        x1 = grid_left + c * cell_w + int(cell_w * 0.04)
-        y1 = grid_top + r * cell_h + int(cell_h * 0.06)
-        x2 = grid_left + (c + 1) * cell_w - int(cell_w * 0.04)
-        y2 = grid_top + (r + 1) * cell_h - int(cell_h * 0.06)
-
-        _rounded_rect(draw, (x1, y1, x2, y2), radius=18, fill=theme.card_fill, outline=theme.card_border, width=2)
-
-        number = str(item.get("号码", "")).strip()
-        deposit = item.get("预存")
-        low = item.get("低消")
-
-        cx = (x1 + x2) // 2
-        cy = y1 + int((y2 - y1) * 0.14)
-        max_w = (x2 - x1) - int(cell_w * 0.10)
-        num_font = _shrink_to_fit(draw, number, font_path, max_w, num_font_base)
-        n_w, n_h = _text_size(draw, number, num_font)
-        draw.text((cx - n_w // 2, cy), number, font=num_font, fill=(28, 35, 52))
-
-        dep_text = f"预存{_fmt_num(deposit)}"
-        low_text = f"低消{_fmt_num(low)}"
-
-        # 预存和低消分两行显示
-        y_meta = cy + n_h + int((y2 - y1) * 0.08)
-        _draw_centered_bold(draw, cx, y_meta, dep_text, meta_font, fill=(88, 96, 118))
-        y_meta += _text_size(draw, dep_text, meta_font)[1] + int((y2 - y1) * 0.02)
-        _draw_centered_bold(draw, cx, y_meta, low_text, meta_font, fill=(88, 96, 118))
-
+    with prof.stage("text_fit"):
+        date_txt, cat_font, cat_lines, layout = _header_layout(subtitle, font_path, size, grid_cols, grid_rows, subtitle_max_lines)
+
+    # 静态图层（背景、头尾色带、容器、卡片框）来自模板缓存，只在副本上绘制文字
+    from .poster_template import get_static_template
+
+    with prof.stage("template"):
+        n_cards = min(len(items), layout.capacity)
+        template = get_static_template(theme, layout, n_cards)
+        # 唯一的一次整帧拷贝：之后所有绘制都在这张 RGB 画布上进行，水印只在局部按 alpha 合成
+        img = template.copy()
+        draw = ImageDraw.Draw(img)
+
+    with prof.stage("header_text"):
+        # Title
+        title_font = _shrink_to_fit(draw, title, font_path, layout.title_max_w, layout.title_font_size)
+        t_h = _draw_centered(draw, W // 2, layout.title_y, title, title_font, fill=theme.title_color)
+
+        # Date and category with extra spacing
+        y = layout.title_y + t_h + layout.title_gap  # 增加间隔
+        if date_txt:
+            date_font = _shrink_to_fit(draw, date_txt, font_path, layout.date_max_w, layout.date_font_size)
+            _draw_centered(draw, W // 2, y, date_txt, date_font, fill=theme.subtitle_color)
+            y += _text_size(draw, date_txt, date_font)[1] + layout.date_gap  # 增加间隔
+
+        for ln in cat_lines:
+            _draw_centered(draw, W // 2, y, ln, cat_font, fill=theme.subtitle_color)
+            y += _text_size(draw, ln, cat_font)[1] + layout.cat_line_gap  # 增加间隔
+
+        # 原先容器在头部文字之后绘制，会盖住溢出到容器上的文字；模板里容器已先画好，
+        # 所以把文字可能覆盖到的那段容器从模板恢复回来，结果与原绘制顺序一致
+        top = layout.container_box[1]
+        bottom = min(layout.container_box[3], y + getattr(cat_font, "size", layout.date_font_size))
+        if bottom > top:
+            region = (0, top, W, bottom)
+            img.paste(template.crop(region), region[:2], _container_mask(layout).crop(region))
+
+    with prof.stage("fonts"):
+        meta_font = _load_font(font_path, layout.meta_font_size)
+        wm_font = _load_font(font_path, layout.wm_font_size)
+        info_font = _load_font(font_path, layout.info_font_size)
+        tagline_font = _load_font(font_path, layout.tagline_font_size)
+
+    # Grid：各单元格互不依赖，可按任意顺序绘制
+    for item, cell in zip(items, layout.cells):
+        with prof.stage("cells"):
+            _draw_cell_text(draw, cell, item, font_path, layout.num_font_size, meta_font)
         if branding_label:
-            wm_w, wm_h = _text_size(draw, branding_label, wm_font)
-            wx = cx - wm_w // 2
-            wy = y2 - wm_h - int((y2 - y1) * 0.06)
-            layer = Image.new("RGBA", (W, H), (0, 0, 0, 0))
-            ld = ImageDraw.Draw(layer)
-            ld.text((wx, wy), branding_label, font=wm_font, fill=(55, 120, 240, 72))
-            img.paste(layer, (0, 0), layer)
+            with prof.stage("watermark"):
+                _draw_watermark(img, draw, cell.cx, cell.box[3] - cell.wm_bottom_pad, branding_label, wm_font)
 
     # Footer
-    footer = _v_gradient((W, footer_h), theme.footer_top, theme.footer_bottom)
-    img.paste(footer, (0, H - footer_h))
-
-    info_line = None
-    if location or hotline:
-        parts = []
-        if location:
-            parts.append(f"归属地：{location}")
-        if hotline:
-            parts.append(f"选号热线：{hotline}")
-        info_line = " | ".join(parts)
-
-    info_font = _load_font(font_path, int(H * 0.026))
-    tagline_font = _load_font(font_path, int(H * 0.038))
-    y = H - footer_h + int(footer_h * 0.18)
-    if info_line:
-        iw, ih = _text_size(draw, info_line, info_font)
-        draw.text((W // 2 - iw // 2, y), info_line, font=info_font, fill=theme.subtitle_color)
-        y += ih + int(H * 0.006)
-    for ln in _wrap_text_by_width(draw, tagline, tagline_font, int(W * 0.92))[:3]:
-        tw, th = _text_size(draw, ln, tagline_font)
-        draw.text((W // 2 - tw // 2, y), ln, font=tagline_font, fill=theme.tagline_color)
-        y += th + int(H * 0.008)
-
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    img.convert("RGB").save(str(output_path), format="JPEG", quality=92, subsampling=0)
-
+    with prof.stage("footer_text"):
+        info_line = None
+        if location or hotline:
+            parts = []
+            if location:
+                parts.append(f"归属地：{location}")
+            if hotline:
+                parts.append(f"选号热线：{hotline}")
+            info_line = " | ".join(parts)
+
+        y = layout.footer_text_y
+        if info_line:
+            iw, ih = _text_size(draw, info_line, info_font)
+            draw.text((W // 2 - iw // 2, y), info_line, font=info_font, fill=theme.subtitle_color)
+            y += ih + layout.info_gap
+        for ln in _wrap_text_by_width(draw, tagline, tagline_font, layout.tagline_max_w)[:3]:
+            tw, th = _text_size(draw, ln, tagline_font)
+            draw.text((W // 2 - tw // 2, y), ln, font=tagline_font, fill=theme.tagline_color)
+            y += th + layout.tagline_line_gap
+
+    return img
+
+
+def _draw_cell_text(draw: ImageDraw.ImageDraw, cell: CellLayout, item: dict, font_path: str | None, num_font_size: int, meta_font) -> None:
+    """在单元格内绘制号码与预存/低消"""
+    number = str(item.get("号码", "")).strip()
+    deposit = item.get("预存")
+    low = item.get("低消")
+
+    n_h = _draw_number(draw, cell.cx, cell.number_y, number, font_path, cell.number_max_w, num_font_size)
+
+    dep_text = f"预存{_fmt_num(deposit)}"
+    low_text = f"低消{_fmt_num(low)}"
+
+    # 预存和低消分两行显示
+    y_meta = cell.number_y + n_h + cell.meta_gap
+    _draw_centered_bold(draw, cell.cx, y_meta, dep_text, meta_font, fill=(88, 96, 118))
+    y_meta += _text_size(draw, dep_text, meta_font)[1] + cell.meta_line_gap
+    _draw_centered_bold(draw, cell.cx, y_meta, low_text, meta_font, fill=(88, 96, 118))
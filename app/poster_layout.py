@@ -0,0 +1,152 @@
+"""
+海报布局引擎
+几何信息（头部高度、容器、网格单元、各处字号与边距）只取决于
+(尺寸, 列数, 行数, 分类说明行数)，计算一次后冻结缓存，渲染时直接查表。
+各单元格的坐标互不依赖，可以按任意顺序或并行绘制。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+Box = tuple[int, int, int, int]
+
+
+@dataclass(frozen=True)
+class CellLayout:
+    """单个号码卡片的几何信息"""
+    index: int
+    box: Box
+    cx: int              # 水平中心
+    number_y: int        # 号码顶部
+    number_max_w: int    # 号码最大宽度
+    meta_gap: int        # 号码与预存之间的间距
+    meta_line_gap: int   # 预存与低消之间的间距
+    wm_bottom_pad: int   # 水印距卡片底部的距离
+
+
+@dataclass(frozen=True)
+class PosterLayout:
+    size: tuple[int, int]
+    grid_cols: int
+    grid_rows: int
+    header_h: int
+    footer_h: int
+    container_box: Box
+    cell_w: int
+    cell_h: int
+    cells: tuple[CellLayout, ...]
+
+    # 头部文字
+    title_y: int
+    title_max_w: int
+    title_font_size: int
+    date_max_w: int
+    date_font_size: int
+    date_gap: int
+    title_gap: int
+    cat_line_gap: int
+
+    # 卡片文字
+    num_font_size: int
+    meta_font_size: int
+    wm_font_size: int
+
+    # 底部文字
+    footer_text_y: int
+    info_font_size: int
+    info_gap: int
+    tagline_font_size: int
+    tagline_max_w: int
+    tagline_line_gap: int
+
+    @property
+    def capacity(self) -> int:
+        return self.grid_cols * self.grid_rows
+
+
+def header_height(size: tuple[int, int], cat_line_count: int) -> int:
+    """分类说明每多一行，头部增高 3%，最高 34%"""
+    _, H = size
+    header_ratio = 0.26 + max(0, cat_line_count - 1) * 0.03
+    return int(H * min(0.34, header_ratio))
+
+
+def cat_font_start(size: tuple[int, int]) -> tuple[int, int]:
+    """分类说明折行的 (最大宽度, 起始字号)，在确定行数之前就需要"""
+    W, H = size
+    return int(W * 0.88), int(H * 0.036)
+
+
+@lru_cache(maxsize=128)
+def compute_layout(size: tuple[int, int], grid_cols: int, grid_rows: int, cat_line_count: int) -> PosterLayout:
+    W, H = size
+    grid_cols = max(1, grid_cols)
+    grid_rows = max(1, grid_rows)
+    header_h = header_height(size, cat_line_count)
+
+    # Container
+    footer_h = int(H * 0.15)
+    container_top = header_h - int(H * 0.03)
+    container_margin = int(W * 0.05)
+    container_bottom = H - footer_h - int(H * 0.02)
+    container_box = (container_margin, container_top, W - container_margin, container_bottom)
+
+    # Grid
+    grid_padding_x = int(W * 0.05)
+    grid_padding_y = int(H * 0.02)
+    grid_left = container_margin + grid_padding_x
+    grid_right = W - container_margin - grid_padding_x
+    grid_top = container_top + grid_padding_y
+    grid_bottom = container_bottom - grid_padding_y
+    cell_w = (grid_right - grid_left) // grid_cols
+    cell_h = (grid_bottom - grid_top) // grid_rows
+
+    cells = []
+    for r in range(grid_rows):
+        for c in range(grid_cols):
+            x1 = grid_left + c * cell_w + int(cell_w * 0.04)
+            y1 = grid_top + r * cell_h + int(cell_h * 0.06)
+            x2 = grid_left + (c + 1) * cell_w - int(cell_w * 0.04)
+            y2 = grid_top + (r + 1) * cell_h - int(cell_h * 0.06)
+            inner_h = y2 - y1
+            cells.append(CellLayout(
+                index=r * grid_cols + c,
+                box=(x1, y1, x2, y2),
+                cx=(x1 + x2) // 2,
+                number_y=y1 + int(inner_h * 0.14),
+                number_max_w=(x2 - x1) - int(cell_w * 0.10),
+                meta_gap=int(inner_h * 0.08),
+                meta_line_gap=int(inner_h * 0.02),
+                wm_bottom_pad=int(inner_h * 0.06),
+            ))
+
+    return PosterLayout(
+        size=(W, H),
+        grid_cols=grid_cols,
+        grid_rows=grid_rows,
+        header_h=header_h,
+        footer_h=footer_h,
+        container_box=container_box,
+        cell_w=cell_w,
+        cell_h=cell_h,
+        cells=tuple(cells),
+        title_y=int(header_h * 0.20),
+        title_max_w=int(W * 0.9),
+        title_font_size=int(H * 0.070),
+        date_max_w=int(W * 0.9),
+        date_font_size=int(H * 0.031),
+        date_gap=int(H * 0.018),
+        title_gap=int(H * 0.020),
+        cat_line_gap=int(H * 0.008),
+        num_font_size=int(min(cell_h * 0.50, W * 0.066)),
+        meta_font_size=int(min(cell_h * 0.18, W * 0.028)),
+        wm_font_size=int(min(cell_h * 0.16, W * 0.024)),
+        footer_text_y=H - footer_h + int(footer_h * 0.18),
+        info_font_size=int(H * 0.026),
+        info_gap=int(H * 0.006),
+        tagline_font_size=int(H * 0.038),
+        tagline_max_w=int(W * 0.92),
+        tagline_line_gap=int(H * 0.008),
+    )
@@ -0,0 +1,176 @@
+"""
+海报输出
+渲染结果以内存字节（RenderedPoster）返回，落盘只是可选的输出端；
+同一张画布一次性编码出多种格式与尺寸（渐进式 JPEG、WebP、缩略图等），
+落盘时变体文件写在主输出旁边，并记录到 <主文件名>.variants.json。
+"""
+from __future__ import annotations
+
+import io
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal, Sequence
+
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class OutputVariant:
+    """单个输出变体的编码参数"""
+    name: str
+    format: Literal["JPEG", "WEBP"]
+    suffix: str                      # 追加在主文件名 stem 之后，如 ".web.jpg"
+    max_width: int | None = None     # 超过则等比缩小
+    quality: int = 85
+    progressive: bool = False
+    optimize: bool = False
+    max_bytes: int | None = None     # 字节预算，超出时逐步降低质量
+    min_quality: int = 40
+
+
+VARIANTS: dict[str, OutputVariant] = {
+    # 微信上传与网页查看：渐进式 + 优化哈夫曼表
+    "web": OutputVariant(name="web", format="JPEG", suffix=".web.jpg", quality=85, progressive=True, optimize=True, max_bytes=350_000),
+    "webp": OutputVariant(name="webp", format="WEBP", suffix=".webp", quality=80, max_bytes=250_000),
+    # 网页列表缩略图
+    "thumb": OutputVariant(name="thumb", format="JPEG", suffix=".thumb.jpg", max_width=360, quality=80, progressive=True, optimize=True, max_bytes=40_000),
+}
+
+_MIMETYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def variant_path(output_path: Path, variant: OutputVariant) -> Path:
+    return output_path.with_name(output_path.stem + variant.suffix)
+
+
+def is_variant_file(path: Path) -> bool:
+    """变体文件与清单的文件名 stem 中都带有 '.'，主输出则没有"""
+    return "." in path.stem
+
+
+def _encode(img: Image.Image, variant: OutputVariant, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if variant.format == "JPEG":
+        img.save(buf, format="JPEG", quality=quality, progressive=variant.progressive, optimize=variant.optimize)
+    else:
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    return buf.getvalue()
+
+
+def encode_variant(img: Image.Image, variant: OutputVariant) -> bytes:
+    """按变体参数编码画布；有字节预算时二分查找预算内的最高质量"""
+    if variant.max_width and img.width > variant.max_width:
+        h = round(img.height * variant.max_width / img.width)
+        img = img.resize((variant.max_width, h), Image.LANCZOS, reducing_gap=2.0)
+
+    data = _encode(img, variant, variant.quality)
+    if not variant.max_bytes or len(data) <= variant.max_bytes:
+        return data
+
+    lo, hi = variant.min_quality, variant.quality - 1
+    best = None
+    while lo <= hi:
+        q = (lo + hi) // 2
+        candidate = _encode(img, variant, q)
+        if len(candidate) <= variant.max_bytes:
+            best = candidate
+            lo = q + 1
+        else:
+            hi = q - 1
+    if best is None:
+        print(f"[WARN] 变体 {variant.name} 在最低质量 {variant.min_quality} 下仍超出预算 {variant.max_bytes} 字节")
+        return _encode(img, variant, variant.min_quality)
+    return best
+
+
+def encode_variants(img: Image.Image, names: Sequence[str]) -> dict[str, bytes]:
+    """编码多个变体，返回 {变体名: 字节}"""
+    encoded: dict[str, bytes] = {}
+    for name in names:
+        variant = VARIANTS.get(name)
+        if variant is None:
+            print(f"[WARN] 未知的输出变体: {name}")
+            continue
+        encoded[name] = encode_variant(img, variant)
+    return encoded
+
+
+def write_variants(output_path: Path, encoded: dict[str, bytes]) -> dict[str, Path]:
+    """把已编码的变体写到主输出旁边并更新清单，返回 {变体名: 路径}"""
+    written: dict[str, Path] = {}
+    manifest = {}
+    for name, data in encoded.items():
+        variant = VARIANTS[name]
+        path = variant_path(output_path, variant)
+        path.write_bytes(data)
+        written[name] = path
+        manifest[name] = {"file": path.name, "format": variant.format, "bytes": len(data)}
+
+    if manifest:
+        manifest_path = output_path.with_name(output_path.stem + ".variants.json")
+        manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return written
+
+
+@dataclass
+class RenderedPoster:
+    """内存中的渲染结果；上传、base64 嵌入、HTTP 响应都可直接使用 data"""
+    data: bytes                                   # 主 JPEG
+    variants: dict[str, bytes] = field(default_factory=dict)
+    path: Path | None = None                      # 落盘后才有
+    variant_paths: dict[str, Path] = field(default_factory=dict)
+    mimetype: str = "image/jpeg"
+
+    def open(self, variant: str | None = None) -> io.BytesIO:
+        """返回只读缓冲区，可直接交给 requests 上传或 Flask send_file"""
+        return io.BytesIO(self.variants[variant] if variant else self.data)
+
+    def save(self, output_path: Path) -> Path:
+        """写入主文件与全部变体"""
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_bytes(self.data)
+        self.path = output_path
+        self.variant_paths = write_variants(output_path, self.variants)
+        return output_path
+
+
+# 最近渲染的海报缓冲区，供同一进程内的下载接口直接返回，免去再读磁盘
+_RECENT: OrderedDict[str, RenderedPoster] = OrderedDict()
+_RECENT_LOCK = threading.Lock()
+_RECENT_MAX = 8
+
+
+def remember_poster(poster: RenderedPoster) -> None:
+    if poster.path is None:
+        return
+    with _RECENT_LOCK:
+        _RECENT[poster.path.name] = poster
+        for name, path in poster.variant_paths.items():
+            _RECENT[path.name] = RenderedPoster(data=poster.variants[name], path=path, mimetype=_MIMETYPES[VARIANTS[name].format])
+        while len(_RECENT) > _RECENT_MAX * (1 + len(VARIANTS)):
+            _RECENT.popitem(last=False)
+
+
+def recall_poster(filename: str) -> RenderedPoster | None:
+    with _RECENT_LOCK:
+        return _RECENT.get(filename)
+
+
+def load_variants(output_path: Path) -> dict[str, Path]:
+    """读取主输出旁的变体清单，只返回仍存在的文件"""
+    manifest_path = output_path.with_name(output_path.stem + ".variants.json")
+    if not manifest_path.exists():
+        return {}
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    result = {}
+    for name, meta in manifest.items():
+        path = output_path.with_name(meta.get("file", ""))
+        if path.exists():
+            result[name] = path
+    return result
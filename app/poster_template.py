@@ -0,0 +1,101 @@
+"""
+海报静态模板缓存
+同一主题、尺寸、网格下，背景渐变、头尾色带、白色容器与空卡片框完全相同，
+首次绘制后同时缓存在内存（LRU）与磁盘（PNG），之后的渲染只需在副本上写字。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import astuple
+from pathlib import Path
+
+from PIL import Image
+
+from .config import CFG
+from .poster_layout import PosterLayout
+from .theme_system import ThemeColors
+
+
+# 绘制逻辑变化时递增，使旧的磁盘模板自动失效
+TEMPLATE_VERSION = 1
+
+_MEMORY: OrderedDict[str, Image.Image] = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def theme_fingerprint(theme: ThemeColors) -> str:
+    """主题配色的指纹，配色不变则指纹不变"""
+    raw = json.dumps(astuple(theme), ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def template_key(theme: ThemeColors, layout: PosterLayout, n_cards: int) -> str:
+    W, H = layout.size
+    return f"v{TEMPLATE_VERSION}_{theme_fingerprint(theme)}_{W}x{H}_g{layout.grid_cols}x{layout.grid_rows}_h{layout.header_h}_n{n_cards}"
+
+
+def _disk_path(key: str) -> Path:
+    return CFG.cache_dir / "templates" / f"{key}.png"
+
+
+def _remember(key: str, img: Image.Image) -> None:
+    with _LOCK:
+        _MEMORY[key] = img
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > max(1, CFG.template_cache_size):
+            _MEMORY.popitem(last=False)
+
+
+def get_static_template(theme: ThemeColors, layout: PosterLayout, n_cards: int) -> Image.Image:
+    """返回静态模板（RGB）。调用方不得直接修改，需先 copy/convert。
+
+    头部高度随副标题行数变化，也是键的一部分；n_cards 为实际绘制的卡片框数量。
+    """
+    key = template_key(theme, layout, n_cards)
+    with _LOCK:
+        img = _MEMORY.get(key)
+        if img is not None:
+            _MEMORY.move_to_end(key)
+            return img
+
+    path = _disk_path(key)
+    if path.exists():
+        try:
+            with Image.open(path) as f:
+                img = f.convert("RGB")
+            if img.size != layout.size:
+                img = None
+        except Exception:
+            img = None
+
+    if img is None:
+        from .poster_generator_v2 import _render_static_layers
+
+        img = _render_static_layers(theme, layout, n_cards)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            img.save(str(tmp), format="PNG", compress_level=1)
+            tmp.replace(path)
+        except Exception as e:
+            # 磁盘缓存失败不影响出图
+            print(f"[WARN] 写入模板缓存失败: {e}")
+
+    _remember(key, img)
+    return img
+
+
+def clear_template_cache(*, disk: bool = False) -> None:
+    """清空内存模板缓存；disk=True 时同时删除磁盘模板"""
+    with _LOCK:
+        _MEMORY.clear()
+    if disk:
+        for p in (CFG.cache_dir / "templates").glob("*.png"):
+            try:
+                p.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,143 @@
+"""
+内容寻址的渲染缓存
+以全部渲染输入（文案、号码、主题、尺寸等）加字体文件身份计算确定性键，
+相同输入直接返回已编码的字节，免去重复渲染。按总大小做 LRU 淘汰。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import astuple, is_dataclass
+from pathlib import Path
+
+from .config import CFG
+from .poster_output import VARIANTS, RenderedPoster
+
+
+# 渲染结果会变化的改动（布局、配色、编码参数）需递增，旧缓存自动失效
+RENDER_CACHE_VERSION = 1
+
+
+def _font_identity(font_path: str | None) -> list | None:
+    if not font_path:
+        return None
+    try:
+        st = os.stat(font_path)
+    except OSError:
+        return [str(font_path), None]
+    return [os.path.abspath(font_path), st.st_size, st.st_mtime_ns]
+
+
+def _canonical(value):
+    if is_dataclass(value):
+        return list(astuple(value))
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, float) and value != value:  # NaN
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def render_key(params: dict, *, renderer: str = "v2") -> str:
+    """渲染器名称与渲染参数（不含 output_path 与 variants）的确定性哈希"""
+    payload = {
+        "v": RENDER_CACHE_VERSION,
+        "renderer": renderer,
+        "font": _font_identity(params.get("font_path")),
+        "params": _canonical({k: v for k, v in params.items() if k not in ("output_path", "variants", "font_path")}),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """磁盘上的渲染缓存：<root>/<键前两位>/<键>.jpg，变体为 <键><变体后缀>"""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _main_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.jpg"
+
+    def _variant_path(self, key: str, name: str) -> Path:
+        return self.root / key[:2] / f"{key}{VARIANTS[name].suffix}"
+
+    def get(self, key: str, variants=()) -> RenderedPoster | None:
+        main = self._main_path(key)
+        try:
+            data = main.read_bytes()
+            encoded = {name: self._variant_path(key, name).read_bytes() for name in variants if name in VARIANTS}
+        except OSError:
+            return None
+        # 更新访问时间供 LRU 淘汰参考
+        for p in [main, *(self._variant_path(key, name) for name in encoded)]:
+            try:
+                os.utime(p)
+            except OSError:
+                pass
+        return RenderedPoster(data=data, variants=encoded)
+
+    def put(self, key: str, poster: RenderedPoster) -> None:
+        files = {self._main_path(key): poster.data}
+        for name, data in poster.variants.items():
+            files[self._variant_path(key, name)] = data
+        try:
+            for path, data in files.items():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                tmp.replace(path)
+        except OSError as e:
+            print(f"[WARN] 写入渲染缓存失败: {e}")
+            return
+        self.evict()
+
+    def evict(self) -> int:
+        """总大小超过上限时按最久未访问淘汰，返回删除的文件数"""
+        with self._lock:
+            entries = []
+            total = 0
+            for p in self.root.glob("*/*"):
+                if p.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            removed = 0
+            if total <= self.max_bytes:
+                return removed
+            entries.sort()
+            for _, size, p in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    p.unlink()
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            return removed
+
+
+_CACHE: RenderCache | None = None
+
+
+def get_render_cache() -> RenderCache | None:
+    """进程内共享的渲染缓存；CFG.render_cache_max_mb 为 0 时禁用"""
+    global _CACHE
+    if CFG.render_cache_max_mb <= 0:
+        return None
+    if _CACHE is None:
+        _CACHE = RenderCache(CFG.cache_dir / "renders", CFG.render_cache_max_mb * 1024 * 1024)
+    return _CACHE
@@ -0,0 +1,125 @@
+"""
+渲染分阶段计时
+render_poster(profile=RenderProfile()) 记录每个阶段的耗时、新建图像数、字体加载数，
+开启 track_alloc 时额外用 tracemalloc 记录 Python 侧内存分配峰值，并在 Linux 上
+通过 /proc 记录进程常驻内存（含 Pillow 图像缓冲区）的峰值增量。
+未传 profile 时使用空实现，几乎没有额外开销。
+"""
+from __future__ import annotations
+
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+
+from PIL import Image
+
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    images: int = 0          # Pillow 新建的图像缓冲区数量
+    font_loads: int = 0      # 未命中字体缓存、实际读取字体文件的次数
+    alloc_peak_kb: float = 0.0  # Python 侧分配峰值（需 track_alloc）
+    rss_peak_kb: float = 0.0    # 常驻内存峰值增量，含图像缓冲区（需 track_alloc，仅 Linux）
+
+
+def _reset_rss_peak() -> bool:
+    """重置进程的常驻内存峰值（VmHWM），不支持的平台返回 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _rss_kb() -> tuple[int, int]:
+    """返回 (当前常驻内存, 峰值) KB"""
+    cur = peak = 0
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                cur = int(line.split()[1])
+            elif line.startswith("VmHWM:"):
+                peak = int(line.split()[1])
+    return cur, peak
+
+
+class RenderProfile:
+    """收集渲染各阶段的统计，同名阶段多次进入时累加"""
+
+    def __init__(self, *, track_alloc: bool = False) -> None:
+        self.track_alloc = track_alloc
+        self.stages: dict[str, StageStats] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        from .poster_core import _load_font
+
+        stats = self.stages.setdefault(name, StageStats(name))
+        started_tracing = False
+        if self.track_alloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            base_alloc = tracemalloc.get_traced_memory()[0]
+            track_rss = _reset_rss_peak()
+            if track_rss:
+                base_rss = _rss_kb()[0]
+        images0 = Image.core.get_stats()["new_count"]
+        fonts0 = _load_font.cache_info().misses
+        t0 = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - t0
+            stats.calls += 1
+            stats.images += Image.core.get_stats()["new_count"] - images0
+            stats.font_loads += _load_font.cache_info().misses - fonts0
+            if self.track_alloc:
+                peak = tracemalloc.get_traced_memory()[1]
+                stats.alloc_peak_kb = max(stats.alloc_peak_kb, (peak - base_alloc) / 1024)
+                if track_rss:
+                    stats.rss_peak_kb = max(stats.rss_peak_kb, _rss_kb()[1] - base_rss)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(s.seconds for s in self.stages.values())
+
+    def as_dict(self) -> dict[str, dict]:
+        return {
+            name: {
+                "ms": round(s.seconds * 1000, 2),
+                "calls": s.calls,
+                "images": s.images,
+                "font_loads": s.font_loads,
+                "alloc_peak_kb": round(s.alloc_peak_kb, 1),
+                "rss_peak_kb": round(s.rss_peak_kb, 1),
+            }
+            for name, s in self.stages.items()
+        }
+
+    def report(self) -> str:
+        lines = [f"{'stage':<14}{'ms':>10}{'calls':>6}{'imgs':>6}{'fonts':>6}{'allocKB':>10}{'rssKB':>10}"]
+        for s in self.stages.values():
+            lines.append(f"{s.name:<14}{s.seconds * 1000:>10.1f}{s.calls:>6}{s.images:>6}{s.font_loads:>6}{s.alloc_peak_kb:>10.1f}{s.rss_peak_kb:>10.1f}")
+        lines.append(f"{'total':<14}{self.total_seconds * 1000:>10.1f}")
+        return "\n".join(lines)
+
+
+class _NullProfile:
+    """未开启计时时的空实现"""
+
+    _ctx = nullcontext()
+
+    def stage(self, name: str):
+        return self._ctx
+
+
+NULL_PROFILE = _NullProfile()
@@ -0,0 +1,46 @@
+"""
+渲染器注册表
+按名称选择海报渲染器，模块在首次使用时才导入，启动时不加载未用到的渲染器
+（以及 Pillow 等重依赖）。各渲染器共用 app/poster_core.py 中的公共核心。
+
+渲染器约定：模块提供 render_poster(**kwargs) -> RenderedPoster，
+关键字参数与 poster_generator_v2.render_poster 相同。
+"""
+from __future__ import annotations
+
+import importlib
+from typing import Callable
+
+from .config import CFG
+
+
+DEFAULT_RENDERER = "v2"
+
+# 名称 -> 模块路径
+RENDERERS: dict[str, str] = {
+    "v2": "app.poster_generator_v2",      # 新版渲染（3x3、两行meta、主题配色）
+    "legacy": "app.poster_generator",     # 旧版渲染（单行meta、固定蓝色配色）
+}
+
+
+def available_renderers() -> list[str]:
+    return list(RENDERERS)
+
+
+def get_renderer(name: str | None = None) -> Callable:
+    """返回指定渲染器的 render_poster；未指定时使用 CFG.renderer
+
+    未知名称或导入失败时回退到默认渲染器。
+    """
+    name = name or CFG.renderer or DEFAULT_RENDERER
+    if name not in RENDERERS:
+        print(f"[WARN] 未知渲染器 {name}，使用 {DEFAULT_RENDERER}（可选: {', '.join(RENDERERS)}）")
+        name = DEFAULT_RENDERER
+    try:
+        module = importlib.import_module(RENDERERS[name])
+    except Exception as e:
+        if name == DEFAULT_RENDERER:
+            raise
+        print(f"[WARN] 加载渲染器 {name} 失败: {e}，使用 {DEFAULT_RENDERER}")
+        module = importlib.import_module(RENDERERS[DEFAULT_RENDERER])
+    return module.render_poster
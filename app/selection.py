@@ -14,6 +14,18 @@ def categories_with_counts(df: pd.DataFrame) -> dict[str, int]:
     return counts.to_dict()
 
 
+def unused_frame(df: pd.DataFrame, store: UsedStorage, category: str | None = None) -> pd.DataFrame:
+    """未使用号码的子表；category 为空时返回全部分类，顺序与 Excel 一致"""
+    subset = df if category is None else df[df["分类说明"] == category]
+    return subset[~subset["号码"].astype(str).str.strip().isin(store.used_numbers())]
+
+
+def eligible_categories(df: pd.DataFrame, store: UsedStorage, *, min_count: int) -> list[str]:
+    """未使用号码不少于 min_count 的分类，顺序与 Excel 一致"""
+    sizes = unused_frame(df, store).groupby("分类说明", sort=False).size()
+    return [str(c) for c, n in sizes.items() if n >= min_count]
+
+
 def _unused_numbers_in_category(df: pd.DataFrame, store: UsedStorage, category: str) -> list[dict]:
     subset = df[df["分类说明"] == category]
     rows = []
@@ -0,0 +1,143 @@
+"""
+主题素材包
+把各主题的背景、头部、底部渐变预先烘焙成素材包，渲染时直接展开，不再逐行计算。
+
+竖向渐变每一行颜色相同，所以每条渐变只需存一列像素（高 × 3 字节）：
+  <cache_dir>/theme_assets/gradients.npy   全部渐变列纵向拼接的 uint8 数组，按需内存映射
+  <cache_dir>/theme_assets/index.json      渐变键 -> [起始行, 高度]
+渐变键由 (顶部色, 底部色, 高度) 决定，与主题名无关，配色相同的色带只存一份。
+素材包里没有的渐变（新主题尚未构建、非默认尺寸）回退到现场计算，结果逐像素一致。
+
+构建：python -m app.theme_assets（主题含 themes.json 中的自定义主题）
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from PIL import Image
+
+from .config import CFG
+
+
+# 渐变算法或素材格式变化时递增，旧素材包自动忽略
+ASSET_VERSION = 1
+
+RGB = tuple[int, int, int]
+
+_BUNDLE: "_Bundle | None" = None
+_LOADED = False
+_LOCK = threading.Lock()
+
+
+def _bundle_dir() -> Path:
+    return CFG.cache_dir / "theme_assets"
+
+
+def gradient_key(top_rgb: RGB, bottom_rgb: RGB, h: int) -> str:
+    return f"{','.join(map(str, top_rgb))}-{','.join(map(str, bottom_rgb))}-{h}"
+
+
+class _Bundle:
+    def __init__(self, index: dict[str, list[int]], columns: np.ndarray) -> None:
+        self.index = index
+        self.columns = columns
+
+    def column(self, key: str) -> np.ndarray | None:
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        start, h = entry
+        return self.columns[start:start + h]
+
+
+def _load_bundle() -> _Bundle | None:
+    """首次使用时加载索引并内存映射渐变数组；没有或版本不符时返回 None"""
+    global _BUNDLE, _LOADED
+    if _LOADED:
+        return _BUNDLE
+    with _LOCK:
+        if not _LOADED:
+            d = _bundle_dir()
+            try:
+                meta = json.loads((d / "index.json").read_text(encoding="utf-8"))
+                if meta.get("v") == ASSET_VERSION:
+                    _BUNDLE = _Bundle(meta["entries"], np.load(d / "gradients.npy", mmap_mode="r"))
+            except (OSError, ValueError, KeyError):
+                _BUNDLE = None
+            _LOADED = True
+    return _BUNDLE
+
+
+def baked_gradient(size: tuple[int, int], top_rgb: RGB, bottom_rgb: RGB) -> Image.Image | None:
+    """从素材包展开 size 大小的竖向渐变；素材包中没有时返回 None"""
+    bundle = _load_bundle()
+    if bundle is None:
+        return None
+    w, h = size
+    col = bundle.column(gradient_key(tuple(top_rgb), tuple(bottom_rgb), h))
+    if col is None:
+        return None
+    strip = Image.fromarray(np.ascontiguousarray(col).reshape(h, 1, 3), "RGB")
+    return strip.resize((w, h), Image.NEAREST)
+
+
+def theme_gradients(theme, size: tuple[int, int], max_cat_lines: int = 3) -> list[tuple[RGB, RGB, int]]:
+    """新版布局下某主题会用到的全部渐变：背景、各分类行数对应的头部高度、底部"""
+    from .poster_layout import compute_layout, header_height
+
+    _, H = size
+    needed = [(theme.bg_top, theme.bg_bottom, H)]
+    for n in range(1, max_cat_lines + 1):
+        needed.append((theme.header_top, theme.header_bottom, header_height(size, n)))
+    needed.append((theme.footer_top, theme.footer_bottom, compute_layout(tuple(size), 3, 3, 1).footer_h))
+    return needed
+
+
+def build_theme_assets(themes: Iterable | None = None, sizes: Iterable[tuple[int, int]] = ((1080, 1440),)) -> Path:
+    """烘焙主题渐变并写出素材包，返回素材包目录"""
+    global _BUNDLE, _LOADED
+    from .poster_core import _compute_gradient
+
+    if themes is None:
+        from .theme_system import THEMES
+        themes = THEMES.values()
+
+    entries: dict[str, list[int]] = {}
+    columns: list[np.ndarray] = []
+    row = 0
+    for theme in themes:
+        for size in sizes:
+            for top, bottom, h in theme_gradients(theme, size):
+                key = gradient_key(tuple(top), tuple(bottom), h)
+                if key in entries:
+                    continue
+                col = np.asarray(_compute_gradient((1, h), tuple(top), tuple(bottom)), dtype=np.uint8).reshape(h, 3)
+                entries[key] = [row, h]
+                columns.append(col)
+                row += h
+
+    d = _bundle_dir()
+    d.mkdir(parents=True, exist_ok=True)
+    arr = np.concatenate(columns) if columns else np.zeros((0, 3), dtype=np.uint8)
+    tmp = d / f"gradients.{os.getpid()}.tmp.npy"
+    np.save(tmp, arr)
+    tmp.replace(d / "gradients.npy")
+    tmp = d / f"index.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps({"v": ASSET_VERSION, "entries": entries}, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(d / "index.json")
+
+    # 下次使用时重新加载
+    with _LOCK:
+        _BUNDLE = None
+        _LOADED = False
+    print(f"[OK] 主题素材包: {len(entries)} 条渐变，{arr.nbytes / 1024:.1f} KB -> {d}")
+    return d
+
+
+if __name__ == "__main__":
+    build_theme_assets()
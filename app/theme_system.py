@@ -4,10 +4,13 @@
 """
 from __future__ import annotations
 
-from dataclasses import dataclass
+import json
+from dataclasses import dataclass, fields
 from datetime import datetime, time
+from pathlib import Path
 from typing import Literal
 
+from .config import CFG
 from .weather_api import WeatherType
 
 
@@ -249,24 +252,71 @@ THEMES: dict[ThemeType, ThemeColors] = {
 }
 
 
+def load_theme_config(path: Path) -> dict[str, ThemeColors]:
+    """读取自定义主题配置（JSON：{主题名: {字段: [R, G, B], ...}}），字段同 ThemeColors
+
+    文件不存在时返回空字典；单个主题字段有误时跳过该主题并提示。
+    """
+    if not path.exists():
+        return {}
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[WARN] 读取主题配置失败 ({path.name}): {e}")
+        return {}
+
+    color_fields = {f.name for f in fields(ThemeColors)} - {"name"}
+    themes: dict[str, ThemeColors] = {}
+    for name, spec in raw.items():
+        try:
+            unknown = set(spec) - color_fields
+            if unknown:
+                raise ValueError(f"未知字段 {', '.join(sorted(unknown))}")
+            colors = {k: tuple(int(c) for c in v) for k, v in spec.items()}
+            if any(len(c) != 3 or not all(0 <= x <= 255 for x in c) for c in colors.values()):
+                raise ValueError("颜色须为 [R, G, B]，取值 0-255")
+            themes[name] = ThemeColors(name=name, **colors)
+        except Exception as e:
+            print(f"[WARN] 忽略自定义主题 {name}: {e}")
+    return themes
+
+
+# 自定义主题（同名时覆盖内置主题）
+THEMES.update(load_theme_config(CFG.theme_config))
+
+
 def select_theme(
     dt: datetime | None = None,
     weather: WeatherType | None = None,
-    holiday_name: str | None = None
+    holiday_name: str | None = None,
+    holiday_theme: str | None = None,
+    theme: str | None = None,
 ) -> ThemeColors:
     """
     根据日期时间、天气、节日自动选择主题
 
     优先级：
+    0. 指定的主题名 theme（默认 CFG.theme，可以是 themes.json 中的自定义主题）
     1. 重要节日主题
     2. 天气主题
     3. 时间段主题
     4. 默认主题
+
+    holiday_theme 为日历表（calendar_context）中预先算好的节日主题名，给出时不再按节日名匹配。
     """
     if dt is None:
         dt = datetime.now()
 
+    # 0. 指定了主题
+    theme = theme or CFG.theme
+    if theme:
+        if theme in THEMES:
+            return THEMES[theme]
+        print(f"[WARN] 未知的主题: {theme}，改为自动选择")
+
     # 1. 检查是否是重要节日
+    if holiday_theme in THEMES:
+        return THEMES[holiday_theme]
     if holiday_name:
         theme = _get_holiday_theme(holiday_name)
         if theme:
@@ -0,0 +1,138 @@
+"""
+微信 access_token 共享存储
+token 存在 SQLite（<cache_dir>/wechat_tokens.sqlite3）中，多个进程、重启前后共用，
+不必每次发送都重新获取，节省请求与每日获取次数配额。
+
+- 到期前 CFG.wechat_token_refresh_margin 秒开始主动刷新，刷新期间其他调用继续用旧 token
+- 刷新通过 BEGIN IMMEDIATE 事务抢占"刷新租约"，同一时刻只有一个调用者去请求新 token，
+  其余的等待结果（旧 token 已失效时）或直接沿用旧 token（尚未失效时），避免刷新风暴
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Callable
+
+from .config import CFG
+
+
+# 刷新租约时长（秒）：持有者崩溃时，其他调用者最多等这么久再接手
+_LEASE_SECONDS = 30
+# 微信给出的有效期再减去这么多秒，避免临界时刻用到刚失效的 token
+_EXPIRY_SAFETY_SECONDS = 60
+_POLL_SECONDS = 0.2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    key TEXT PRIMARY KEY,
+    token TEXT,
+    expires_at REAL NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0
+)
+"""
+
+
+class TokenStore:
+    def __init__(self, path: Path, refresh_margin: float) -> None:
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self._local = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _read(self, conn: sqlite3.Connection, key: str) -> tuple[str | None, float, float]:
+        row = conn.execute("SELECT token, expires_at, lease_until FROM tokens WHERE key = ?", (key,)).fetchone()
+        return row if row else (None, 0.0, 0.0)
+
+    def _try_lease(self, key: str) -> tuple[bool, str | None, float]:
+        """在写事务中检查并抢占刷新租约，返回 (是否抢到, 当前 token, 过期时间)"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            token, expires_at, lease_until = self._read(conn, key)
+            now = time.time()
+            fresh = token and now < expires_at - self.refresh_margin
+            if fresh or lease_until > now:
+                conn.execute("COMMIT")
+                return False, token, expires_at
+            conn.execute(
+                "INSERT INTO tokens (key, lease_until) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET lease_until = excluded.lease_until",
+                (key, now + _LEASE_SECONDS),
+            )
+            conn.execute("COMMIT")
+            return True, token, expires_at
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _store(self, key: str, token: str | None, expires_at: float) -> None:
+        with closing(self._connect()) as conn:
+            if token is None:
+                conn.execute("UPDATE tokens SET lease_until = 0 WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    "UPDATE tokens SET token = ?, expires_at = ?, lease_until = 0 WHERE key = ?",
+                    (token, expires_at, key),
+                )
+
+    def get(self, key: str, fetch: Callable[[], tuple[str, float]]) -> str:
+        """返回有效的 token；需要时调用 fetch() -> (token, 有效秒数) 获取新的"""
+        deadline = time.time() + _LEASE_SECONDS * 2
+        while True:
+            with closing(self._connect()) as conn:
+                token, expires_at, _ = self._read(conn, key)
+            now = time.time()
+            if token and now < expires_at - self.refresh_margin:
+                return token
+
+            # 同进程的线程先在本地排队，只有一个线程去抢数据库租约
+            with self._local:
+                leased, token, expires_at = self._try_lease(key)
+                if leased:
+                    try:
+                        new_token, expires_in = fetch()
+                    except BaseException:
+                        self._store(key, None, 0)
+                        # 刷新失败但旧 token 仍有效时继续用旧的
+                        if token and time.time() < expires_at:
+                            print(f"[WARN] 刷新 access_token 失败，继续使用未过期的旧 token（{key}）")
+                            return token
+                        raise
+                    self._store(key, new_token, time.time() + expires_in - _EXPIRY_SAFETY_SECONDS)
+                    return new_token
+
+            # 别人正在刷新：旧 token 还有效就先用，否则等新 token 写入
+            if token and time.time() < expires_at:
+                return token
+            if time.time() > deadline:
+                raise TimeoutError(f"等待 access_token 刷新超时（{key}）")
+            time.sleep(_POLL_SECONDS)
+
+    def invalidate(self, key: str, token: str) -> None:
+        """微信报告 token 失效时调用；只清除仍是该 token 的记录，不影响别人刚刷新的新 token"""
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE tokens SET expires_at = 0 WHERE key = ? AND token = ?", (key, token))
+
+
+_STORE: TokenStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_token_store() -> TokenStore:
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = TokenStore(CFG.cache_dir / "wechat_tokens.sqlite3", CFG.wechat_token_refresh_margin)
+    return _STORE
@@ -32,6 +32,10 @@ class UsedStorage:
         self.load()
         return number in self._data.get("used_numbers", {})
 
+    def used_numbers(self) -> set[str]:
+        self.load()
+        return set(self._data.get("used_numbers", {}))
+
     def mark_used(self, numbers: Iterable[str], *, category: str, output_path: str, ts: str | None = None) -> None:
         self.load()
         if ts is None:
@@ -1,34 +1,172 @@
 """
 天气API集成模块
 支持多个免费天气API，自动回退
+
+按城市缓存查询结果（WeatherCache）：
+- 未过期（CFG.weather_ttl_seconds）直接返回
+- 已过期先返回旧值，同时在后台线程刷新（stale-while-revalidate）
+- 过期超过 CFG.weather_max_stale_seconds 的旧值不再直接使用，先以短超时同步查询
+- 查询失败时沿用最近一次成功的结果，而不是默认的"晴天"
+- 缓存写入 <cache_dir>/weather.json，重启后仍可用；多个进程共用该文件，写入时加锁合并
 """
 from __future__ import annotations
 
+import json
 import os
+import threading
+import time
 from typing import Literal
-import requests
+
+from . import http_client
+from .config import CFG
+from .file_lock import file_lock, file_stamp
 
 
 WeatherType = Literal["晴天", "多云", "阴天", "小雨", "中雨", "大雨", "雷阵雨", "雪", "雾霾", "未知"]
 
+# 高德天气接口地址，可用环境变量 AMAP_WEATHER_URL 指向本地桩服务做测试
+AMAP_WEATHER_URL = os.getenv("AMAP_WEATHER_URL", "https://restapi.amap.com/v3/weather/weatherInfo")
+
+# 后台刷新失败后，至少间隔这么久再重试，避免接口故障时每次调用都发请求
+_RETRY_AFTER_SECONDS = 60
+
+
+class WeatherCache:
+    """按城市缓存天气，线程安全；条目为 {"weather": 天气, "fetched_at": 时间戳}"""
+
+    def __init__(self, path, ttl_seconds: int, max_stale_seconds: int | None = None) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = ttl_seconds * 4 if max_stale_seconds is None else max_stale_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._stamp: tuple[int, int] | None = None
+        self._refreshing: set[str] = set()
+        self._retry_at: dict[str, float] = {}
+
+    def _load(self) -> dict[str, dict]:
+        """返回内存中的条目；文件自上次读取后被改写（含别的进程）时重新读取"""
+        stamp = file_stamp(self.path)
+        if stamp != self._stamp:
+            try:
+                self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._entries = {}
+            self._stamp = stamp
+        return self._entries
+
+    def _save(self, updates: dict[str, dict]) -> None:
+        """在锁文件保护下读出最新内容、合并 updates 后整体替换文件"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.path.with_name(f"{self.path.name}.lock")):
+                self._stamp = None
+                entries = self._load()
+                for city, entry in updates.items():
+                    # 别的进程可能刚写入了更新的结果
+                    if entry["fetched_at"] >= entries.get(city, {}).get("fetched_at", 0):
+                        entries[city] = entry
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.path)
+                self._entries, self._stamp = entries, file_stamp(self.path)
+        except (OSError, TimeoutError) as e:
+            # 写入失败时至少本进程内可用
+            self._entries.update(updates)
+            print(f"[WARN] 写入天气缓存失败: {e}")
+
+    def peek(self, city: str) -> tuple[WeatherType | None, float]:
+        """返回 (缓存的天气, 已缓存秒数)；没有缓存时为 (None, inf)"""
+        with self._lock:
+            entry = self._load().get(city)
+        if not entry:
+            return None, float("inf")
+        return entry["weather"], time.time() - entry["fetched_at"]
+
+    def store(self, city: str, weather: WeatherType) -> None:
+        with self._lock:
+            self._save({city: {"weather": weather, "fetched_at": time.time()}})
+            self._retry_at.pop(city, None)
+
+    def refresh(self, city: str, fetch) -> WeatherType | None:
+        """立即查询并写入缓存，返回新结果；查询失败或处于失败冷却期时返回 None"""
+        with self._lock:
+            if time.time() < self._retry_at.get(city, 0):
+                return None
+        result = fetch()
+        if result == "未知":
+            with self._lock:
+                self._retry_at[city] = time.time() + _RETRY_AFTER_SECONDS
+            return None
+        self.store(city, result)
+        return result
+
+    def refresh_async(self, city: str, fetch) -> bool:
+        """在后台线程刷新某城市；已有刷新在进行或处于失败冷却期时不重复发起"""
+        with self._lock:
+            if city in self._refreshing or time.time() < self._retry_at.get(city, 0):
+                return False
+            self._refreshing.add(city)
+
+        def run():
+            try:
+                self.refresh(city, fetch)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(city)
+
+        # 非守护线程：单次运行（--once）退出前也会等刷新完成（受请求超时限制），缓存得以更新
+        threading.Thread(target=run, name=f"weather-refresh-{city}", daemon=False).start()
+        return True
+
+
+_CACHE: WeatherCache | None = None
+
+
+def get_weather_cache() -> WeatherCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = WeatherCache(CFG.cache_dir / "weather.json", CFG.weather_ttl_seconds, CFG.weather_max_stale_seconds)
+    return _CACHE
+
 
 def get_weather(city: str = "南昌", timeout: int = 5) -> WeatherType:
     """
     获取指定城市的天气状况
 
     优先级：
-    1. 天气API（如果配置了API_KEY）
-    2. 简化的公开API
-    3. 默认返回"晴天"
+    1. 未过期的缓存
+    2. 已过期但未超过最长沿用时间的缓存（同时后台刷新）
+    3. 天气API（如果配置了API_KEY）；过旧的缓存只在查询失败时使用
+    4. 默认返回"晴天"
     """
     # 尝试使用高德天气API（免费，需要key）
     amap_key = os.getenv("AMAP_WEATHER_KEY")
-    if amap_key:
-        result = _get_weather_amap(city, amap_key, timeout)
-        if result != "未知":
-            return result
+    if not amap_key:
+        # 回退：返回默认天气
+        return "晴天"
 
-    # 回退：返回默认天气
+    cache = get_weather_cache()
+    cached, age = cache.peek(city)
+    if cached is not None:
+        if age < cache.ttl_seconds:
+            return cached
+        if age < cache.max_stale_seconds:
+            cache.refresh_async(city, lambda: _get_weather_amap(city, amap_key, timeout))
+            return cached
+        # 旧值已过旧：短超时同步查询，失败时才沿用旧值
+        result = cache.refresh(city, lambda: _get_weather_amap(city, amap_key, min(timeout, CFG.weather_sync_timeout)))
+        if result is None:
+            print(f"[WARN] 天气查询失败（{city}），沿用 {age / 3600:.1f} 小时前的结果")
+            return cached
+        return result
+
+    result = _get_weather_amap(city, amap_key, timeout)
+    if result != "未知":
+        cache.store(city, result)
+        return result
+
+    print(f"[WARN] 天气查询失败且无历史记录（{city}），使用默认天气")
     return "晴天"
 
 
@@ -36,14 +174,14 @@ def _get_weather_amap(city: str, api_key: str, timeout: int) -> WeatherType:
     """使用高德天气API获取天气"""
     try:
         # 高德天气API
-        url = "https://restapi.amap.com/v3/weather/weatherInfo"
+        url = AMAP_WEATHER_URL
         params = {
             "city": city,
             "key": api_key,
             "extensions": "base"
         }
 
-        response = requests.get(url, params=params, timeout=timeout)
+        response = http_client.get(url, params=params, timeout=timeout)
         data = response.json()
 
         if data.get("status") == "1" and data.get("lives"):
@@ -0,0 +1,118 @@
+"""
+微信素材缓存
+按图片内容的 sha256 记录已上传素材（media_id 或图片 URL）及其有效期，
+同一张海报在有效期内只上传一次，重复发送、重试直接复用。
+
+- 临时素材（media/upload）微信保留 3 天，按 CFG.wechat_media_ttl_seconds 提前过期
+- 图文内容图片（media/uploadimg）返回的 URL 长期有效，仍按 CFG.wechat_image_url_ttl_seconds 定期重新上传
+- 微信报告素材无效（errcode 40007）时，调用方作废对应条目并重新上传（见 app/wechat_sender.py）
+条目按账号区分（公众号 app_id / 企业微信 corp_id），存于 <cache_dir>/wechat_media.json；
+定时任务与网页等多个进程共用该文件，写入时加锁合并，不会覆盖彼此的条目。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from .config import CFG
+from .file_lock import file_lock, file_stamp
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class MediaCache:
+    """线程安全、多进程共用的素材缓存；条目为 {"value": media_id 或 URL, "expires_at": 时间戳或 None}"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._stamp: tuple[int, int] | None = None
+        # 每个条目一把上传锁：同一素材并发未命中时只上传一次，其余等待结果
+        self._upload_locks: dict[str, threading.Lock] = {}
+
+    def _load(self) -> dict[str, dict]:
+        """返回内存中的条目；文件自上次读取后被改写（含别的进程）时重新读取"""
+        stamp = file_stamp(self.path)
+        if stamp != self._stamp:
+            try:
+                self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._entries = {}
+            self._stamp = stamp
+        return self._entries
+
+    def _save(self, updates: dict[str, dict], removed: dict[str, str] | None = None) -> None:
+        """在锁文件保护下读出最新内容，合并 updates、删除 removed 中值仍未变的条目后整体替换文件"""
+        now = time.time()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.path.with_name(f"{self.path.name}.lock")):
+                self._stamp = None
+                entries = {**self._load(), **updates}
+                for key, value in (removed or {}).items():
+                    # 别的进程已重新上传的新素材不删
+                    if entries.get(key, {}).get("value") == value:
+                        del entries[key]
+                entries = {k: v for k, v in entries.items() if v["expires_at"] is None or v["expires_at"] > now}
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.path)
+                self._entries, self._stamp = entries, file_stamp(self.path)
+        except (OSError, TimeoutError) as e:
+            # 写入失败时至少本进程内可用
+            self._entries.update(updates)
+            for key in removed or {}:
+                self._entries.pop(key, None)
+            print(f"[WARN] 写入微信素材缓存失败: {e}")
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._load().get(key)
+        if entry and (entry["expires_at"] is None or entry["expires_at"] > time.time()):
+            return entry["value"]
+        return None
+
+    def put(self, key: str, value: str, ttl_seconds: float | None) -> None:
+        with self._lock:
+            expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+            self._save({key: {"value": value, "expires_at": expires_at}})
+
+    def invalidate(self, key: str, value: str | None = None) -> None:
+        """删除条目；给出 value 时只在条目仍是该值时删除，不影响别人刚重新上传的素材"""
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is not None and value in (None, entry["value"]):
+                self._save({}, {key: entry["value"]})
+
+    def get_or_upload(self, key: str, upload: Callable[[], str], ttl_seconds: float | None) -> str:
+        """有未过期的缓存直接返回，否则调用 upload() 上传并记录；同一条目同时只有一个线程上传"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            upload_lock = self._upload_locks.setdefault(key, threading.Lock())
+        with upload_lock:
+            # 等锁期间别的线程可能已上传完成
+            value = self.get(key)
+            if value is None:
+                value = upload()
+                self.put(key, value, ttl_seconds)
+        return value
+
+
+_CACHE: MediaCache | None = None
+
+
+def get_media_cache() -> MediaCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = MediaCache(CFG.cache_dir / "wechat_media.json")
+    return _CACHE
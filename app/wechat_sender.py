@@ -8,28 +8,85 @@
 from __future__ import annotations
 
 import os
-import time
 import json
-import base64
+from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Literal
-import requests
+from typing import Callable, Literal
 
+from . import http_client
+from .config import CFG
+from .token_store import get_token_store
+from .wechat_media import content_hash, get_media_cache
 
-class WeChatPublicSender:
+
+def _read_image(image: Path | bytes, filename: str = "poster.jpg") -> tuple[str, bytes]:
+    """图片可以是路径或已编码的字节，统一返回 (文件名, 字节)"""
+    if isinstance(image, (bytes, bytearray)):
+        return filename, bytes(image)
+    path = Path(image)
+    return path.name, path.read_bytes()
+
+
+# access_token 无效（40001）、不合法（40014）、已过期（42001）
+_TOKEN_ERRCODES = {40001, 40014, 42001}
+# media_id 无效（素材已过期或被删除）
+_INVALID_MEDIA_ERRCODE = 40007
+
+
+class _TokenApi(ABC):
+    """带 access_token 调用微信接口的公共部分；子类提供 token_key 与 get_access_token"""
+
+    token_key: str
+
+    @abstractmethod
+    def get_access_token(self) -> str:
+        """返回当前有效的 access_token"""
+
+    def _call(self, method: Literal["get", "post"], url: str, **kwargs) -> dict:
+        """在 url 后附上 access_token 请求并返回 JSON。
+
+        微信报告 token 失效时（如被别处重新获取后旧的作废），作废共享存储中的该 token，
+        获取新 token 后重试一次。
+        """
+        sep = "&" if "?" in url else "?"
+        for attempt in range(2):
+            token = self.get_access_token()
+            resp = getattr(http_client, method)(f"{url}{sep}access_token={token}", timeout=30, **kwargs)
+            data = resp.json()
+            if attempt == 0 and data.get("errcode") in _TOKEN_ERRCODES:
+                print(f"[WARN] access_token 已失效（errcode={data['errcode']}），重新获取后重试")
+                get_token_store().invalidate(self.token_key, token)
+                continue
+            return data
+
+    def _with_media(self, key: str, upload: Callable[[], str], call: Callable[[str], dict]) -> dict:
+        """用缓存的素材（没有则 upload() 上传）调用 call(media_id)；
+
+        微信报告素材无效时作废缓存条目、重新上传后重试一次。
+        """
+        cache = get_media_cache()
+        media_id = cache.get_or_upload(key, upload, CFG.wechat_media_ttl_seconds)
+        data = call(media_id)
+        if data.get("errcode") == _INVALID_MEDIA_ERRCODE:
+            print("[WARN] 缓存的素材已失效（errcode=40007），重新上传后重试")
+            cache.invalidate(key, media_id)
+            data = call(cache.get_or_upload(key, upload, CFG.wechat_media_ttl_seconds))
+        return data
+
+
+class WeChatPublicSender(_TokenApi):
     """微信公众号API发送器"""
 
     def __init__(self, app_id: str, app_secret: str):
         self.app_id = app_id
         self.app_secret = app_secret
-        self.access_token = None
-        self.token_expires_at = 0
+        self.token_key = f"public:{app_id}"
 
     def get_access_token(self) -> str:
-        """获取access_token"""
-        if self.access_token and time.time() < self.token_expires_at:
-            return self.access_token
+        """获取access_token（跨进程共享，见 app/token_store.py）"""
+        return get_token_store().get(self.token_key, self._fetch_access_token)
 
+    def _fetch_access_token(self) -> tuple[str, int]:
         url = "https://api.weixin.qq.com/cgi-bin/token"
         params = {
             "grant_type": "client_credential",
@@ -37,64 +94,78 @@ class WeChatPublicSender:
             "secret": self.app_secret
         }
 
-        resp = requests.get(url, params=params, timeout=30)
+        resp = http_client.get(url, params=params, timeout=30)
         data = resp.json()
 
         if "access_token" in data:
-            self.access_token = data["access_token"]
-            self.token_expires_at = time.time() + data.get("expires_in", 7200) - 300
-            return self.access_token
+            return data["access_token"], data.get("expires_in", 7200)
         else:
             raise Exception(f"获取access_token失败: {data}")
 
-    def upload_image(self, image_path: Path) -> str:
-        """上传图片到微信服务器,返回media_id"""
-        token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/media/upload?access_token={token}&type=image"
+    def upload_image(self, image_path: Path | bytes) -> str:
+        """上传图片到微信服务器,返回media_id；同一图片在有效期内只上传一次"""
+        name, img_bytes = _read_image(image_path)
+        return get_media_cache().get_or_upload(
+            self._media_key(img_bytes), lambda: self._upload_media(name, img_bytes), CFG.wechat_media_ttl_seconds
+        )
 
-        with open(image_path, "rb") as f:
-            files = {"media": (image_path.name, f, "image/jpeg")}
-            resp = requests.post(url, files=files, timeout=30)
-            data = resp.json()
+    def _media_key(self, img_bytes: bytes) -> str:
+        return f"public:{self.app_id}:thumb:{content_hash(img_bytes)}"
+
+    def _upload_media(self, name: str, img_bytes: bytes) -> str:
+        files = {"media": (name, img_bytes, "image/jpeg")}
+        data = self._call("post", "https://api.weixin.qq.com/cgi-bin/media/upload?type=image", files=files)
 
         if "media_id" in data:
             return data["media_id"]
         else:
             raise Exception(f"上传图片失败: {data}")
 
-    def create_draft(self, title: str, image_path: Path, content: str = "") -> str:
-        """创建草稿"""
-        token = self.get_access_token()
+    def upload_content_image(self, image_path: Path | bytes) -> str:
+        """上传图文内容中的图片,返回图片URL（长期有效，按内容缓存）"""
+        name, img_bytes = _read_image(image_path)
+        key = f"public:{self.app_id}:img:{content_hash(img_bytes)}"
+        return get_media_cache().get_or_upload(key, lambda: self._upload_content_image(name, img_bytes), CFG.wechat_image_url_ttl_seconds)
+
+    def _upload_content_image(self, name: str, img_bytes: bytes) -> str:
+        files = {"media": (name, img_bytes, "image/jpeg")}
+        data = self._call("post", "https://api.weixin.qq.com/cgi-bin/media/uploadimg", files=files)
 
-        # 上传封面图片
-        thumb_media_id = self.upload_image(image_path)
+        if "url" in data:
+            return data["url"]
+        else:
+            raise Exception(f"上传图文图片失败: {data}")
 
-        # 创建草稿
-        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={token}"
+    def create_draft(self, title: str, image_path: Path | bytes, content: str = "") -> str:
+        """创建草稿"""
+        # 图片只读取一次，封面与正文图片共用同一份字节
+        name, img_bytes = _read_image(image_path)
 
-        # 读取图片并转换为HTML img标签
-        with open(image_path, "rb") as f:
-            img_data = base64.b64encode(f.read()).decode()
+        # 正文图片按内容缓存，重复发送不再上传
+        img_url = self.upload_content_image(img_bytes)
 
+        # 正文引用已上传图片的URL，不再内嵌base64（体积多约33%）
         article_content = f"""
         <p>{content}</p>
-        <p><img src="data:image/jpeg;base64,{img_data}" /></p>
+        <p><img src="{img_url}" /></p>
         """
 
-        payload = {
-            "articles": [{
-                "title": title,
-                "author": "南昌县移动",
-                "digest": content or "吉祥号码专场,限时优惠!",
-                "content": article_content,
-                "thumb_media_id": thumb_media_id,
-                "need_open_comment": 0,
-                "only_fans_can_comment": 0
-            }]
-        }
+        def add_draft(thumb_media_id: str) -> dict:
+            payload = {
+                "articles": [{
+                    "title": title,
+                    "author": "南昌县移动",
+                    "digest": content or "吉祥号码专场,限时优惠!",
+                    "content": article_content,
+                    "thumb_media_id": thumb_media_id,
+                    "need_open_comment": 0,
+                    "only_fans_can_comment": 0
+                }]
+            }
+            return self._call("post", "https://api.weixin.qq.com/cgi-bin/draft/add", json=payload)
 
-        resp = requests.post(url, json=payload, timeout=30)
-        data = resp.json()
+        # 创建草稿；封面图片同样按内容缓存，缓存的素材失效时重新上传
+        data = self._with_media(self._media_key(img_bytes), lambda: self._upload_media(name, img_bytes), add_draft)
 
         if "media_id" in data:
             return data["media_id"]
@@ -103,20 +174,26 @@ class WeChatPublicSender:
 
     def publish_draft(self, media_id: str) -> bool:
         """发布草稿"""
-        token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/freepublish/submit?access_token={token}"
-
         payload = {"media_id": media_id}
-        resp = requests.post(url, json=payload, timeout=30)
-        data = resp.json()
+        data = self._call("post", "https://api.weixin.qq.com/cgi-bin/freepublish/submit", json=payload)
 
         return data.get("errcode", -1) == 0
 
     def send_image_to_customer(self, openid: str, media_id: str) -> bool:
         """发送图片消息给指定用户"""
-        token = self.get_access_token()
-        url = f"https://api.weixin.qq.com/cgi-bin/message/custom/send?access_token={token}"
+        return self._send_customer_image(openid, media_id).get("errcode", -1) == 0
+
+    def send_image(self, image_path: Path | bytes, openid: str) -> bool:
+        """上传（按内容缓存）并发送图片消息给指定用户；缓存的素材失效时重新上传"""
+        name, img_bytes = _read_image(image_path)
+        data = self._with_media(
+            self._media_key(img_bytes),
+            lambda: self._upload_media(name, img_bytes),
+            lambda media_id: self._send_customer_image(openid, media_id),
+        )
+        return data.get("errcode", -1) == 0
 
+    def _send_customer_image(self, openid: str, media_id: str) -> dict:
         payload = {
             "touser": openid,
             "msgtype": "image",
@@ -125,72 +202,97 @@ class WeChatPublicSender:
             }
         }
 
-        resp = requests.post(url, json=payload, timeout=30)
-        data = resp.json()
-
-        return data.get("errcode", -1) == 0
+        return self._call("post", "https://api.weixin.qq.com/cgi-bin/message/custom/send", json=payload)
 
 
-class WorkWechatSender:
+class WorkWechatSender(_TokenApi):
     """企业微信API发送器"""
 
     def __init__(self, corp_id: str, agent_id: int, agent_secret: str):
         self.corp_id = corp_id
         self.agent_id = agent_id
         self.agent_secret = agent_secret
-        self.access_token = None
-        self.token_expires_at = 0
+        self.token_key = f"work:{corp_id}:{agent_id}"
 
     def get_access_token(self) -> str:
-        """获取企业微信access_token"""
-        if self.access_token and time.time() < self.token_expires_at:
-            return self.access_token
+        """获取企业微信access_token（跨进程共享，每个应用的 secret 各有一个）"""
+        return get_token_store().get(self.token_key, self._fetch_access_token)
 
+    def _fetch_access_token(self) -> tuple[str, int]:
         url = "https://qyapi.weixin.qq.com/cgi-bin/gettoken"
         params = {
             "corpid": self.corp_id,
             "corpsecret": self.agent_secret
         }
 
-        resp = requests.get(url, params=params, timeout=30)
+        resp = http_client.get(url, params=params, timeout=30)
         data = resp.json()
 
         if "access_token" in data:
-            self.access_token = data["access_token"]
-            self.token_expires_at = time.time() + data.get("expires_in", 7200) - 300
-            return self.access_token
+            return data["access_token"], data.get("expires_in", 7200)
         else:
             raise Exception(f"获取access_token失败: {data}")
 
-    def upload_image(self, image_path: Path) -> str:
-        """上传图片,返回media_id"""
-        token = self.get_access_token()
-        url = f"https://qyapi.weixin.qq.com/cgi-bin/media/upload?access_token={token}&type=image"
+    def upload_image(self, image_path: Path | bytes) -> str:
+        """上传图片,返回media_id；同一图片在有效期内只上传一次"""
+        name, img_bytes = _read_image(image_path)
+        return get_media_cache().get_or_upload(
+            self._media_key(img_bytes), lambda: self._upload_media(name, img_bytes), CFG.wechat_media_ttl_seconds
+        )
 
-        with open(image_path, "rb") as f:
-            files = {"media": (image_path.name, f, "image/jpeg")}
-            resp = requests.post(url, files=files, timeout=30)
-            data = resp.json()
+    def _media_key(self, img_bytes: bytes) -> str:
+        return f"work:{self.corp_id}:media:{content_hash(img_bytes)}"
+
+    def _upload_media(self, name: str, img_bytes: bytes) -> str:
+        files = {"media": (name, img_bytes, "image/jpeg")}
+        data = self._call("post", "https://qyapi.weixin.qq.com/cgi-bin/media/upload?type=image", files=files)
 
         if "media_id" in data:
             return data["media_id"]
         else:
             raise Exception(f"上传图片失败: {data}")
 
-    def send_image(self, image_path: Path, touser: str = "@all") -> bool:
-        """发送图片消息
+    def upload_content_image(self, image_path: Path | bytes) -> str:
+        """上传图文消息用的图片,返回图片URL（长期有效，按内容缓存）"""
+        name, img_bytes = _read_image(image_path)
+        key = f"work:{self.corp_id}:img:{content_hash(img_bytes)}"
+        return get_media_cache().get_or_upload(key, lambda: self._upload_content_image(name, img_bytes), CFG.wechat_image_url_ttl_seconds)
+
+    def _upload_content_image(self, name: str, img_bytes: bytes) -> str:
+        files = {"media": (name, img_bytes, "image/jpeg")}
+        data = self._call("post", "https://qyapi.weixin.qq.com/cgi-bin/media/uploadimg", files=files)
+
+        if "url" in data:
+            return data["url"]
+        else:
+            raise Exception(f"上传图文图片失败: {data}")
+
+    def send_image(self, image_path: Path | bytes, touser: str = "@all", toparty: str = "", totag: str = "") -> bool:
+        """发送图片消息；图片按内容缓存，缓存的素材失效时重新上传
 
         Args:
-            image_path: 图片路径
+            image_path: 图片路径或已编码的图片字节
             touser: 接收人,多个用|分隔,@all表示全部
+            toparty: 接收部门,多个用|分隔
+            totag: 接收标签,多个用|分隔
         """
-        token = self.get_access_token()
-        media_id = self.upload_image(image_path)
+        name, img_bytes = _read_image(image_path)
+        data = self._with_media(
+            self._media_key(img_bytes),
+            lambda: self._upload_media(name, img_bytes),
+            lambda media_id: self._send_media(media_id, touser, toparty, totag),
+        )
+        return data.get("errcode", -1) == 0
 
-        url = f"https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={token}"
+    def send_media(self, media_id: str, touser: str = "", toparty: str = "", totag: str = "") -> bool:
+        """发送已上传的图片,接收人可以是成员、部门、标签（多个用|分隔）"""
+        return self._send_media(media_id, touser, toparty, totag).get("errcode", -1) == 0
 
+    def _send_media(self, media_id: str, touser: str, toparty: str, totag: str) -> dict:
         payload = {
             "touser": touser,
+            "toparty": toparty,
+            "totag": totag,
             "msgtype": "image",
             "agentid": self.agent_id,
             "image": {
@@ -198,18 +300,13 @@ class WorkWechatSender:
             }
         }
 
-        resp = requests.post(url, json=payload, timeout=30)
-        data = resp.json()
-
-        return data.get("errcode", -1) == 0
+        return self._call("post", "https://qyapi.weixin.qq.com/cgi-bin/message/send", json=payload)
 
-    def send_news(self, title: str, description: str, image_path: Path,
+    def send_news(self, title: str, description: str, image_path: Path | bytes,
                   url: str = "", touser: str = "@all") -> bool:
         """发送图文消息"""
-        token = self.get_access_token()
-        picurl = self.upload_image(image_path)
-
-        api_url = f"https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={token}"
+        # picurl 需要图片URL而不是media_id
+        picurl = self.upload_content_image(image_path)
 
         payload = {
             "touser": touser,
@@ -225,8 +322,7 @@ class WorkWechatSender:
             }
         }
 
-        resp = requests.post(api_url, json=payload, timeout=30)
-        data = resp.json()
+        data = self._call("post", "https://qyapi.weixin.qq.com/cgi-bin/message/send", json=payload)
 
         return data.get("errcode", -1) == 0
 
@@ -257,11 +353,11 @@ class WeChatSender:
                 agent_secret=config.get("agent_secret")
             )
 
-    def send_poster(self, image_path: Path, title: str = "", description: str = "") -> bool:
+    def send_poster(self, image_path: Path | bytes, title: str = "", description: str = "") -> bool:
         """发送海报
 
         Args:
-            image_path: 海报图片路径
+            image_path: 海报图片路径，或渲染器返回的内存图片字节（免去再读磁盘）
             title: 标题
             description: 描述文案
 
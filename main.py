@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import argparse
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
 from pathlib import Path
 import sys
+import time
 import pytz
 
 from apscheduler.schedulers.blocking import BlockingScheduler
@@ -12,15 +14,11 @@ from app.config import CFG, ensure_dirs, select_font_path
 from app.data_loader import load_numbers_excel
 from app.used_storage import UsedStorage
 from app.selection import choose_category, pick_numbers_for_category
-from app.holidays_util import date_cn_str, get_holiday_name
-from app.ai_copy import generate_copy
+from app.calendar_context import get_day_context
+from app.ai_copy import _local_fallback_copy, generate_copy
 from app.weather_api import get_weather
 from app.theme_system import select_theme, get_theme_description
-from app.wechat_sender import create_wechat_sender
-try:
-    from app.poster_generator_v2 import render_poster  # 新版渲染（3x3、两行meta、间距优化）
-except Exception:
-    from app.poster_generator import render_poster  # 退回旧版
+from app.renderers import available_renderers, get_renderer
 
 
 def now_shanghai() -> datetime:
@@ -32,114 +30,218 @@ def format_out_name(d: datetime) -> str:
     return d.strftime("%Y%m%d_%H%M.jpg")
 
 
-def generate_once(category: str | None, *, slot: str | None = None, excel_path: Path | None = None, debug: bool = False, auto_send: bool = False) -> Path | None:
-    ensure_dirs()
-    d = now_shanghai()
-    slot_tag = slot or ("morning" if d.hour < 12 else ("noon" if d.hour < 18 else "evening"))
-    print(f"[INFO] 生成时间: {d.isoformat()} 时段: {slot_tag}")
+class _InlineExecutor:
+    """顺序模式：submit 时当场执行，接口与线程池一致"""
 
-    # 读取数据
-    try:
-        xls = excel_path if excel_path else CFG.excel_file
-        print(f"[INFO] 使用 Excel: {xls}")
-        df = load_numbers_excel(xls)
-    except Exception as e:
-        print(f"[ERROR] 读取 Excel 失败: {e}")
-        return None
+    def submit(self, fn, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
 
-    store = UsedStorage(CFG.used_json)
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        pass
 
-    # 选择分类
-    chosen = choose_category(
-        df,
-        store,
-        preferred=category,
-        priority_list=CFG.category_priority,
-        min_count=CFG.numbers_per_poster,
-        randomize=CFG.randomize_category_default,
-    )
-    if not chosen:
-        print("[WARN] 未找到满足条件的分类（>=15 个未使用号码）。本次不生成。")
-        return None
-    print(f"[INFO] 选择分类: {chosen}")
 
-    # 抽取号码
-    items = pick_numbers_for_category(df, store, chosen, count=CFG.numbers_per_poster)
-    if len(items) < CFG.numbers_per_poster:
-        print(f"[WARN] 分类号码数不足 {CFG.numbers_per_poster}，本次跳过。")
-        return None
-    if debug:
-        print("[DEBUG] 选取号码:")
-        for it in items:
-            print("  -", it["号码"], "/ 预存", it.get("预存"), "/ 低消", it.get("低消"))
+# 等待天气与文案时为渲染预留的时间（秒）
+_RENDER_RESERVE_SECONDS = 3.0
 
-    # 获取节日和天气信息
-    holiday_name = get_holiday_name(d.date())
-    if holiday_name:
-        print(f"[INFO] 今日节日: {holiday_name}")
 
-    weather = None
+def _await_stage(fut: Future, deadline: float, label: str):
+    """在时间预算内等待后台阶段的结果；超时或失败返回 None，由调用方兜底"""
+    remaining = deadline - _RENDER_RESERVE_SECONDS - time.monotonic()
     try:
-        weather = get_weather(CFG.location_name)
-        print(f"[INFO] 当前天气: {weather}")
+        return fut.result(timeout=max(0.0, remaining))
+    except FutureTimeout:
+        print(f"[WARN] {label}超出时间预算，不再等待")
     except Exception as e:
-        print(f"[WARN] 获取天气失败: {e}")
+        print(f"[WARN] {label}失败: {e}")
+    return None
+
+
+def _format_timings(timings, total: float) -> str:
+    parts = [f"{s.name} {s.seconds * 1000:.0f}ms" for s in timings.stages.values()]
+    return " · ".join(parts) + f" · 总计 {total * 1000:.0f}ms（预算 {CFG.generation_budget_seconds:g}s）"
+
+
+def generate_once(category: str | None, *, slot: str | None = None, excel_path: Path | None = None, debug: bool = False, auto_send: bool = False, renderer: str | None = None, pipelined: bool | None = None, theme_name: str | None = None) -> Path | None:
+    """生成一张海报
 
-    # 选择主题
-    theme = select_theme(dt=d, weather=weather, holiday_name=holiday_name)
-    print(f"[INFO] 使用主题: {theme.name}")
+    theme_name 指定主题（内置或 themes.json 中的），不指定时按 CFG.theme 或自动选择。
+
+    流水线模式（默认，CFG.pipelined_generation）下，天气查询一开始就在后台发起，
+    文案在分类确定后（指定了分类时推测性地提前）发起，与读取 Excel、选号并行；
+    两者都在端到端时间预算（CFG.generation_budget_seconds）内等待，超时则用缓存/本地文案兜底。
+    """
+    from app.render_profile import RenderProfile
+
+    ensure_dirs()
+    t_start = time.monotonic()
+    deadline = t_start + CFG.generation_budget_seconds
+    d = now_shanghai()
+    slot_tag = slot or ("morning" if d.hour < 12 else ("noon" if d.hour < 18 else "evening"))
+    print(f"[INFO] 生成时间: {d.isoformat()} 时段: {slot_tag}")
+
+    pipelined = CFG.pipelined_generation if pipelined is None else pipelined
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="generate") if pipelined else _InlineExecutor()
+    timings = RenderProfile()
+
+    def timed(name: str, fn, *args, **kwargs):
+        with timings.stage(name):
+            return fn(*args, **kwargs)
+
+    try:
+        # 天气与分类、号码都无关，最先发起
+        weather_fut = pool.submit(timed, "weather", get_weather, CFG.location_name)
+        # 指定了分类时推测性地提前请求文案；最终选中的分类不同则重新请求
+        copy_fut = copy_category = None
+        if pipelined and category:
+            copy_fut = pool.submit(timed, "copy", generate_copy, d, category, tone=slot_tag)
+            copy_category = category
+
+        # 读取数据
+        try:
+            xls = excel_path if excel_path else CFG.excel_file
+            print(f"[INFO] 使用 Excel: {xls}")
+            with timings.stage("excel"):
+                df = load_numbers_excel(xls)
+        except Exception as e:
+            print(f"[ERROR] 读取 Excel 失败: {e}")
+            return None
+
+        store = UsedStorage(CFG.used_json)
+
+        # 选择分类
+        with timings.stage("select"):
+            chosen = choose_category(
+                df,
+                store,
+                preferred=category,
+                priority_list=CFG.category_priority,
+                min_count=CFG.numbers_per_poster,
+                randomize=CFG.randomize_category_default,
+            )
+        if not chosen:
+            print("[WARN] 未找到满足条件的分类（>=15 个未使用号码）。本次不生成。")
+            return None
+        print(f"[INFO] 选择分类: {chosen}")
+
+        # 分类确定后立即请求文案，与抽取号码并行
+        if copy_category != chosen:
+            if copy_fut is not None:
+                copy_fut.cancel()
+                print(f"[INFO] 指定分类 {category} 未被选用，重新请求文案")
+            copy_fut = pool.submit(timed, "copy", generate_copy, d, chosen, tone=slot_tag)
+
+        # 抽取号码
+        with timings.stage("select"):
+            items = pick_numbers_for_category(df, store, chosen, count=CFG.numbers_per_poster)
+        if len(items) < CFG.numbers_per_poster:
+            print(f"[WARN] 分类号码数不足 {CFG.numbers_per_poster}，本次跳过。")
+            return None
+        if debug:
+            print("[DEBUG] 选取号码:")
+            for it in items:
+                print("  -", it["号码"], "/ 预存", it.get("预存"), "/ 低消", it.get("低消"))
+
+        # 获取节日和天气信息（节日、时令、日期来自预计算的日历表）
+        day = get_day_context(d.date())
+        holiday_name = day.holiday
+        if holiday_name:
+            print(f"[INFO] 今日节日: {holiday_name}")
+
+        weather = _await_stage(weather_fut, deadline, "获取天气")
+        if weather:
+            print(f"[INFO] 当前天气: {weather}")
+
+        # 选择主题
+        theme = select_theme(dt=d, weather=weather, holiday_name=holiday_name, holiday_theme=day.holiday_theme, theme=theme_name)
+        print(f"[INFO] 使用主题: {theme.name}")
+
+        # AI 文案（返回 {title, tagline}），超出预算时用本地模板
+        copy = _await_stage(copy_fut, deadline, "生成文案")
+        if copy is None:
+            copy = _local_fallback_copy(d, chosen, slot_tag)
+    finally:
+        # 不等待超时未归的后台请求
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    # AI 文案
-    copy = generate_copy(d, chosen, tone=slot_tag)  # 返回 {title, tagline}
     title = copy.get("title", "好号专场")
     tagline = copy.get("tagline", "幸运好号，多重优惠，限时抢购！")
 
     # 构建副标题（包含日期、天气、主题信息和分类）
     theme_desc = get_theme_description(theme, weather)
-    subtitle = f"{date_cn_str(d.date())} {theme_desc}｜{chosen}专场"
+    subtitle = f"{day.date_str} {theme_desc}｜{chosen}专场"
+
+    # 渲染图片（渲染器及其依赖在此时才导入）
+    from app.poster_output import remember_poster
 
-    # 渲染图片
     out_path = CFG.output_dir / format_out_name(d)
     font_path = select_font_path()
+    profile = RenderProfile(track_alloc=True) if debug else None
     try:
-        render_poster(
-            output_path=out_path,
-            font_path=font_path,
-            title=title,
-            subtitle=subtitle,
-            tagline=tagline,
-            items=items,
-            branding_label=getattr(CFG, "branding_label", None),
-            grid_cols=3,
-            grid_rows=3,
-            location=getattr(CFG, "location_name", None),
-            hotline=getattr(CFG, "hotline", None),
-            theme=theme,
-        )
+        render_poster = get_renderer(renderer)
+        with timings.stage("render"):
+            poster = render_poster(
+                output_path=out_path,
+                font_path=font_path,
+                title=title,
+                subtitle=subtitle,
+                tagline=tagline,
+                items=items,
+                branding_label=getattr(CFG, "branding_label", None),
+                grid_cols=3,
+                grid_rows=3,
+                location=getattr(CFG, "location_name", None),
+                hotline=getattr(CFG, "hotline", None),
+                theme=theme,
+                variants=CFG.output_variants,
+                profile=profile,
+            )
     except Exception as e:
         print(f"[ERROR] 渲染图片失败: {e}")
         return None
 
+    remember_poster(poster)
+
     # 标记已使用
     store.mark_used([it["号码"] for it in items], category=chosen, output_path=str(out_path))
 
     print(f"[OK] 已生成: {out_path}")
+    print(f"[INFO] 阶段耗时: {_format_timings(timings, time.monotonic() - t_start)}")
+    if profile is not None:
+        print("[DEBUG] 渲染分阶段耗时:")
+        for ln in profile.report().splitlines():
+            print("  ", ln)
+    if debug:
+        from app.http_client import format_http_stats
+
+        print(f"[DEBUG] HTTP 连接: {format_http_stats()}")
+        from app.ai_copy import COPY_STATS
 
-    # 自动发送到微信
+        print(f"[DEBUG] AI 文案: {COPY_STATS.format()}")
+    if debug and poster.variant_paths:
+        for name, path in poster.variant_paths.items():
+            print(f"[DEBUG] 变体 {name}: {path.name} ({len(poster.variants[name]) / 1024:.1f} KB)")
+
+    # 自动发送到微信：只写入发送队列，由后台线程发送（失败自动重试）
     if auto_send:
-        try:
-            sender = create_wechat_sender()
-            success = sender.send_poster(
-                image_path=out_path,
-                title=title,
-                description=tagline
-            )
-            if success:
-                print("[OK] 微信发送成功")
+        from app.fanout import load_channels
+        from app.outbox import enqueue_poster
+
+        if not load_channels():
+            print("[INFO] 微信发送功能未启用")
+        else:
+            # 优先体积更小的 web 变体
+            queued = enqueue_poster(poster.variants.get("web", poster.data), title, tagline)
+            if queued == "added":
+                print("[OK] 已加入微信发送队列")
+            elif queued == "requeued":
+                print("[OK] 该海报此前发送失败，已重新加入发送队列")
             else:
-                print("[WARN] 微信发送失败或未启用")
-        except Exception as e:
-            print(f"[ERROR] 微信发送异常: {e}")
+                print("[INFO] 该海报已在发送队列中，跳过")
 
     return out_path
 
@@ -165,12 +267,56 @@ def list_categories(excel_path: Path | None = None) -> int:
     return 0
 
 
-def run_schedule(excel_path: Path | None = None) -> None:
+def build_catalog_once(category: str | None, *, excel_path: Path | None = None, fmt: str = "pdf", workers: int | None = None, renderer: str | None = None) -> int:
+    from app.catalog import build_catalog
+
+    try:
+        xls = excel_path if excel_path else CFG.excel_file
+        df = load_numbers_excel(xls)
+    except Exception as e:
+        print(f"[ERROR] 读取 Excel 失败: {e}")
+        return 1
+
+    store = UsedStorage(CFG.used_json)
+    out = build_catalog(df, store, category=category, fmt=fmt, workers=workers, renderer=renderer, dt=now_shanghai().replace(tzinfo=None))
+    return 0 if out else 1
+
+
+def drain_outbox() -> int:
+    """单次运行时在前台发送队列中的条目，最多等待 CFG.outbox_drain_seconds 秒"""
+    from app.outbox import get_delivery_worker, get_outbox
+
+    if get_delivery_worker().drain(CFG.outbox_drain_seconds):
+        return 0
+    print(f"[WARN] 仍有未发送的条目（{get_outbox().counts()}），下次运行或定时任务启动后继续发送")
+    return 1
+
+
+def pregen_copy_once(excel_path: Path | None = None) -> int:
+    """为 schedule_plan 中即将到来的各时段预生成 AI 文案"""
+    from app.copy_cache import pregenerate_copy
+    from app.selection import eligible_categories
+
+    try:
+        xls = excel_path if excel_path else CFG.excel_file
+        df = load_numbers_excel(xls)
+    except Exception as e:
+        print(f"[ERROR] 读取 Excel 失败: {e}")
+        return 1
+
+    store = UsedStorage(CFG.used_json)
+    categories = eligible_categories(df, store, min_count=CFG.numbers_per_poster)
+    made = pregenerate_copy(now_shanghai(), categories)
+    print(f"[OK] 文案预生成完成，新增 {made} 条")
+    return 0
+
+
+def run_schedule(excel_path: Path | None = None, renderer: str | None = None) -> None:
     sched = BlockingScheduler(timezone=CFG.timezone)
 
     def job(category: str | None, slot: str, auto_send: bool = False):
         try:
-            generate_once(category, slot=slot, excel_path=excel_path, auto_send=auto_send)
+            generate_once(category, slot=slot, excel_path=excel_path, auto_send=auto_send, renderer=renderer)
         except Exception as e:
             print(f"[ERROR] 任务异常: {e}")
 
@@ -185,11 +331,31 @@ def run_schedule(excel_path: Path | None = None) -> None:
         send_tag = " [自动发送微信]" if auto_send else ""
         print(f"[SCHED] 已安排 {hhmm} 分类={cat or '自动选择'}{send_tag}")
 
+    # 低峰时段预生成文案，各时段出图时直接命中缓存
+    if CFG.copy_pregen_time:
+        def pregen_job():
+            try:
+                pregen_copy_once(excel_path)
+            except Exception as e:
+                print(f"[ERROR] 文案预生成异常: {e}")
+
+        hh, mm = [int(x) for x in CFG.copy_pregen_time.split(":")]
+        sched.add_job(pregen_job, "cron", hour=hh, minute=mm, id="copy_pregen")
+        print(f"[SCHED] 已安排 {CFG.copy_pregen_time} 预生成文案")
+
+    # 后台发送线程：处理新入队的海报以及上次退出时未发完的条目
+    from app.outbox import get_delivery_worker
+
+    worker = get_delivery_worker()
+    worker.start()
+
     print("[SCHED] 调度器启动，按 Ctrl+C 停止")
     try:
         sched.start()
     except (KeyboardInterrupt, SystemExit):
         print("[SCHED] 已停止")
+    finally:
+        worker.stop()
 
 
 def main(argv=None) -> int:
@@ -202,6 +368,13 @@ def main(argv=None) -> int:
     parser.add_argument("--slot", type=str, choices=["morning", "noon", "evening"], default=None, help="覆盖时段：morning/noon/evening")
     parser.add_argument("--list-categories", action="store_true", help="仅列出分类与数量并退出")
     parser.add_argument("--send", action="store_true", help="生成后自动发送到微信（需配置wechat_config.json）")
+    parser.add_argument("--catalog", action="store_true", help="生成号码目录：--category 指定分类，否则包含全部未使用号码")
+    parser.add_argument("--catalog-format", type=str, choices=["pdf", "jpg"], default="pdf", help="目录输出格式：多页 PDF 或编号 JPEG")
+    parser.add_argument("--workers", type=int, default=None, help="目录渲染进程数（默认 CPU 核数）")
+    parser.add_argument("--renderer", type=str, choices=available_renderers(), default=None, help=f"海报渲染器（默认 {CFG.renderer}）")
+    parser.add_argument("--pregen-copy", action="store_true", help="为即将到来的各定时时段预生成 AI 文案并退出")
+    parser.add_argument("--theme", type=str, default=None, help="指定主题名（内置或 themes.json 中的自定义主题），默认自动选择")
+    parser.add_argument("--sequential", action="store_true", help="按顺序执行天气、文案等阶段（默认并行）")
 
     args = parser.parse_args(argv)
 
@@ -209,12 +382,20 @@ def main(argv=None) -> int:
     if args.list_categories:
         return list_categories(excel_override)
 
+    if args.catalog:
+        return build_catalog_once(args.category, excel_path=excel_override, fmt=args.catalog_format, workers=args.workers, renderer=args.renderer)
+
+    if args.pregen_copy:
+        return pregen_copy_once(excel_override)
+
     if args.once:
-        generate_once(args.category, slot=args.slot, excel_path=excel_override, debug=args.debug, auto_send=args.send)
+        generate_once(args.category, slot=args.slot, excel_path=excel_override, debug=args.debug, auto_send=args.send, renderer=args.renderer, pipelined=False if args.sequential else None, theme_name=args.theme)
+        if args.send:
+            return drain_outbox()
         return 0
 
     if args.schedule:
-        run_schedule(excel_path=excel_override)
+        run_schedule(excel_path=excel_override, renderer=args.renderer)
         return 0
 
     parser.print_help()
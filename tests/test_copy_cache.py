@@ -0,0 +1,47 @@
+"""文案缓存：多个进程（这里用多个 CopyCache 实例代替）共用同一文件时互不覆盖"""
+from datetime import date, timedelta
+
+from app.copy_cache import CopyCache
+
+TODAY = date.today()
+
+
+def _copy(title: str) -> dict:
+    return {"title": title, "tagline": "t", "meta": {"source": "openai"}}
+
+
+def test_writes_from_two_instances_are_merged(tmp_path):
+    path = tmp_path / "copy_cache.json"
+    a, b = CopyCache(path), CopyCache(path)
+    assert a.get(TODAY, "AABB", "morning") is None
+    assert b.get(TODAY, "ABAB", "noon") is None
+
+    a.put(TODAY, "AABB", "morning", _copy("a"))
+    b.put(TODAY, "ABAB", "noon", _copy("b"))
+
+    fresh = CopyCache(path)
+    assert fresh.get(TODAY, "AABB", "morning")["title"] == "a"
+    assert fresh.get(TODAY, "ABAB", "noon")["title"] == "b"
+
+
+def test_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "copy_cache.json"
+    a, b = CopyCache(path), CopyCache(path)
+    a.put(TODAY, "AABB", "morning", _copy("old"))
+    assert b.get(TODAY, "AABB", "morning")["title"] == "old"
+
+    a.put(TODAY, "AABB", "morning", _copy("new"))
+    assert b.get(TODAY, "AABB", "morning")["title"] == "new"
+
+
+def test_old_dates_are_pruned_and_lock_released(tmp_path):
+    path = tmp_path / "copy_cache.json"
+    cache = CopyCache(path, keep_days=3)
+    cache.put_many([
+        (TODAY - timedelta(days=10), "AABB", "morning", _copy("stale")),
+        (TODAY + timedelta(days=1), "AABB", "morning", _copy("next")),
+    ])
+    fresh = CopyCache(path)
+    assert fresh.get(TODAY - timedelta(days=10), "AABB", "morning") is None
+    assert fresh.get(TODAY + timedelta(days=1), "AABB", "morning")["title"] == "next"
+    assert not path.with_name(f"{path.name}.lock").exists()
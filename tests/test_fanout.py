@@ -0,0 +1,45 @@
+"""多渠道分发：跳过已送达目标、进程内共用限速器"""
+import time
+
+from app import fanout
+from app.fanout import FanoutDispatcher
+
+
+class FakeChannel:
+    def __init__(self, name: str, targets: list[str], fail: set[str] = frozenset()) -> None:
+        self.name = name
+        self.targets = targets
+        self.fail = set(fail)
+        self.prepared = 0
+        self.sent: list[tuple[str, float]] = []
+
+    def prepare(self, image: bytes) -> None:
+        self.prepared += 1
+
+    def api(self, target: str) -> str:
+        return "fake.send"
+
+    def send(self, target: str, image: bytes, title: str, description: str) -> bool:
+        self.sent.append((target, time.monotonic()))
+        return target not in self.fail
+
+
+def test_dispatch_skips_delivered_targets_and_prepares_once():
+    ch = FakeChannel("ch", ["a", "b", "c"], fail={"b"})
+    results = FanoutDispatcher([ch], rate_limits={}).dispatch(b"img", "t", "d", skip={"ch/c"})
+    assert {r.key: r.ok for r in results} == {"ch/a": True, "ch/b": False}
+    assert ch.prepared == 1
+
+
+def test_rate_limit_holds_across_deliveries(monkeypatch):
+    ch = FakeChannel("ch", ["a"])
+    monkeypatch.setattr(fanout, "_DISPATCHER", None)
+    monkeypatch.setattr(fanout, "load_channels", lambda: [ch])
+    monkeypatch.setattr(fanout, "FanoutDispatcher", lambda channels: FanoutDispatcher(channels, rate_limits={"fake.send": 5.0}))
+
+    assert fanout.get_dispatcher() is fanout.get_dispatcher()
+    for _ in range(2):
+        fanout.get_dispatcher().dispatch(b"img", "t", "d")
+    (_, first), (_, second) = ch.sent
+    # 每秒 5 次：第二次投递须等上一次之后约 0.2 秒
+    assert second - first >= 0.19
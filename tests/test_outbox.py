@@ -0,0 +1,141 @@
+"""发送队列（outbox）：入队去重、领取租约、失败退避与重新入队"""
+import dataclasses
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from app import outbox
+from app.outbox import DeliveryWorker, Outbox
+
+
+@pytest.fixture
+def box(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, "CFG", dataclasses.replace(outbox.CFG, outbox_max_attempts=2, outbox_backoff_seconds=0.0))
+    return Outbox(tmp_path / "outbox.sqlite3")
+
+
+def _give_up(box: Outbox) -> None:
+    """把队首条目失败到放弃为止"""
+    for _ in range(outbox.CFG.outbox_max_attempts):
+        item_id, _, _, _, attempts, delivered = box.claim()
+        box.fail(item_id, attempts, "boom", delivered | {"ch/a"})
+
+
+def test_enqueue_reports_added_and_duplicate(box):
+    assert box.enqueue(b"img", "t", "d") == "added"
+    assert box.enqueue(b"img", "t", "d") == "duplicate"
+    assert box.counts() == {"pending": 1}
+
+
+def test_failed_poster_is_requeued_keeping_delivered_targets(box):
+    box.enqueue(b"img", "t", "d")
+    _give_up(box)
+    assert box.counts() == {"failed": 1}
+
+    assert box.enqueue(b"img", "t", "d") == "requeued"
+    item_id, image, _, _, attempts, delivered = box.claim()
+    assert (image, attempts, delivered) == (b"img", 0, {"ch/a"})
+
+    box.complete(item_id, delivered | {"ch/b"})
+    assert box.enqueue(b"img", "t", "d") == "duplicate"
+
+
+def test_no_channels_is_a_failure_not_a_delivery(box, monkeypatch):
+    from app import fanout
+
+    monkeypatch.setattr(fanout, "get_dispatcher", lambda: fanout.FanoutDispatcher([]))
+    box.enqueue(b"img", "t", "d")
+    DeliveryWorker(box, outbox._wechat_deliver).process_one()
+    assert "done" not in box.counts()
+
+
+def test_claim_leases_the_item(box):
+    box.enqueue(b"img", "t", "d")
+    assert box.claim() is not None
+    # 租约期内不会被再次领取
+    assert box.claim() is None
+    assert box.counts() == {"sending": 1}
+
+
+def test_fail_backs_off_then_gives_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, "CFG", dataclasses.replace(outbox.CFG, outbox_max_attempts=3, outbox_backoff_seconds=10.0))
+    box = Outbox(tmp_path / "outbox.sqlite3")
+    box.enqueue(b"img", "t", "d")
+
+    item_id, _, _, _, attempts, delivered = box.claim()
+    assert box.fail(item_id, attempts, "boom", delivered) == "pending"
+    # 第一次失败后等待 [5, 10] 秒，期间不会被领取
+    assert 4.9 <= box.next_due_in() <= 10
+    assert box.claim() is None
+
+    # 到期后可再次领取，次数累计，达到上限后放弃
+    for expected in ("pending", "failed"):
+        with closing(box._connect()) as conn:
+            conn.execute("UPDATE deliveries SET next_attempt_at = 0")
+        item_id, _, _, _, attempts, delivered = box.claim()
+        assert box.fail(item_id, attempts, "boom", delivered) == expected
+    assert box.claim() is None
+    assert box.next_due_in() is None
+
+
+def test_backoff_grows_exponentially_with_jitter():
+    for attempts in range(1, 6):
+        delay = outbox.backoff_seconds(attempts, 30.0)
+        full = 30.0 * 2 ** (attempts - 1)
+        assert full / 2 <= delay <= full
+    assert outbox.backoff_seconds(50, 30.0) <= outbox._MAX_BACKOFF_SECONDS
+
+
+def test_worker_retries_only_undelivered_targets(box):
+    seen: list[set] = []
+
+    def deliver(image, title, description, delivered):
+        seen.append(set(delivered))
+        delivered.add("ch/a")
+        return len(seen) > 1
+
+    box.enqueue(b"img", "t", "d")
+    worker = DeliveryWorker(box, deliver)
+    assert worker.drain(timeout=5)
+    assert seen == [set(), {"ch/a"}]
+    assert box.counts() == {"done": 1}
+
+
+def test_complete_drops_image_but_keeps_dedup(box):
+    box.enqueue(b"img", "t", "d")
+    item_id, *_ = box.claim()
+    box.complete(item_id, {"ch/a"})
+    with closing(box._connect()) as conn:
+        assert conn.execute("SELECT image FROM deliveries").fetchall() == [(None,)]
+    assert box.enqueue(b"img", "t", "d") == "duplicate"
+
+
+def test_old_finished_rows_are_pruned(box):
+    for image in (b"done", b"failed", b"pending"):
+        box.enqueue(image, "t", "d")
+    item_id, *_ = box.claim()
+    box.complete(item_id, set())
+    _give_up(box)
+    with closing(box._connect()) as conn:
+        conn.execute("UPDATE deliveries SET updated_at = updated_at - 8 * 86400")
+
+    assert box.prune(keep_days=7) == 2
+    assert box.counts() == {"pending": 1}
+    # 记录删除后同一海报可以重新入队
+    assert box.enqueue(b"done", "t", "d") == "added"
+
+
+def test_legacy_not_null_image_column_is_migrated(tmp_path):
+    path = tmp_path / "outbox.sqlite3"
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute(outbox._SCHEMA.replace("image BLOB,", "image BLOB NOT NULL,"))
+        conn.execute(
+            "INSERT INTO deliveries (poster_hash, image, title, description, next_attempt_at, created_at, updated_at) "
+            "VALUES ('h', x'00', 't', 'd', 0, 0, 0)"
+        )
+        conn.commit()
+    box = Outbox(path)
+    item_id, image, *_ = box.claim()
+    assert image == b"\x00"
+    box.complete(item_id, set())
@@ -0,0 +1,100 @@
+"""新版渲染器（静态模板 + 文字）与原始绘制顺序逐像素一致"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app import poster_generator_v2 as v2
+from app.poster_core import (
+    _draw_centered,
+    _load_font,
+    _rounded_rect,
+    _shrink_to_fit,
+    _text_size,
+    _v_gradient,
+    _wrap_text_by_width,
+)
+from app.theme_system import THEMES
+
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+]
+FONT = next((p for p in FONT_CANDIDATES if Path(p).exists()), None)
+
+ITEMS = [{"号码": f"1380013800{i}", "预存": 100 * i, "低消": 58} for i in range(9)]
+
+
+def _params(subtitle: str, theme: str = "默认蓝调") -> dict:
+    return dict(
+        font_path=FONT,
+        title="Lucky Numbers Pick",
+        subtitle=subtitle,
+        tagline="Lucky numbers, limited time, act now! " * 2,
+        items=ITEMS,
+        branding_label="Brand label",
+        location="NC",
+        hotline="13507094669",
+        theme=THEMES[theme],
+    )
+
+
+def _reference(p: dict) -> Image.Image:
+    """原始绘制顺序：背景、头部色带、头部文字，然后才画容器、卡片与底部色带"""
+    W, H = 1080, 1440
+    theme = p["theme"]
+    date_txt, cat_font, cat_lines, layout = v2._header_layout(p["subtitle"], FONT, (W, H), 3, 3, 2)
+    img = _v_gradient((W, H), theme.bg_top, theme.bg_bottom)
+    img.paste(_v_gradient((W, layout.header_h), theme.header_top, theme.header_bottom), (0, 0))
+    draw = ImageDraw.Draw(img)
+
+    title_font = _shrink_to_fit(draw, p["title"], FONT, layout.title_max_w, layout.title_font_size)
+    t_h = _draw_centered(draw, W // 2, layout.title_y, p["title"], title_font, fill=theme.title_color)
+    y = layout.title_y + t_h + layout.title_gap
+    if date_txt:
+        date_font = _shrink_to_fit(draw, date_txt, FONT, layout.date_max_w, layout.date_font_size)
+        _draw_centered(draw, W // 2, y, date_txt, date_font, fill=theme.subtitle_color)
+        y += _text_size(draw, date_txt, date_font)[1] + layout.date_gap
+    for ln in cat_lines:
+        _draw_centered(draw, W // 2, y, ln, cat_font, fill=theme.subtitle_color)
+        y += _text_size(draw, ln, cat_font)[1] + layout.cat_line_gap
+
+    _rounded_rect(draw, layout.container_box, radius=28, fill=(255, 255, 255), outline=theme.card_border, width=2)
+    meta_font = _load_font(FONT, layout.meta_font_size)
+    wm_font = _load_font(FONT, layout.wm_font_size)
+    for item, cell in zip(p["items"], layout.cells):
+        _rounded_rect(draw, cell.box, radius=18, fill=theme.card_fill, outline=theme.card_border, width=2)
+        v2._draw_cell_text(draw, cell, item, FONT, layout.num_font_size, meta_font)
+        v2._draw_watermark(img, draw, cell.cx, cell.box[3] - cell.wm_bottom_pad, p["branding_label"], wm_font)
+
+    img.paste(_v_gradient((W, layout.footer_h), theme.footer_top, theme.footer_bottom), (0, H - layout.footer_h))
+    info_font = _load_font(FONT, layout.info_font_size)
+    tagline_font = _load_font(FONT, layout.tagline_font_size)
+    y = layout.footer_text_y
+    info_line = f"归属地：{p['location']} | 选号热线：{p['hotline']}"
+    iw, ih = _text_size(draw, info_line, info_font)
+    draw.text((W // 2 - iw // 2, y), info_line, font=info_font, fill=theme.subtitle_color)
+    y += ih + layout.info_gap
+    for ln in _wrap_text_by_width(draw, p["tagline"], tagline_font, layout.tagline_max_w)[:3]:
+        tw, th = _text_size(draw, ln, tagline_font)
+        draw.text((W // 2 - tw // 2, y), ln, font=tagline_font, fill=theme.tagline_color)
+        y += th + layout.tagline_line_gap
+    return img
+
+
+@pytest.mark.skipif(FONT is None, reason="没有可用的 TrueType 字体")
+@pytest.mark.parametrize("subtitle", [
+    "2025年10月20日 晴天｜Category special",
+    # 折成两行时分类说明会伸到容器顶部之下
+    "2025年10月20日 晴天｜靓号精选 · 三连号、四连号、AABB、ABAB、生日号、爱情号限时特惠专场",
+])
+@pytest.mark.parametrize("theme", ["默认蓝调", "国庆爱国"])
+def test_v2_matches_reference_draw_order(subtitle, theme):
+    p = _params(subtitle, theme)
+    _, _, cat_lines, _ = v2._header_layout(subtitle, FONT, (1080, 1440), 3, 3, 2)
+    got = np.asarray(v2.compose_poster(**p))
+    want = np.asarray(_reference(p))
+    diff = np.argwhere((got != want).any(axis=2))
+    assert diff.size == 0, f"{len(cat_lines)} 行分类说明, 差异范围 {diff.min(0)}..{diff.max(0)}"
@@ -0,0 +1,26 @@
+"""主题选择：指定的主题（含 themes.json 中的自定义主题）优先于自动选择"""
+import dataclasses
+from datetime import datetime
+
+from app import theme_system
+from app.theme_system import select_theme
+
+NOON = datetime(2025, 10, 20, 12, 0)
+
+
+def test_custom_theme_can_be_selected_by_name(monkeypatch):
+    custom = dataclasses.replace(theme_system.THEMES["默认蓝调"], name="门店周年庆")
+    monkeypatch.setitem(theme_system.THEMES, "门店周年庆", custom)
+    assert select_theme(dt=NOON, holiday_theme="国庆爱国", theme="门店周年庆") is custom
+
+
+def test_configured_theme_is_used_by_default(monkeypatch):
+    custom = dataclasses.replace(theme_system.THEMES["默认蓝调"], name="门店周年庆")
+    monkeypatch.setitem(theme_system.THEMES, "门店周年庆", custom)
+    monkeypatch.setattr(theme_system, "CFG", dataclasses.replace(theme_system.CFG, theme="门店周年庆"))
+    assert select_theme(dt=NOON) is custom
+
+
+def test_unknown_theme_falls_back_to_automatic(capsys):
+    assert select_theme(dt=NOON, holiday_theme="国庆爱国", theme="不存在") is theme_system.THEMES["国庆爱国"]
+    assert "未知的主题" in capsys.readouterr().out
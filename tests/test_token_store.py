@@ -0,0 +1,90 @@
+"""access_token 共享存储：刷新租约保证同一时刻只有一个调用者去获取新 token"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+
+import pytest
+
+from app.token_store import TokenStore
+
+
+def _slow_fetch(calls: list, token: str = "new", delay: float = 0.3):
+    def fetch():
+        calls.append(token)
+        time.sleep(delay)
+        return token, 7200
+    return fetch
+
+
+def test_concurrent_callers_fetch_once(tmp_path):
+    store = TokenStore(tmp_path / "tokens.sqlite3", refresh_margin=600)
+    calls: list[str] = []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        tokens = list(pool.map(lambda _: store.get("k", _slow_fetch(calls)), range(8)))
+    assert tokens == ["new"] * 8
+    assert calls == ["new"]
+
+
+def _get_in_process(path, results):
+    store = TokenStore(path, refresh_margin=600)
+    calls: list[str] = []
+    results.put((store.get("k", _slow_fetch(calls, token="proc")), len(calls)))
+
+
+def test_processes_share_the_lease(tmp_path):
+    ctx = get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_get_in_process, args=(tmp_path / "tokens.sqlite3", results)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    got = [results.get(timeout=30) for _ in procs]
+    for p in procs:
+        p.join(10)
+    assert [token for token, _ in got] == ["proc"] * 4
+    assert sum(n for _, n in got) == 1
+
+
+def test_old_token_is_served_while_another_caller_refreshes(tmp_path):
+    store = TokenStore(tmp_path / "tokens.sqlite3", refresh_margin=600)
+    # 旧 token 还有 5 分钟过期，已进入刷新窗口
+    store._try_lease("k")
+    store._store("k", "old", time.time() + 300)
+
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        time.sleep(0.5)
+        return "new", 7200
+
+    refresher = threading.Thread(target=store.get, args=("k", fetch))
+    refresher.start()
+    started.wait(5)
+    t0 = time.monotonic()
+    assert TokenStore(store.path, refresh_margin=600).get("k", lambda: pytest.fail("不应重复获取")) == "old"
+    assert time.monotonic() - t0 < 0.3
+    refresher.join()
+    assert store.get("k", lambda: pytest.fail("不应重复获取")) == "new"
+
+
+def test_failed_refresh_keeps_unexpired_token_and_releases_lease(tmp_path):
+    store = TokenStore(tmp_path / "tokens.sqlite3", refresh_margin=600)
+    store._try_lease("k")
+    store._store("k", "old", time.time() + 300)
+
+    def broken():
+        raise RuntimeError("network down")
+
+    assert store.get("k", broken) == "old"
+    # 租约已释放，下一次调用可以立即重试
+    assert store.get("k", lambda: ("new", 7200)) == "new"
+
+
+def test_invalidate_only_clears_matching_token(tmp_path):
+    store = TokenStore(tmp_path / "tokens.sqlite3", refresh_margin=600)
+    assert store.get("k", lambda: ("t1", 7200)) == "t1"
+    store.invalidate("k", "stale")
+    assert store.get("k", lambda: pytest.fail("不应重新获取")) == "t1"
+    store.invalidate("k", "t1")
+    assert store.get("k", lambda: ("t2", 7200)) == "t2"
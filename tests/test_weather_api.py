@@ -0,0 +1,114 @@
+"""天气缓存：未过期直接返回、过期后台刷新、过旧时同步查询（本地桩服务代替高德接口）"""
+import dataclasses
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import weather_api
+from app.weather_api import WeatherCache
+
+
+class _Stub:
+    def __init__(self) -> None:
+        self.weather = "小雨"
+        self.delay = 0.0
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.hits += 1
+                time.sleep(stub.delay)
+                body = json.dumps({"status": "1", "lives": [{"weather": stub.weather}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/weather"
+
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    s = _Stub()
+    monkeypatch.setenv("AMAP_WEATHER_KEY", "test")
+    monkeypatch.setattr(weather_api, "AMAP_WEATHER_URL", s.url)
+    monkeypatch.setattr(weather_api, "CFG", dataclasses.replace(weather_api.CFG, weather_sync_timeout=0.5))
+    monkeypatch.setattr(weather_api, "_CACHE", WeatherCache(tmp_path / "weather.json", ttl_seconds=100, max_stale_seconds=400))
+    yield s
+    s.server.shutdown()
+
+
+def _age(city: str, seconds: float) -> None:
+    cache = weather_api.get_weather_cache()
+    with cache._lock:
+        cache._load()[city]["fetched_at"] = time.time() - seconds
+
+
+def _wait_refresh(city: str) -> None:
+    for t in threading.enumerate():
+        if t.name == f"weather-refresh-{city}":
+            t.join(5)
+
+
+def test_fresh_entry_is_served_from_cache(stub):
+    assert weather_api.get_weather("南昌") == "小雨"
+    stub.weather = "晴"
+    assert weather_api.get_weather("南昌") == "小雨"
+    assert stub.hits == 1
+
+
+def test_expired_entry_returns_stale_and_refreshes_in_background(stub):
+    weather_api.get_weather("南昌")
+    _age("南昌", 150)
+    stub.weather = "晴"
+    assert weather_api.get_weather("南昌") == "小雨"
+    _wait_refresh("南昌")
+    assert stub.hits == 2
+    assert weather_api.get_weather("南昌") == "晴天"
+
+
+def test_entry_past_max_stale_is_fetched_synchronously(stub):
+    weather_api.get_weather("南昌")
+    _age("南昌", 500)
+    stub.weather = "晴"
+    assert weather_api.get_weather("南昌") == "晴天"
+    assert stub.hits == 2
+
+
+def test_entry_past_max_stale_falls_back_when_fetch_times_out(stub):
+    weather_api.get_weather("南昌")
+    _age("南昌", 500)
+    stub.weather, stub.delay = "晴", 1.5
+    t0 = time.monotonic()
+    assert weather_api.get_weather("南昌") == "小雨"
+    # 读取超时不重试，等待不超过同步查询的超时
+    assert time.monotonic() - t0 < weather_api.CFG.weather_sync_timeout + 0.3
+    # 失败后进入冷却期，不会每次调用都同步等待
+    t0 = time.monotonic()
+    assert weather_api.get_weather("南昌") == "小雨"
+    assert time.monotonic() - t0 < 0.2
+
+
+def test_cache_files_shared_by_two_processes_are_merged(tmp_path):
+    path = tmp_path / "weather.json"
+    a, b = WeatherCache(path, ttl_seconds=100), WeatherCache(path, ttl_seconds=100)
+    assert a.peek("南昌")[0] is None and b.peek("北京")[0] is None
+
+    a.store("南昌", "小雨")
+    b.store("北京", "晴天")
+    assert a.peek("北京")[0] == "晴天"
+
+    fresh = WeatherCache(path, ttl_seconds=100)
+    assert (fresh.peek("南昌")[0], fresh.peek("北京")[0]) == ("小雨", "晴天")
@@ -0,0 +1,50 @@
+"""微信素材缓存：多进程共用文件时互不覆盖、并发未命中只上传一次"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.wechat_media import MediaCache
+
+
+def test_entries_from_two_instances_are_merged(tmp_path):
+    path = tmp_path / "media.json"
+    a, b = MediaCache(path), MediaCache(path)
+    assert a.get("k1") is None and b.get("k2") is None
+
+    a.put("k1", "mid1", 3600)
+    b.put("k2", "mid2", None)
+    assert a.get("k2") == "mid2"
+
+    fresh = MediaCache(path)
+    assert (fresh.get("k1"), fresh.get("k2")) == ("mid1", "mid2")
+
+
+def test_invalidate_keeps_a_newer_upload_from_another_process(tmp_path):
+    path = tmp_path / "media.json"
+    a, b = MediaCache(path), MediaCache(path)
+    a.put("k", "old", 3600)
+    assert b.get("k") == "old"
+    a.put("k", "new", 3600)
+    # b 用 old 发送时被拒：作废 old 不应删掉 a 刚上传的 new
+    b.invalidate("k", "old")
+    assert MediaCache(path).get("k") == "new"
+
+    b.invalidate("k", "new")
+    assert MediaCache(path).get("k") is None
+
+
+def test_concurrent_misses_upload_once(tmp_path):
+    cache = MediaCache(tmp_path / "media.json")
+    uploads = []
+    lock = threading.Lock()
+
+    def upload():
+        with lock:
+            uploads.append(1)
+        time.sleep(0.2)
+        return f"mid{len(uploads)}"
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        values = list(pool.map(lambda _: cache.get_or_upload("k", upload, 3600), range(6)))
+    assert values == ["mid1"] * 6
+    assert len(uploads) == 1
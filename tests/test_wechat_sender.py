@@ -0,0 +1,99 @@
+"""微信接口调用：token 失效时作废共享 token 并重试（用假的 http_client 代替微信服务器）"""
+import pytest
+
+from app import wechat_sender
+from app.token_store import TokenStore
+from app.wechat_media import MediaCache
+from app.wechat_sender import WeChatPublicSender, WorkWechatSender
+
+
+class FakeWeChat:
+    """按路径返回预设结果；errors 中的路径依次先返回这些 errcode"""
+
+    def __init__(self) -> None:
+        self.tokens = 0
+        self.uploads = 0
+        self.calls: list[tuple[str, str]] = []
+        self.errors: dict[str, list[int]] = {}
+
+    def _resp(self, data: dict):
+        return type("Resp", (), {"json": lambda _self: data})()
+
+    def get(self, url, **kwargs):
+        self.tokens += 1
+        return self._resp({"access_token": f"tok{self.tokens}", "expires_in": 7200})
+
+    def post(self, url, **kwargs):
+        path, _, query = url.partition("?")
+        path = path.split("/cgi-bin/", 1)[1]
+        self.calls.append((path, query))
+        pending = self.errors.get(path)
+        if pending:
+            return self._resp({"errcode": pending.pop(0), "errmsg": "fake"})
+        if path == "media/upload":
+            self.uploads += 1
+            return self._resp({"media_id": f"mid{self.uploads}"})
+        if path == "media/uploadimg":
+            return self._resp({"url": "http://mmbiz.example/1.jpg"})
+        if path == "draft/add":
+            return self._resp({"media_id": "draft1"})
+        return self._resp({"errcode": 0})
+
+
+@pytest.fixture
+def wx(monkeypatch, tmp_path):
+    fake = FakeWeChat()
+    store = TokenStore(tmp_path / "tokens.sqlite3", refresh_margin=600)
+    cache = MediaCache(tmp_path / "media.json")
+    monkeypatch.setattr(wechat_sender.http_client, "get", fake.get)
+    monkeypatch.setattr(wechat_sender.http_client, "post", fake.post)
+    monkeypatch.setattr(wechat_sender, "get_token_store", lambda: store)
+    monkeypatch.setattr(wechat_sender, "get_media_cache", lambda: cache)
+    return fake
+
+
+@pytest.mark.parametrize("errcode", [40001, 40014, 42001])
+def test_invalid_token_is_refreshed_and_call_retried_once(wx, errcode):
+    sender = WorkWechatSender(corp_id="corp", agent_id=1, agent_secret="s")
+    assert sender.get_access_token() == "tok1"
+    wx.errors["message/send"] = [errcode]
+
+    assert sender.send_media("mid", touser="@all")
+    assert wx.tokens == 2
+    assert [q for p, q in wx.calls if p == "message/send"] == ["access_token=tok1", "access_token=tok2"]
+    # 新 token 已写回共享存储，后续调用直接使用
+    assert sender.get_access_token() == "tok2"
+
+
+def test_token_error_is_not_retried_twice(wx):
+    sender = WeChatPublicSender(app_id="app", app_secret="s")
+    wx.errors["message/custom/send"] = [40001, 40001]
+    assert not sender.send_image_to_customer("openid", "mid")
+    assert len(wx.calls) == 2
+
+
+def test_access_token_is_appended_to_existing_query(wx):
+    sender = WeChatPublicSender(app_id="app", app_secret="s")
+    sender.upload_image(b"jpeg")
+    assert wx.calls == [("media/upload", "type=image&access_token=tok1")]
+
+
+def test_invalid_media_is_reuploaded_and_send_retried_once(wx):
+    sender = WorkWechatSender(corp_id="corp", agent_id=1, agent_secret="s")
+    assert sender.upload_image(b"jpeg") == "mid1"
+    wx.errors["message/send"] = [40007]
+
+    assert sender.send_image(b"jpeg", touser="@all")
+    assert wx.uploads == 2
+    # 重新上传的素材写回缓存，下次直接复用
+    assert sender.upload_image(b"jpeg") == "mid2"
+
+
+def test_draft_reuploads_invalid_thumb(wx):
+    sender = WeChatPublicSender(app_id="app", app_secret="s")
+    sender.upload_image(b"jpeg")
+    wx.errors["draft/add"] = [40007]
+
+    assert sender.create_draft("title", b"jpeg", "content") == "draft1"
+    assert [p for p, _ in wx.calls].count("media/upload") == 2
+    assert [p for p, _ in wx.calls].count("draft/add") == 2
@@ -1,64 +1,132 @@
 """
 主题预览工具
 生成所有主题的示例海报，用于对比效果
+
+- 各主题分发到多个工作进程并行渲染（app/batch_render.py），字体与模板缓存在进程内复用
+- 额外生成一张缩小的总览图（主题预览_总览.jpg），所有主题一目了然
+- --incremental 只重新渲染配色（ThemeColors）有变化或缺少文件的主题
 """
 from __future__ import annotations
 
+import argparse
+import json
 import sys
 from pathlib import Path
-from datetime import datetime
 
 # 添加项目路径
 sys.path.append(str(Path(__file__).parent))
 
 from app.theme_system import THEMES, ThemeColors
-from app.poster_generator_v2 import render_poster
-from app.config import select_font_path, ensure_dirs, CFG
-
-
-def generate_theme_preview(theme_name: str, theme: ThemeColors, output_dir: Path):
-    """生成单个主题的预览海报"""
-
-    # 示例数据
-    items = [
-        {"号码": "13800138000", "预存": 1000, "低消": 58},
-        {"号码": "13900139001", "预存": 800, "低消": 48},
-        {"号码": "13700137002", "预存": 600, "低消": 38},
-        {"号码": "13600136003", "预存": 500, "低消": 28},
-        {"号码": "13500135004", "预存": 1200, "低消": 68},
-        {"号码": "13400134005", "预存": 900, "低消": 58},
-        {"号码": "13300133006", "预存": 700, "低消": 48},
-        {"号码": "13200132007", "预存": 600, "低消": 38},
-        {"号码": "13100131008", "预存": 500, "低消": 28},
-    ]
+from app.config import select_font_path, CFG
 
-    output_path = output_dir / f"主题预览_{theme_name}.jpg"
-    font_path = select_font_path()
 
+# 示例数据或版式变化时递增，使增量模式全部重新渲染
+PREVIEW_VERSION = 1
+
+MANIFEST_NAME = ".preview_manifest.json"
+SHEET_NAME = "主题预览_总览.jpg"
+
+# 示例数据
+SAMPLE_ITEMS = [
+    {"号码": "13800138000", "预存": 1000, "低消": 58},
+    {"号码": "13900139001", "预存": 800, "低消": 48},
+    {"号码": "13700137002", "预存": 600, "低消": 38},
+    {"号码": "13600136003", "预存": 500, "低消": 28},
+    {"号码": "13500135004", "预存": 1200, "低消": 68},
+    {"号码": "13400134005", "预存": 900, "低消": 58},
+    {"号码": "13300133006", "预存": 700, "低消": 48},
+    {"号码": "13200132007", "预存": 600, "低消": 38},
+    {"号码": "13100131008", "预存": 500, "低消": 28},
+]
+
+
+def preview_path(theme_name: str, output_dir: Path) -> Path:
+    return output_dir / f"主题预览_{theme_name}.jpg"
+
+
+def preview_spec(theme_name: str, theme: ThemeColors, output_dir: Path, font_path: str | None) -> dict:
+    """单个主题预览海报的 render_poster 参数"""
+    return dict(
+        output_path=preview_path(theme_name, output_dir),
+        font_path=font_path,
+        title="吉祥号码精选",
+        subtitle=f"2025年10月20日 {theme_name}｜示例专场",
+        tagline="主题预览 - 幸运好号，限时抢购，心动不如行动！",
+        items=SAMPLE_ITEMS,
+        branding_label="南昌县移动专供",
+        grid_cols=3,
+        grid_rows=3,
+        location="南昌",
+        hotline="13507094669",
+        theme=theme,
+    )
+
+
+def _preview_fingerprint(theme: ThemeColors, font_path: str | None, renderer: str) -> str:
+    from app.poster_template import theme_fingerprint
+
+    return f"v{PREVIEW_VERSION}_{renderer}_{theme_fingerprint(theme)}_{Path(font_path).name if font_path else '-'}"
+
+
+def _load_manifest(output_dir: Path) -> dict[str, str]:
     try:
-        render_poster(
-            output_path=output_path,
-            font_path=font_path,
-            title="吉祥号码精选",
-            subtitle=f"2025年10月20日 {theme_name}｜示例专场",
-            tagline="主题预览 - 幸运好号，限时抢购，心动不如行动！",
-            items=items,
-            branding_label="南昌县移动专供",
-            grid_cols=3,
-            grid_rows=3,
-            location="南昌",
-            hotline="13507094669",
-            theme=theme,
-        )
-        print(f"[OK] 已生成: {output_path.name}")
-        return True
-    except Exception as e:
-        print(f"[ERROR] 生成失败 ({theme_name}): {e}")
-        return False
-
-
-def main():
+        return json.loads((output_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def _save_manifest(output_dir: Path, manifest: dict[str, str]) -> None:
+    (output_dir / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def build_contact_sheet(output_dir: Path, theme_names: list[str], *, thumb_width: int = 270, columns: int = 4) -> Path | None:
+    """把各主题预览缩小拼成一张总览图，每张下方标注主题名"""
+    from PIL import Image, ImageDraw
+
+    from app.poster_core import _load_font, _text_size
+
+    paths = [(name, preview_path(name, output_dir)) for name in theme_names]
+    paths = [(name, p) for name, p in paths if p.exists()]
+    if not paths:
+        return None
+
+    thumbs = []
+    for name, p in paths:
+        with Image.open(p) as im:
+            # JPEG 解码时直接按 1/2、1/4 缩放，省去全尺寸解码
+            im.draft("RGB", (thumb_width, thumb_width * im.height // im.width))
+            im = im.convert("RGB")
+            thumbs.append((name, im.resize((thumb_width, thumb_width * im.height // im.width), Image.LANCZOS)))
+
+    gap = 16
+    label_h = 36
+    th = max(t.height for _, t in thumbs)
+    rows = (len(thumbs) + columns - 1) // columns
+    sheet = Image.new("RGB", (columns * (thumb_width + gap) + gap, rows * (th + label_h + gap) + gap), (245, 246, 250))
+    draw = ImageDraw.Draw(sheet)
+    font = _load_font(select_font_path(), 22)
+    for i, (name, t) in enumerate(thumbs):
+        x = gap + (i % columns) * (thumb_width + gap)
+        y = gap + (i // columns) * (th + label_h + gap)
+        sheet.paste(t, (x, y))
+        w, _ = _text_size(draw, name, font)
+        draw.text((x + (thumb_width - w) // 2, y + th + 6), name, font=font, fill=(60, 64, 80))
+
+    out = output_dir / SHEET_NAME
+    sheet.save(out, format="JPEG", quality=88)
+    return out
+
+
+def main(argv=None):
     """生成所有主题的预览海报"""
+    parser = argparse.ArgumentParser(description="主题预览工具")
+    parser.add_argument("--incremental", action="store_true", help="只重新渲染配色有变化的主题")
+    parser.add_argument("--workers", type=int, default=None, help="渲染进程数（默认 CPU 核数）")
+    parser.add_argument("--no-sheet", action="store_true", help="不生成总览图")
+    args = parser.parse_args(argv)
+
+    from app.batch_render import render_posters
+
     print("=" * 60)
     print("主题预览工具")
     print("=" * 60)
@@ -70,15 +138,42 @@ def main():
     print(f"\n输出目录: {preview_dir}")
     print(f"主题数量: {len(THEMES)}\n")
 
-    # 生成每个主题的预览
+    font_path = select_font_path()
+    manifest = _load_manifest(preview_dir) if args.incremental else {}
+    fingerprints = {name: _preview_fingerprint(theme, font_path, CFG.renderer) for name, theme in THEMES.items()}
+    todo = [
+        name for name in THEMES
+        if not (args.incremental and manifest.get(name) == fingerprints[name] and preview_path(name, preview_dir).exists())
+    ]
+    if args.incremental:
+        print(f"[INFO] 增量模式：{len(todo)} 个主题需要重新渲染，{len(THEMES) - len(todo)} 个未变化")
+
+    # 并行生成各主题的预览
+    results = render_posters([preview_spec(name, THEMES[name], preview_dir, font_path) for name in todo], workers=args.workers)
     success_count = 0
-    for theme_name, theme in THEMES.items():
-        if generate_theme_preview(theme_name, theme, preview_dir):
-            success_count += 1
+    for name, result in zip(todo, results):
+        if result is None:
+            manifest.pop(name, None)
+            continue
+        print(f"[OK] 已生成: {preview_path(name, preview_dir).name}")
+        manifest[name] = fingerprints[name]
+        success_count += 1
+    # 已删除的主题不再记录
+    manifest = {name: fp for name, fp in manifest.items() if name in THEMES}
+    _save_manifest(preview_dir, manifest)
+
+    sheet = None
+    if not args.no_sheet and (todo or not (preview_dir / SHEET_NAME).exists()):
+        sheet = build_contact_sheet(preview_dir, list(THEMES))
 
     # 总结
     print("\n" + "=" * 60)
-    print(f"完成！成功生成 {success_count}/{len(THEMES)} 个主题预览")
+    if todo:
+        print(f"完成！成功生成 {success_count}/{len(todo)} 个主题预览")
+    else:
+        print("完成！所有主题预览都是最新的，无需重新渲染")
+    if sheet:
+        print(f"总览图: {sheet.name}")
     print(f"查看目录: {preview_dir}")
     print("=" * 60)
 
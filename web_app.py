@@ -74,13 +74,20 @@ def get_outputs():
         if not output_dir.exists():
             return jsonify({'success': True, 'files': []})
 
+        from app.poster_output import is_variant_file, load_variants
+
         files = []
         for file in output_dir.glob('*.jpg'):
+            if is_variant_file(file):
+                continue
             stat = file.stat()
+            variants = load_variants(file)
             files.append({
                 'name': file.name,
                 'size': f"{stat.st_size / 1024:.1f} KB",
-                'created': datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S')
+                'created': datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
+                'thumb': variants['thumb'].name if 'thumb' in variants else None,
+                'variants': {name: path.name for name, path in variants.items()},
             })
 
         # 按创建时间倒序
@@ -94,8 +101,15 @@ def get_outputs():
 def download_file(filename):
     """下载文件"""
     try:
+        # 本进程刚生成的海报直接从内存缓冲区返回
+        from app.poster_output import recall_poster
+
+        poster = recall_poster(filename)
+        if poster is not None:
+            return send_file(poster.open(), mimetype=poster.mimetype, as_attachment=True, download_name=filename)
+
         file_path = CFG.output_dir / filename
-        if file_path.exists() and file_path.suffix == '.jpg':
+        if file_path.exists() and file_path.suffix in ('.jpg', '.webp'):
             return send_file(str(file_path), as_attachment=True)
         else:
             return jsonify({'error': '文件不存在'}), 404